@@ -0,0 +1,215 @@
+import logging
+import random
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: quota exhaustion and server-side failures
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# 403 reasons Google uses for rate limiting instead of a 429
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+class GoogleUnavailable(Exception):
+    """Raised without calling Google while the circuit breaker is open"""
+
+
+class QuotaExhausted(Exception):
+    """Raised when a call would wait longer than allowed for a quota token"""
+
+
+def error_status(error):
+    """HTTP status of a googleapiclient HttpError, or None for other errors"""
+    resp = getattr(error, "resp", None)
+    status = getattr(resp, "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_reason(error):
+    """Label for a retryable failure, or None if retrying cannot help"""
+    status = error_status(error)
+    if status is not None:
+        if status in RETRYABLE_STATUSES:
+            return str(status)
+        if status == 403 and any(reason in str(error) for reason in RATE_LIMIT_REASONS):
+            return "403"
+        return None
+    # Timeouts, resets and DNS failures surface as OSError subclasses
+    if isinstance(error, OSError):
+        return "network"
+    return None
+
+
+def operation_category(operation):
+    """Quota bucket a Google API operation draws from"""
+    if operation.startswith("sheets.values."):
+        verb = operation.rsplit(".", 1)[-1]
+        return "sheets.read" if verb in ("get", "batchGet") else "sheets.write"
+    return operation.split(".", 1)[0]
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, burst=None):
+        """Bucket that sustains a per-minute quota, allowing a short burst"""
+        burst = burst or max(1, requests_per_minute // 6)
+        return cls(requests_per_minute / 60.0, burst)
+
+    def reserve(self, max_wait=None):
+        """Take a token, returning how long the caller must wait before using it"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                raise QuotaExhausted(f"Quota token not available for {wait:.1f}s")
+            # Tokens may go negative so queued callers are spaced out in order
+            self._tokens -= 1
+            return wait
+
+
+class CircuitBreaker:
+    """Stops calls after repeated failures and lets a single trial call through after a cool-down"""
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        # Set while the half-open trial call is out; other callers are turned away until it reports
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def allow(self):
+        """Whether a call may go ahead; while half-open, only the one trial call may"""
+        with self._lock:
+            state = self._current_state()
+            if state != self.HALF_OPEN:
+                return state == self.CLOSED
+            # A trial whose caller never reported back is replaced after another cool-down
+            if self._probing and self._clock() - self._probe_started < self.reset_timeout:
+                return False
+            self._probing = True
+            self._probe_started = self._clock()
+            return True
+
+    def record_success(self):
+        """Close the circuit, returning True if it was not already closed"""
+        with self._lock:
+            was_closed = self._state == self.CLOSED
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+            return not was_closed
+
+    def record_failure(self):
+        """Count a failure, returning True if it opened the circuit"""
+        with self._lock:
+            self._failures += 1
+            if self._current_state() == self.HALF_OPEN or (
+                    self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+                return True
+            return False
+
+
+class ApiGovernor:
+    """Shared gate for Google API calls: quota limiting, retries and a circuit breaker"""
+
+    def __init__(self, buckets, breaker, max_retries=4, base_delay=1.0, max_delay=16.0,
+                 max_wait=5.0, max_elapsed=30.0, sleep=time.sleep, clock=time.monotonic):
+        self.buckets = buckets
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.max_elapsed = max_elapsed
+        self._sleep = sleep
+        self._clock = clock
+        self._random = random.Random()
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for the given retry attempt"""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, operation, func, max_elapsed=None):
+        """Run func() under the quota, retrying transient failures
+
+        max_elapsed, if given, replaces the default time budget for this
+        call; quota waits and retry delays both have to fit inside it.
+        """
+        if not self.breaker.allow():
+            metrics.google_api_rejected.inc(operation)
+            raise GoogleUnavailable("Google APIs are unavailable; working locally")
+
+        bucket = self.buckets.get(operation_category(operation))
+        deadline = self._clock() + (self.max_elapsed if max_elapsed is None else max_elapsed)
+        attempt = 0
+        while True:
+            if bucket is not None:
+                wait = bucket.reserve(min(self.max_wait, max(0.0, deadline - self._clock())))
+                if wait > 0:
+                    metrics.google_api_throttled.inc(operation)
+                    metrics.google_api_throttle_seconds.inc(operation, amount=wait)
+                    self._sleep(wait)
+            try:
+                result = func()
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None:
+                    if error_status(e) is not None:
+                        # Google answered, so it is reachable; the request itself was refused
+                        self.breaker.record_success()
+                    raise
+                delay = self.backoff(attempt)
+                if attempt >= self.max_retries or self._clock() + delay > deadline:
+                    if self.breaker.record_failure():
+                        logger.warning(f"Google APIs failing ({reason}); switching to local-only mode "
+                                       f"for {self.breaker.reset_timeout:.0f}s")
+                    raise
+                metrics.google_api_retries.inc(operation, reason)
+                logger.info(f"Retrying {operation} after {reason} in {delay:.2f}s")
+                attempt += 1
+                self._sleep(delay)
+                continue
+            if self.breaker.record_success():
+                logger.info("Google APIs healthy again; leaving local-only mode")
+            return result
@@ -1,13 +1,42 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, g, has_request_context
 from datetime import datetime, timedelta
+import csv
 import json
 import os
 import logging
 import uuid
+import time
+import threading
+import copy
+import hmac
+import zlib
+from collections import OrderedDict
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from guest_directory import STAY_LOG_TYPES, GuestDirectory
+import metrics
+import fast_json
+from snapshot import write_snapshot, read_snapshot
+from export import EXPORT_LOG_TYPES, OPTIONAL_EXPORT_LOG_TYPES, iter_export_rows, iter_csv, iter_xlsx
+import bulk_import
+from kpis import OccupancyIndex
+from occupancy_grid import MAX_CALENDAR_DAYS, OccupancyGrid, day_number
+from expense_ledger import BUDGET_PREFIX, EXPENSE_TYPES, ExpenseLedger, split_budgets, with_budgets
+from shift_ledger import SHIFT_DETAIL_FIELDS, ShiftLedger, from_log_entry, to_log_entry
+from log_index import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PAYMENT_MODES, LogIndex, decode_cursor
+from search_index import DOCUMENT_KINDS, SearchIndex
+from api_governor import ApiGovernor, CircuitBreaker, GoogleUnavailable, QuotaExhausted, TokenBucket
+from state_history import StateHistory, timestamp
+from profiler import ProfileStore, SamplingProfiler
+from single_flight import SingleFlight
+from rw_lock import ReadWriteLock
+from memory_report import AllocationTracker, MemoryWatch, container_size, deep_size, resident_bytes
+from shards import PropertyConfig, ShardRegistry, UnknownProperty, load_property_configs
+
+# Worker boot is measured from the first line of app code
+BOOT_STARTED = time.perf_counter()
 
 # Configure logging
 logging.basicConfig(
@@ -20,37 +49,6 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__, static_folder='static')
 
-# Google API settings - DEFINE SCOPES BEFORE USING THEM
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-SPREADSHEET_ID = '1oQhNGbuzad2XC9kQwXu2CswaHlxLHhHKgngz1wA9iRo'  # Replace with yours
-DRIVE_FOLDER_ID = '1P4f1lx9w5ay-3Dw4JO3qzjGN8ysTvGt5'  # Replace with yours
-
-# Try to get credentials from environment variable
-try:
-    google_credentials = os.environ.get('GOOGLE_CREDENTIALS')
-    if google_credentials:
-        logger.info("Using Google credentials from environment variable")
-        credentials_info = json.loads(google_credentials)
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_info, scopes=SCOPES)
-    else:
-        # Fall back to file if environment variable is not set
-        logger.info("Environment variable GOOGLE_CREDENTIALS not found, trying file")
-        SERVICE_ACCOUNT_FILE = 'lodge-service-account.json'
-        if os.path.exists(SERVICE_ACCOUNT_FILE):
-            credentials = service_account.Credentials.from_service_account_file(
-                SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        else:
-            logger.error(f"Service account file {SERVICE_ACCOUNT_FILE} not found")
-            credentials = None
-except Exception as e:
-    logger.error(f"Error loading Google credentials: {str(e)}")
-    credentials = None
-
-logger = logging.getLogger(__name__)
-
-app = Flask(__name__, static_folder='static')
-
 # File upload settings
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -70,303 +68,1191 @@ DRIVE_FOLDER_ID = '1P4f1lx9w5ay-3Dw4JO3qzjGN8ysTvGt5'  # Replace with yours
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 
           'https://www.googleapis.com/auth/drive']
 
+# Per-user Sheets quotas; calls are paced locally to stay under them
+SHEETS_READS_PER_MINUTE = int(os.environ.get('LODGE_SHEETS_READS_PER_MINUTE', '60'))
+SHEETS_WRITES_PER_MINUTE = int(os.environ.get('LODGE_SHEETS_WRITES_PER_MINUTE', '60'))
+
+# Consecutive failed calls before working locally, and how long to wait before trying Google again
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 60
+
+# How often changes kept locally while Google was down are retried
+PENDING_FLUSH_SECONDS = 30
+
+# Seconds each Sheets call of a save may spend waiting on quota and retries while
+# the state lock is held; a save that runs out stays in the snapshot for the flush
+LOCKED_SAVE_SECONDS = 3
+
+# ----- STARTUP CONFIGURATION -----
+# Local copy of the last synced state, served while Sheets is being read
+SNAPSHOT_PATH = os.environ.get('LODGE_SNAPSHOT_PATH', 'data_snapshot.bin')
+
+# Set to 0 to skip the background Sheets load (benchmarks, offline debugging)
+BACKGROUND_SYNC = os.environ.get('LODGE_BACKGROUND_SYNC', '1') != '0'
+
+# How long a write waits for the first load before giving up with a 503
+STARTUP_WAIT_SECONDS = 15
+
+# Days of logs /get_data sends, today included; older entries are paged from /logs
+RECENT_LOG_DAYS = int(os.environ.get('LODGE_RECENT_LOG_DAYS', '3'))
+
+# Days of room and totals history kept for /state_at
+HISTORY_RETENTION_DAYS = int(os.environ.get('LODGE_HISTORY_RETENTION_DAYS', '90'))
+
+# ----- PROPERTY CONFIGURATION -----
+# Optional JSON file listing the properties this deployment serves; without it,
+# the settings above describe the only one
+PROPERTIES_FILE = os.environ.get('LODGE_PROPERTIES_FILE')
+
+# Seconds a property can go unused before its state is dropped from memory
+PROPERTY_IDLE_SECONDS = int(os.environ.get('LODGE_PROPERTY_IDLE_SECONDS', '900'))
+
+# Where a request names its property, most specific first
+PROPERTY_HEADER = 'X-Lodge-Property'
+PROPERTY_COOKIE = 'lodge_property'
+
+# ----- PROFILING CONFIGURATION -----
+# A request carrying this token in the header (or ?_profile=) runs under the
+# sampling profiler; without a token set, profiling and /debug are disabled
+PROFILE_TOKEN = os.environ.get('LODGE_PROFILE_TOKEN')
+PROFILE_HEADER = 'X-Lodge-Profile'
+
+# Where captures are kept, and how many before the oldest are removed
+PROFILE_DIR = os.environ.get('LODGE_PROFILE_DIR', 'profiles')
+PROFILE_KEEP = int(os.environ.get('LODGE_PROFILE_KEEP', '50'))
+
+# Memory the host allows a worker before restarting it; warnings are logged
+# as resident memory approaches it, checked this often
+MEMORY_LIMIT_MB = int(os.environ.get('LODGE_MEMORY_LIMIT_MB', '512'))
+MEMORY_CHECK_SECONDS = int(os.environ.get('LODGE_MEMORY_CHECK_SECONDS', '60'))
+
+# Frames tracemalloc keeps per allocation when started at boot; 0 leaves it
+# off until /debug/memory?tracemalloc=start
+TRACEMALLOC_FRAMES = int(os.environ.get('LODGE_TRACEMALLOC_FRAMES', '0'))
+
 # ----- GOOGLE API FUNCTIONS -----
+_credentials = None
+_google_local = threading.local()
+
+def setup_google_credentials():
+    """Initialize and validate Google API credentials with enhanced error logging"""
+    global _credentials
+    if _credentials is not None:
+        return _credentials
+    
+    logger.info("Setting up Google API credentials...")
+    
+    try:
+        # Imported here so workers don't pay for google-auth until it is needed
+        from google.oauth2 import service_account
+        
+        # Try environment variable first
+        google_credentials = os.environ.get('GOOGLE_CREDENTIALS')
+        if google_credentials:
+            logger.info("Using Google credentials from environment variable")
+            try:
+                credentials_info = json.loads(google_credentials)
+                _credentials = service_account.Credentials.from_service_account_info(
+                    credentials_info, scopes=SCOPES)
+                logger.info("Successfully loaded credentials from environment variable")
+                return _credentials
+            except json.JSONDecodeError:
+                logger.error("Failed to parse GOOGLE_CREDENTIALS environment variable: Invalid JSON")
+            except Exception as e:
+                logger.error(f"Error creating credentials from environment variable: {str(e)}")
+        
+        # Fall back to file
+        logger.info("Trying to load credentials from service account file")
+        if os.path.exists(SERVICE_ACCOUNT_FILE):
+            try:
+                _credentials = service_account.Credentials.from_service_account_file(
+                    SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+                logger.info(f"Successfully loaded credentials from {SERVICE_ACCOUNT_FILE}")
+                return _credentials
+            except Exception as e:
+                logger.error(f"Error loading credentials from file: {str(e)}")
+        else:
+            logger.error(f"Service account file {SERVICE_ACCOUNT_FILE} not found")
+        
+        logger.critical("No valid Google credentials found. API functionality will be disabled.")
+        return None
+    except Exception as e:
+        logger.critical(f"Unexpected error setting up Google credentials: {str(e)}")
+        return None
+
 def get_google_services():
-    """Initialize and return Google Sheets and Drive services"""
+    """Return Google Sheets and Drive services, built once per thread"""
+    # googleapiclient services are not thread-safe, so each thread keeps its own
+    cached = getattr(_google_local, "services", None)
+    if cached:
+        return cached
+    
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        sheets_service = build('sheets', 'v4', credentials=credentials)
-        drive_service = build('drive', 'v3', credentials=credentials)
+        credentials = setup_google_credentials()
+        if not credentials:
+            logger.error("Failed to obtain valid credentials")
+            return None, None
+        
+        from googleapiclient.discovery import build
+        
+        logger.info("Initializing Google API services...")
+        try:
+            sheets_service = build('sheets', 'v4', credentials=credentials)
+            logger.info("Successfully initialized Google Sheets service")
+        except Exception as e:
+            logger.error(f"Failed to build Sheets service: {str(e)}")
+            sheets_service = None
+            
+        try:
+            drive_service = build('drive', 'v3', credentials=credentials)
+            logger.info("Successfully initialized Google Drive service")
+        except Exception as e:
+            logger.error(f"Failed to build Drive service: {str(e)}")
+            drive_service = None
+        
+        if sheets_service and drive_service:
+            _google_local.services = (sheets_service, drive_service)
         return sheets_service, drive_service
     except Exception as e:
         logger.error(f"Error connecting to Google services: {str(e)}")
         return None, None
 
+google_governor = ApiGovernor(
+    buckets={
+        "sheets.read": TokenBucket.per_minute(SHEETS_READS_PER_MINUTE),
+        "sheets.write": TokenBucket.per_minute(SHEETS_WRITES_PER_MINUTE)
+    },
+    breaker=CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS))
+
+def execute_google_request(api_request, operation, max_elapsed=None):
+    """Execute a Google API request through the quota governor, recording its latency for /metrics"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = google_governor.call(operation, api_request.execute, max_elapsed)
+        outcome = "ok"
+        return result
+    except GoogleUnavailable:
+        outcome = "rejected"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.google_api_calls.inc(operation, outcome)
+        metrics.google_api_duration.observe(elapsed, operation)
+        # Attribute the call to the request being served, if any
+        if has_request_context() and "google_calls" in g:
+            g.google_calls += 1
+            g.google_seconds += elapsed
+
+# ----- SHEET ROW FORMAT -----
+# Every Rooms, Logs and Bookings row ends with a modification marker,
+# "<first saved>:<crc32 of the row>", so a warm restart can fetch only changed rows
+MARKER_COLUMNS = {"Rooms": "G", "Logs": "H", "Bookings": "N"}
+DATA_WIDTHS = {"Rooms": 6, "Logs": 7, "Bookings": 13}
+
+LOG_TYPES = ["cash", "online", "balance", "add_ons", "refunds", "renewals", "booking_payments", "checkins", "expenses", "shifts"]
+
+# Expense and refund details that don't fit the log columns, kept as JSON in the notes column
+EXPENSE_DETAIL_FIELDS = ["category", "description", "payment_method", "expense_type"]
+REFUND_DETAIL_FIELDS = ["payment_mode", "note", "notes", "booking_id"]
+LOG_DETAIL_FIELDS = {"expenses": EXPENSE_DETAIL_FIELDS, "refunds": REFUND_DETAIL_FIELDS, "shifts": SHIFT_DETAIL_FIELDS}
+DEFAULT_ROOMS = ([str(i) for i in range(1, 6)] + [str(i) for i in range(13, 21)] +
+                 [str(i) for i in range(23, 28)] + [str(i) for i in range(200, 229)])
+
+# Cells are written RAW, so unformatted reads return them as stored without server-side formatting
+SHEET_READ_OPTIONS = {"valueRenderOption": "UNFORMATTED_VALUE", "dateTimeRenderOption": "FORMATTED_STRING"}
+
+# First-saved stamp per row checksum, so unchanged rows keep their marker across saves
+_row_stamps = LocalProxy(lambda: current_shard().row_stamps)
+
+def cell_int(value):
+    """Read a whole-number cell, possibly negative; hand-edited cells come back from unformatted reads as numbers"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def cell_text(value):
+    """Read a text cell that may have been hand-edited into a number"""
+    if isinstance(value, str):
+        return value
+    return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+
+def parse_room_row(row):
+    if len(row) < 1 or not row[0]:
+        return None
+    return cell_text(row[0]), {
+        "status": row[1] if len(row) > 1 else "vacant", 
+        "guest": json.loads(row[2]) if len(row) > 2 and row[2] else None,
+        "checkin_time": row[3] if len(row) > 3 and row[3] else None,
+        "balance": int(row[4]) if len(row) > 4 and row[4] != "" else 0,
+        "add_ons": json.loads(row[5]) if len(row) > 5 and row[5] else []
+    }
+
+def parse_log_row(row):
+    if len(row) < 6:
+        return None
+    log_entry = {
+        "room": cell_text(row[1]),
+        "name": row[2],
+        "amount": cell_int(row[3]),
+        "time": row[4],
+        "date": row[5]
+    }
+    # Add notes if available
+    if len(row) > 6 and row[6]:
+        log_entry["notes"] = row[6]
+    # Add-on entries carry their amount as price and their item in the notes column
+    if row[0] == "add_ons":
+        log_entry["price"] = log_entry["amount"]
+        log_entry["item"] = log_entry.get("notes", "")
+    elif row[0] in LOG_DETAIL_FIELDS and log_entry.get("notes", "").startswith("{"):
+        try:
+            log_entry.update(json.loads(log_entry.pop("notes")))
+        except ValueError:
+            pass
+    return row[0], log_entry
+
+def parse_booking_row(row):
+    if len(row) < 7:
+        return None
+    return row[0], {
+        "room": cell_text(row[1]),
+        "guest_name": row[2],
+        "guest_mobile": cell_text(row[3]),
+        "check_in_date": row[4],
+        "check_out_date": row[5],
+        "status": row[6],
+        "total_amount": cell_int(row[7]) if len(row) > 7 else 0,
+        "paid_amount": cell_int(row[8]) if len(row) > 8 else 0,
+        "balance": cell_int(row[9]) if len(row) > 9 else 0,
+        "payment_method": row[10] if len(row) > 10 and row[10] else "cash",
+        "notes": row[11] if len(row) > 11 else "",
+        "photo_path": row[12] if len(row) > 12 and row[12] else None
+    }
+
+ROW_PARSERS = {"Rooms": parse_room_row, "Logs": parse_log_row, "Bookings": parse_booking_row}
+
+def parse_sheet_row(sheet, row):
+    """Parse one sheet row into (marker, key, value), or None for a blank row"""
+    parsed = ROW_PARSERS[sheet](row)
+    if parsed is None:
+        return None
+    width = DATA_WIDTHS[sheet]
+    marker = row[width] if len(row) > width else ""
+    return (marker,) + parsed
+
+def parse_totals(totals_values):
+    totals = {
+        "cash": 0, "online": 0, "balance": 0, "refunds": 0, "advance_bookings": 0
+    }
+    for row in totals_values:
+        if len(row) >= 2 and (row[0] in totals or str(row[0]).startswith(BUDGET_PREFIX)):
+            totals[row[0]] = cell_int(row[1])
+    return totals
+
+def remember_markers(rows):
+    """Reuse the stamps of already-saved rows so unchanged rows keep their markers"""
+    for sheet, sheet_rows in rows.items():
+        stamps = {}
+        for entry in sheet_rows:
+            stamp, _, checksum = entry[0].partition(":")
+            if checksum:
+                stamps.setdefault(checksum, stamp)
+        _row_stamps[sheet] = stamps
+
+def state_from_rows(rows, totals, last_rent_check=None):
+    """Assemble rooms, logs and bookings from parsed sheet rows, setting the budgets apart from the totals"""
+    rooms_dict = {number: info for _, number, info in rows["Rooms"]}
+    
+    # Ensure all of the property's rooms exist
+    for room in current_shard().config.rooms:
+        if room not in rooms_dict:
+            rooms_dict[room] = {"status": "vacant", "guest": None, "checkin_time": None, "balance": 0, "add_ons": []}
+    
+    logs = {log_type: [] for log_type in LOG_TYPES}
+    for _, log_type, log_entry in rows["Logs"]:
+        logs.setdefault(log_type, []).append(log_entry)
+    
+    bookings = {booking_id: booking for _, booking_id, booking in rows["Bookings"]}
+    totals, budgets = split_budgets(totals)
+    
+    return {
+        "rooms": rooms_dict,
+        "logs": logs,
+        "totals": totals,
+        "budgets": budgets,
+        "bookings": bookings,
+        "last_rent_check": last_rent_check or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def sheet_ranges():
+    """Full data range of every sheet read at startup, Totals last"""
+    ranges = {sheet: f'{sheet}!A2:{marker_column}' for sheet, marker_column in MARKER_COLUMNS.items()}
+    ranges["Totals"] = 'Totals!A2:B'
+    return ranges
+
+def parse_sheet_values(sheet, values):
+    """Parse the raw values of one sheet range"""
+    if sheet == "Totals":
+        return parse_totals(values)
+    parsed_rows = (parse_sheet_row(sheet, row) for row in values)
+    return [entry for entry in parsed_rows if entry]
+
+def fetch_range_values(spreadsheet_id, a1_range):
+    """Read one range on the calling thread's own client"""
+    sheets_service, _ = get_google_services()
+    if not sheets_service:
+        raise Exception("Could not connect to Google Sheets")
+    result = execute_google_request(sheets_service.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id, range=a1_range, **SHEET_READ_OPTIONS), "sheets.values.get")
+    return result.get('values', [])
+
+def fetch_sheet_rows():
+    """Read every Rooms, Logs and Bookings row plus the totals from Google Sheets"""
+    sheets_service, _ = get_google_services()
+    if not sheets_service:
+        raise Exception("Could not connect to Google Sheets")
+    
+    spreadsheet_id = current_shard().config.spreadsheet_id
+    ranges = sheet_ranges()
+    parsed = {}
+    try:
+        # One round trip for all four ranges
+        result = execute_google_request(sheets_service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id, ranges=list(ranges.values()), **SHEET_READ_OPTIONS),
+            "sheets.values.batchGet")
+        value_ranges = result.get('valueRanges', [])
+        if len(value_ranges) != len(ranges):
+            raise Exception(f"Expected {len(ranges)} ranges, got {len(value_ranges)}")
+        for sheet, value_range in zip(ranges, value_ranges):
+            parsed[sheet] = parse_sheet_values(sheet, value_range.get('values', []))
+    except Exception as e:
+        logger.warning(f"Batched sheet read failed, reading ranges individually: {str(e)}")
+        parsed = {}
+        # Each range is parsed as soon as it arrives while the others are still in flight
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = {pool.submit(fetch_range_values, spreadsheet_id, a1_range): sheet
+                       for sheet, a1_range in ranges.items()}
+            for future in as_completed(futures):
+                sheet = futures[future]
+                parsed[sheet] = parse_sheet_values(sheet, future.result())
+    
+    totals = parsed.pop("Totals")
+    return parsed, totals
+
+def fetch_changed_rows(previous_rows):
+    """Read only the rows whose modification marker isn't among previous_rows"""
+    sheets_service, _ = get_google_services()
+    if not sheets_service:
+        raise Exception("Could not connect to Google Sheets")
+    
+    spreadsheet_id = current_shard().config.spreadsheet_id
+    # One call for each sheet's key and marker columns plus the small Totals sheet
+    ranges = []
+    for sheet, marker_column in MARKER_COLUMNS.items():
+        ranges += [f'{sheet}!A2:A', f'{sheet}!{marker_column}2:{marker_column}']
+    ranges.append('Totals!A2:B')
+    result = execute_google_request(sheets_service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id, ranges=ranges, **SHEET_READ_OPTIONS), "sheets.values.batchGet")
+    value_ranges = [vr.get('values', []) for vr in result.get('valueRanges', [])]
+    
+    rows = {}
+    missing_runs = []
+    total_rows = 0
+    for index, sheet in enumerate(MARKER_COLUMNS):
+        keys, markers = value_ranges[2 * index], value_ranges[2 * index + 1]
+        known = {}
+        for entry in previous_rows.get(sheet, []):
+            known.setdefault(entry[0], entry)
+        
+        sheet_rows = []
+        reused = set()
+        for position in range(len(keys)):
+            marker = markers[position][0] if position < len(markers) and markers[position] else ""
+            entry = known.get(marker) if marker else None
+            if entry is not None and marker in reused:
+                # Identical rows share a marker; give each its own copy
+                entry = copy.deepcopy(entry)
+            if entry is None:
+                if missing_runs and missing_runs[-1][0] == sheet and missing_runs[-1][2] == position - 1:
+                    missing_runs[-1][2] = position
+                else:
+                    missing_runs.append([sheet, position, position])
+            else:
+                reused.add(marker)
+            sheet_rows.append(entry)
+        rows[sheet] = sheet_rows
+        total_rows += len(keys)
+    
+    fetched = 0
+    if missing_runs:
+        result = execute_google_request(sheets_service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f'{sheet}!A{start + 2}:{MARKER_COLUMNS[sheet]}{end + 2}' for sheet, start, end in missing_runs],
+            **SHEET_READ_OPTIONS
+        ), "sheets.values.batchGet")
+        for (sheet, start, end), value_range in zip(missing_runs, result.get('valueRanges', [])):
+            values = value_range.get('values', [])
+            for offset in range(end - start + 1):
+                row = values[offset] if offset < len(values) else []
+                rows[sheet][start + offset] = parse_sheet_row(sheet, row)
+                fetched += 1
+    
+    for sheet in rows:
+        rows[sheet] = [entry for entry in rows[sheet] if entry]
+    logger.info(f"Delta sync fetched {fetched} of {total_rows} rows from Google Sheets")
+    return rows, parse_totals(value_ranges[-1])
+
+def load_from_sheets():
+    """Load data from Google Sheets, raising if it cannot be read"""
+    logger.info("Initializing data from Google Sheets...")
+    rows, totals = fetch_sheet_rows()
+    remember_markers(rows)
+    return state_from_rows(rows, totals)
+
+def default_data():
+    """Create the default data structure with every room vacant"""
+    rooms_dict = {}
+    for room in current_shard().config.rooms:
+        rooms_dict[room] = {"status": "vacant", "guest": None, "checkin_time": None, "balance": 0, "add_ons": []}
+    
+    return {
+        "rooms": rooms_dict,
+        "logs": {log_type: [] for log_type in LOG_TYPES},
+        "totals": {
+            "cash": 0, "online": 0, "balance": 0, "refunds": 0, "advance_bookings": 0
+        },
+        "budgets": {},
+        "bookings": {},
+        "last_rent_check": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
 def initialize_data():
     """Load data from Google Sheets or create default data structure"""
-    logger.info("Initializing data from Google Sheets...")
     try:
-        sheets_service, _ = get_google_services()
-        if not sheets_service:
-            raise Exception("Could not connect to Google Sheets")
-        
-        # ----- LOAD ROOMS DATA -----
-        rooms_result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=SPREADSHEET_ID, range='Rooms!A2:F200').execute()
-        rooms_values = rooms_result.get('values', [])
-        
-        rooms_dict = {}
-        for row in rooms_values:
-            if len(row) >= 1:
-                room_number = row[0]
-                rooms_dict[room_number] = {
-                    "status": row[1] if len(row) > 1 else "vacant", 
-                    "guest": json.loads(row[2]) if len(row) > 2 and row[2] else None,
-                    "checkin_time": row[3] if len(row) > 3 else None,
-                    "balance": int(row[4]) if len(row) > 4 and row[4] else 0,
-                    "add_ons": json.loads(row[5]) if len(row) > 5 and row[5] else []
-                }
-        
-        # Ensure all default rooms exist
-        first_floor_rooms = [str(i) for i in range(1, 6)] + [str(i) for i in range(13, 21)] + [str(i) for i in range(23, 28)]
-        second_floor_rooms = [str(i) for i in range(200, 229)]
-        
-        for room in first_floor_rooms + second_floor_rooms:
-            if room not in rooms_dict:
-                rooms_dict[room] = {"status": "vacant", "guest": None, "checkin_time": None, "balance": 0, "add_ons": []}
-        
-        # ----- LOAD LOGS DATA -----
-        # Initialize logs structure
-        logs_types = ["cash", "online", "balance", "add_ons", "refunds", "renewals", "booking_payments"]
-        logs = {log_type: [] for log_type in logs_types}
-        
-        # Get logs from Google Sheets
-        logs_result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=SPREADSHEET_ID, range='Logs!A2:H500').execute()
-        logs_values = logs_result.get('values', [])
-        
-        # Process logs data
-        for row in logs_values:
-            if len(row) >= 6:
-                log_type = row[0]
-                if log_type in logs:
-                    log_entry = {
-                        "room": row[1],
-                        "name": row[2],
-                        "amount": int(row[3]) if row[3].isdigit() else 0,
-                        "time": row[4],
-                        "date": row[5]
-                    }
-                    # Add notes if available
-                    if len(row) > 6:
-                        log_entry["notes"] = row[6]
-                    logs[log_type].append(log_entry)
-        
-        # ----- LOAD TOTALS DATA -----
-        totals_result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=SPREADSHEET_ID, range='Totals!A2:B10').execute()
-        totals_values = totals_result.get('values', [])
-        
-        totals = {
-            "cash": 0, "online": 0, "balance": 0, "refunds": 0, "advance_bookings": 0
-        }
-        
-        for row in totals_values:
-            if len(row) >= 2 and row[0] in totals:
-                totals[row[0]] = int(row[1]) if row[1].isdigit() else 0
-        
-        # ----- LOAD BOOKINGS DATA -----
-        bookings_result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=SPREADSHEET_ID, range='Bookings!A2:M500').execute()
-        bookings_values = bookings_result.get('values', [])
-        
-        bookings = {}
-        for row in bookings_values:
-            if len(row) >= 7:
-                booking_id = row[0]
-                bookings[booking_id] = {
-                    "room": row[1],
-                    "guest_name": row[2],
-                    "guest_mobile": row[3],
-                    "check_in_date": row[4],
-                    "check_out_date": row[5],
-                    "status": row[6],
-                    "total_amount": int(row[7]) if len(row) > 7 and row[7].isdigit() else 0,
-                    "paid_amount": int(row[8]) if len(row) > 8 and row[8].isdigit() else 0,
-                    "balance": int(row[9]) if len(row) > 9 and row[9].isdigit() else 0,
-                    "payment_method": row[10] if len(row) > 10 else "cash",
-                    "notes": row[11] if len(row) > 11 else "",
-                    "photo_path": row[12] if len(row) > 12 else None
-                }
-        
-        return {
-            "rooms": rooms_dict,
-            "logs": logs,
-            "totals": totals,
-            "bookings": bookings,
-            "last_rent_check": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        return load_from_sheets()
     except Exception as e:
         logger.error(f"Error loading data from Google Sheets: {str(e)}")
-        
-        # Create default data structure as fallback
-        rooms_dict = {}
-        
-        # First floor rooms
-        for num in list(range(1, 6)) + list(range(13, 21)) + list(range(23, 28)):
-            rooms_dict[str(num)] = {"status": "vacant", "guest": None, "checkin_time": None, "balance": 0, "add_ons": []}
-        
-        # Second floor rooms
-        for num in range(200, 229):
-            rooms_dict[str(num)] = {"status": "vacant", "guest": None, "checkin_time": None, "balance": 0, "add_ons": []}
-        
-        default_data = {
-            "rooms": rooms_dict,
-            "logs": {
-                "cash": [], "online": [], "balance": [], "add_ons": [], 
-                "refunds": [], "renewals": [], "booking_payments": []
-            },
-            "totals": {
-                "cash": 0, "online": 0, "balance": 0, "refunds": 0, "advance_bookings": 0
-            },
-            "bookings": {},
-            "last_rent_check": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
         logger.info("Using default data structure")
-        return default_data
+        return default_data()
+
+def room_row(room_number, room_info):
+    return [
+        room_number,
+        room_info["status"],
+        json.dumps(room_info["guest"]) if room_info["guest"] else "",
+        room_info["checkin_time"] if room_info["checkin_time"] else "",
+        str(room_info["balance"]),
+        json.dumps(room_info["add_ons"]) if room_info["add_ons"] else ""
+    ]
+
+def log_row(log_type, entry):
+    if log_type in LOG_DETAIL_FIELDS:
+        notes = json.dumps({field: entry[field] for field in LOG_DETAIL_FIELDS[log_type] if field in entry})
+    else:
+        notes = entry.get("notes") or entry.get("item") or ""
+    return [
+        log_type,
+        entry.get("room") or "",
+        entry.get("name") or "",
+        str(entry.get("amount", entry.get("price", 0))),
+        entry.get("time") or "",
+        entry.get("date") or "",
+        notes
+    ]
+
+def booking_row(booking_id, booking_info):
+    return [
+        booking_id,
+        booking_info.get("room") or "",
+        booking_info.get("guest_name") or "",
+        booking_info.get("guest_mobile") or "",
+        booking_info.get("check_in_date") or "",
+        booking_info.get("check_out_date") or "",
+        booking_info.get("status") or "",
+        str(booking_info.get("total_amount", 0)),
+        str(booking_info.get("paid_amount", 0)),
+        str(booking_info.get("balance", 0)),
+        booking_info.get("payment_method") or "cash",
+        booking_info.get("notes") or "",
+        booking_info.get("photo_path") or ""
+    ]
+
+def build_sheet_rows(data, partial=False):
+    """Lay out the state as sheet values and parsed rows, each tagged with its marker
+
+    With partial, data holds only some rows (new ones being appended) and the
+    stamps of rows not in it are kept.
+    """
+    stamp_now = datetime.now().strftime("%Y%m%d%H%M%S")
+    values = {sheet: [] for sheet in MARKER_COLUMNS}
+    rows = {sheet: [] for sheet in MARKER_COLUMNS}
+    stamps = {sheet: {} for sheet in MARKER_COLUMNS}
+    
+    def add(sheet, cells, key, value):
+        checksum = f"{zlib.crc32(chr(31).join(cells).encode()):08x}"
+        stamp = _row_stamps[sheet].get(checksum) or stamps[sheet].get(checksum) or stamp_now
+        stamps[sheet][checksum] = stamp
+        marker = f"{stamp}:{checksum}"
+        values[sheet].append(cells + [marker])
+        rows[sheet].append((marker, key, value))
+    
+    for room_number, room_info in data["rooms"].items():
+        add("Rooms", room_row(room_number, room_info), room_number, room_info)
+    for log_type, log_entries in data["logs"].items():
+        for entry in log_entries:
+            add("Logs", log_row(log_type, entry), log_type, entry)
+    for booking_id, booking_info in data.get("bookings", {}).items():
+        add("Bookings", booking_row(booking_id, booking_info), booking_id, booking_info)
+    
+    if partial:
+        for sheet, sheet_stamps in stamps.items():
+            _row_stamps[sheet].update(sheet_stamps)
+    else:
+        # Only stamps of rows that still exist are worth remembering
+        _row_stamps.update(stamps)
+    return values, rows
 
 def save_data(data):
     """Save data to Google Sheets"""
+    if has_request_context() and g.get("defer_saves"):
+        # Several changes are being applied in one request; it saves once at the end
+        g.save_pending = True
+        return True
+    shard = current_shard()
+    spreadsheet_id = shard.config.spreadsheet_id
+    _sync_status["mutations"] += 1
+    _sync_status["version"] += 1
+    record_history(request.path if has_request_context() else "sync")
+    sheet_values, shard.synced_rows = build_sheet_rows(data)
+    # Every request waits on the lock while it is held, so don't sit out a long backoff inside it
+    budget = LOCKED_SAVE_SECONDS if shard.lock.held_exclusively() else None
     try:
         sheets_service, _ = get_google_services()
         if not sheets_service:
             raise Exception("Could not connect to Google Sheets")
         
-        # ----- SAVE ROOMS DATA -----
-        rooms_values = []
-        for room_number, room_info in data["rooms"].items():
-            rooms_values.append([
-                room_number,
-                room_info["status"],
-                json.dumps(room_info["guest"]) if room_info["guest"] else "",
-                room_info["checkin_time"] if room_info["checkin_time"] else "",
-                str(room_info["balance"]),
-                json.dumps(room_info["add_ons"]) if room_info["add_ons"] else ""
-            ])
-        
-        # Clear and update Rooms sheet
-        sheets_service.spreadsheets().values().clear(
-            spreadsheetId=SPREADSHEET_ID, range='Rooms!A2:F500').execute()
-        
-        if rooms_values:
-            sheets_service.spreadsheets().values().update(
-                spreadsheetId=SPREADSHEET_ID, range='Rooms!A2',
-                valueInputOption='RAW', body={"values": rooms_values}).execute()
-        
-        # ----- SAVE LOGS DATA -----
-        logs_values = []
-        for log_type, log_entries in data["logs"].items():
-            for entry in log_entries:
-                log_row = [
-                    log_type,
-                    entry.get("room", ""),
-                    entry.get("name", ""),
-                    str(entry.get("amount", 0)),
-                    entry.get("time", ""),
-                    entry.get("date", ""),
-                    entry.get("notes", "")
-                ]
-                logs_values.append(log_row)
-        
-        # Clear and update Logs sheet
-        sheets_service.spreadsheets().values().clear(
-            spreadsheetId=SPREADSHEET_ID, range='Logs!A2:H500').execute()
-        
-        if logs_values:
-            sheets_service.spreadsheets().values().update(
-                spreadsheetId=SPREADSHEET_ID, range='Logs!A2',
-                valueInputOption='RAW', body={"values": logs_values}).execute()
-        
-        # ----- SAVE TOTALS DATA -----
-        totals_values = [[key, str(value)] for key, value in data["totals"].items()]
-        
-        sheets_service.spreadsheets().values().clear(
-            spreadsheetId=SPREADSHEET_ID, range='Totals!A2:B10').execute()
-        
-        if totals_values:
-            sheets_service.spreadsheets().values().update(
-                spreadsheetId=SPREADSHEET_ID, range='Totals!A2',
-                valueInputOption='RAW', body={"values": totals_values}).execute()
-        
-        # ----- SAVE BOOKINGS DATA -----
-        bookings_values = []
-        for booking_id, booking_info in data.get("bookings", {}).items():
-            bookings_values.append([
-                booking_id,
-                booking_info.get("room", ""),
-                booking_info.get("guest_name", ""),
-                booking_info.get("guest_mobile", ""),
-                booking_info.get("check_in_date", ""),
-                booking_info.get("check_out_date", ""),
-                booking_info.get("status", ""),
-                str(booking_info.get("total_amount", 0)),
-                str(booking_info.get("paid_amount", 0)),
-                str(booking_info.get("balance", 0)),
-                booking_info.get("payment_method", "cash"),
-                booking_info.get("notes", ""),
-                booking_info.get("photo_path", "")
-            ])
-        
-        sheets_service.spreadsheets().values().clear(
-            spreadsheetId=SPREADSHEET_ID, range='Bookings!A2:M500').execute()
-        
-        if bookings_values:
-            sheets_service.spreadsheets().values().update(
-                spreadsheetId=SPREADSHEET_ID, range='Bookings!A2',
-                valueInputOption='RAW', body={"values": bookings_values}).execute()
+        # Two write requests per save instead of a clear and an update per sheet,
+        # which keeps a busy hour inside the per-minute write quota. Rows are
+        # overwritten first and only the leftover tail is cleared, so a save cut
+        # short by throttling never leaves a sheet empty.
+        # Budgets share the Totals sheet; callers pass the totals alone, so they come from the shard
+        saved_totals = with_budgets(data["totals"], shard.budgets)
+        sheet_values["Totals"] = [[key, str(value)] for key, value in saved_totals.items()]
+        last_columns = dict(MARKER_COLUMNS, Totals="B")
+        execute_google_request(sheets_service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id, body={
+                "valueInputOption": "RAW",
+                "data": [{"range": f'{sheet}!A2', "values": values}
+                         for sheet, values in sheet_values.items() if values]
+            }), "sheets.values.batchUpdate", budget)
+        execute_google_request(sheets_service.spreadsheets().values().batchClear(
+            spreadsheetId=spreadsheet_id, body={"ranges": [
+                f'{sheet}!A{len(values) + 2}:{last_columns[sheet]}' for sheet, values in sheet_values.items()
+            ]}), "sheets.values.batchClear", budget)
         
         logger.info("Data saved to Google Sheets")
+        _sync_status["dirty"] = False
         return True
+    except (GoogleUnavailable, QuotaExhausted) as e:
+        logger.warning(f"{str(e)}; change kept in the local snapshot until it can be pushed")
+        _sync_status["dirty"] = True
+        return False
     except Exception as e:
         logger.error(f"Error saving data to Google Sheets: {str(e)}")
+        _sync_status["dirty"] = True
         return False
+    finally:
+        # Keep the local copy current even when Sheets is unreachable
+        save_snapshot()
 
-def upload_to_drive(file_path, file_name):
-    """Upload a file to Google Drive and return the public link"""
+# ----- LOCAL SNAPSHOT -----
+# Outcome of each mutation replayed from a client's offline queue, by mutation id,
+# so a batch resent after a dropped response isn't applied twice
+_replayed_mutations = LocalProxy(lambda: current_shard().replayed_mutations)
+MAX_REPLAYED_MUTATIONS = 5000
+
+def save_snapshot():
+    """Write the parsed state to the local binary snapshot"""
+    shard = current_shard()
     try:
-        _, drive_service = get_google_services()
-        if not drive_service:
-            raise Exception("Could not connect to Google Drive")
-            
-        # Prepare file metadata
-        file_metadata = {
-            'name': file_name,
-            'parents': [DRIVE_FOLDER_ID]
-        }
-        
-        # Upload the file
-        media = MediaFileUpload(file_path, resumable=True)
-        file = drive_service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields='id,webContentLink').execute()
-        
-        # Make the file publicly accessible
-        permission = {
-            'type': 'anyone',
-            'role': 'reader'
-        }
-        drive_service.permissions().create(
-            fileId=file.get('id'),
-            body=permission).execute()
-        
-        # Return the public link
-        return file.get('webContentLink')
+        rows = shard.synced_rows
+        if rows is None:
+            _, rows = build_sheet_rows(full_state())
+        start = time.perf_counter()
+        size = write_snapshot(shard.config.snapshot_path, {
+            "saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "dirty": shard.sync_status["dirty"],
+            "rows": rows,
+            "totals": with_budgets(shard.totals, shard.budgets),
+            "last_rent_check": shard.data.get("last_rent_check"),
+            "replayed": list(shard.replayed_mutations.items())
+        })
+        logger.info(f"Local snapshot written: {size} bytes in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return True
     except Exception as e:
-        logger.error(f"Error uploading to Google Drive: {str(e)}")
+        logger.error(f"Error writing local snapshot: {str(e)}")
+        return False
+
+def load_snapshot():
+    """Read the local snapshot, or return None if there isn't a usable one"""
+    snapshot_path = current_shard().config.snapshot_path
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        start = time.perf_counter()
+        snapshot = read_snapshot(snapshot_path)
+        logger.info(f"Loaded local snapshot saved at {snapshot.get('saved_at')} "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return snapshot
+    except Exception as e:
+        logger.error(f"Error reading local snapshot {snapshot_path}: {str(e)}")
         return None
 
+# ----- PROPERTY SHARDS -----
+def observe_read_cache(key, outcome):
+    metrics.read_cache_requests.inc(key if isinstance(key, str) else key[0], outcome)
+
+class PropertyShard:
+    """One property's live state, with its indexes, caches, sync status and write lock"""
+
+    def __init__(self, config):
+        self.config = config
+        # "version" goes up on every change to the live state, for caches derived from it
+        self.sync_status = {"mutations": 0, "version": 0, "dirty": False, "source": "default"}
+        self.data_ready = threading.Event()
+        # Writes hold this while they mutate state so a background reload can't interleave
+        self.lock = ReadWriteLock()
+        # Parsed sheet rows from the last load or save, with their modification markers
+        self.synced_rows = None
+        self.row_stamps = {sheet: {} for sheet in MARKER_COLUMNS}
+        self.replayed_mutations = OrderedDict()
+        # Returning guests, expenses by day, the open shift's counters, room x day bitsets,
+        # every log entry in time order for /logs and the words of notes and names for /search
+        self.guest_directory = GuestDirectory()
+        self.expense_ledger = ExpenseLedger()
+        self.shift_ledger = ShiftLedger()
+        self.occupancy_grid = OccupancyGrid()
+        self.log_index = LogIndex()
+        self.search_index = SearchIndex()
+        # Encoded read responses and the occupancy matrices, for the current version
+        self.log_fragments = fast_json.LogFragments()
+        self.read_cache = SingleFlight(on_outcome=observe_read_cache)
+        self.occupancy_cache = {"version": None, "index": None}
+        # Changes to rooms and totals over time, next to the snapshot, for /state_at
+        self.history = StateHistory(f"{os.path.splitext(config.snapshot_path)[0]}.history.jsonl", HISTORY_RETENTION_DAYS)
+
+    def bind(self, data):
+        self.data = data
+        self.rooms = data["rooms"]
+        self.logs = data["logs"]
+        self.totals = data["totals"]
+        self.budgets = data.setdefault("budgets", {})
+        self.bookings = data.setdefault("bookings", {})
+        self.guest_directory.rebuild(self.rooms, self.bookings, self.logs)
+        self.expense_ledger.rebuild(self.logs, self.budgets)
+        self.shift_ledger.rebuild(self.logs)
+        self.occupancy_grid.rebuild(self.rooms, self.bookings)
+        self.log_index.clear()
+        self.search_index.rebuild(self.bookings, self.logs)
+
+_active_shard = ContextVar("lodge_property", default=None)
+
+def current_shard():
+    """Shard of the property being served; outside a request, the default property's"""
+    shard = _active_shard.get()
+    if shard is None:
+        shard = property_shards.get(DEFAULT_PROPERTY)
+        _active_shard.set(shard)
+    return shard
+
+def run_for_property(shard, task):
+    """Thread target running a task against one property's state"""
+    _active_shard.set(shard)
+    task()
+
+# The live state of the property being served. Routes use these as plain
+# module globals; each access resolves to the current request's property.
+data = LocalProxy(lambda: current_shard().data)
+rooms = LocalProxy(lambda: current_shard().rooms)
+logs = LocalProxy(lambda: current_shard().logs)
+totals = LocalProxy(lambda: current_shard().totals)
+budgets = LocalProxy(lambda: current_shard().budgets)
+bookings = LocalProxy(lambda: current_shard().bookings)
+guest_directory = LocalProxy(lambda: current_shard().guest_directory)
+expense_ledger = LocalProxy(lambda: current_shard().expense_ledger)
+shift_ledger = LocalProxy(lambda: current_shard().shift_ledger)
+occupancy_grid = LocalProxy(lambda: current_shard().occupancy_grid)
+log_index = LocalProxy(lambda: current_shard().log_index)
+search_index = LocalProxy(lambda: current_shard().search_index)
+_sync_status = LocalProxy(lambda: current_shard().sync_status)
+
 # ----- LOAD INITIAL DATA -----
-# Load data on startup
-data = initialize_data()
-rooms = data["rooms"]
-logs = data["logs"]
-totals = data["totals"]
-bookings = data.get("bookings", {})
+# Serve from the local snapshot straight away; Sheets is read in the background
+_boot_timings = {}
+
+def load_property(config):
+    """Build a property's shard from its local snapshot and start its Sheets sync"""
+    shard = PropertyShard(config)
+    token = _active_shard.set(shard)
+    try:
+        snapshot = load_snapshot()
+        if snapshot:
+            shard.sync_status["source"] = "snapshot"
+            shard.sync_status["dirty"] = snapshot["dirty"]
+            shard.synced_rows = snapshot["rows"]
+            shard.replayed_mutations.update(snapshot.get("replayed", []))
+            remember_markers(shard.synced_rows)
+            shard.bind(state_from_rows(shard.synced_rows, snapshot["totals"], snapshot["last_rent_check"]))
+        else:
+            shard.bind(default_data())
+        record_history(shard.sync_status["source"])
+        
+        if BACKGROUND_SYNC:
+            if shard.sync_status["source"] == "snapshot":
+                mark_data_ready("snapshot")
+            threading.Thread(target=run_for_property, args=(shard, reconcile_with_sheets),
+                             name=f"sheets-sync-{config.property_id}", daemon=True).start()
+        else:
+            mark_data_ready(shard.sync_status["source"])
+    finally:
+        _active_shard.reset(token)
+    logger.info(f"Property {config.name} loaded from {shard.sync_status['source']}")
+    return shard
+
+def can_evict_property(shard):
+    """Only a loaded property with nothing unsaved and no write in progress is dropped"""
+    if not shard.data_ready.is_set() or shard.sync_status["dirty"]:
+        return False
+    if not shard.lock.acquire(blocking=False):
+        return False
+    shard.lock.release()
+    return True
+
+def replace_state(new_data):
+    """Swap freshly loaded data into the live state without rebinding the globals"""
+    rooms.clear()
+    rooms.update(new_data["rooms"])
+    logs.clear()
+    logs.update(new_data["logs"])
+    totals.clear()
+    totals.update(new_data["totals"])
+    budgets.clear()
+    budgets.update(new_data.get("budgets", {}))
+    bookings.clear()
+    bookings.update(new_data.get("bookings", {}))
+    data["last_rent_check"] = new_data.get("last_rent_check")
+    guest_directory.rebuild(rooms, bookings, logs)
+    expense_ledger.rebuild(logs, budgets)
+    shift_ledger.rebuild(logs)
+    occupancy_grid.rebuild(rooms, bookings)
+    search_index.rebuild(bookings, logs)
+    log_fragments.clear()
+    log_index.clear()
+    _sync_status["version"] += 1
+    record_history("sheets")
+
+def record_history(reason):
+    """Note what the last change did to rooms and totals; a failure here never blocks a save"""
+    shard = current_shard()
+    try:
+        shard.history.record(shard.rooms, shard.totals, reason)
+    except Exception as e:
+        logger.error(f"Could not record state history of {shard.config.name}: {str(e)}")
+
+def mark_data_ready(source):
+    """Record where the state came from and let waiting writes proceed"""
+    shard = current_shard()
+    shard.sync_status["source"] = source
+    if shard.config.property_id == DEFAULT_PROPERTY:
+        _boot_timings[source] = time.perf_counter() - BOOT_STARTED
+        if not shard.data_ready.is_set():
+            _boot_timings["ready"] = _boot_timings[source]
+    shard.data_ready.set()
+    logger.info(f"State of {shard.config.name} loaded from {source} "
+                f"{(time.perf_counter() - BOOT_STARTED) * 1000:.0f} ms after boot")
+
+def full_state():
+    """Bundle the live state in the shape save_data expects"""
+    return {"rooms": rooms, "logs": logs, "totals": totals, "budgets": budgets, "bookings": bookings,
+            "last_rent_check": data.get("last_rent_check")}
+
+def append_log(log_type, entry):
+    """Add an entry to a log, folding payments into the guest directory's stays"""
+    logs[log_type].append(entry)
+    if log_type in STAY_LOG_TYPES:
+        guest_directory.add_log(log_type, entry)
+
+def reconcile_with_sheets():
+    """Bring the local state in line with Google Sheets, retrying with backoff"""
+    shard = current_shard()
+    if not setup_google_credentials():
+        # Without credentials Sheets can never load; run on the local state alone
+        logger.warning("No Google credentials; serving local state without Sheets sync")
+        mark_data_ready(_sync_status["source"])
+        return
+    
+    delay = 5
+    while True:
+        mutations_before = _sync_status["mutations"]
+        try:
+            if _sync_status["dirty"]:
+                # The snapshot holds writes Sheets never received; push them first
+                with shard.lock:
+                    if not save_data(full_state()):
+                        raise Exception("Could not save pending local changes")
+                mark_data_ready("sheets")
+                return
+            
+            if shard.synced_rows is not None:
+                # Warm restart: only rows changed since the snapshot are fetched
+                rows, loaded_totals = fetch_changed_rows(shard.synced_rows)
+            else:
+                rows, loaded_totals = fetch_sheet_rows()
+            with shard.lock:
+                if _sync_status["mutations"] == mutations_before:
+                    replace_state(state_from_rows(rows, loaded_totals, data.get("last_rent_check")))
+                    shard.synced_rows = rows
+                    remember_markers(rows)
+                    save_snapshot()
+                else:
+                    # A write already pushed the local state to Sheets meanwhile
+                    logger.info("Local changes were saved during the background load; keeping them")
+            mark_data_ready("sheets")
+            return
+        except Exception as e:
+            logger.error(f"Background sync of {shard.config.name} with Google Sheets failed: {str(e)}; "
+                         f"retrying in {delay}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 300)
+
+def flush_pending_changes():
+    """Push changes kept locally while Google was unavailable, once it accepts calls again"""
+    while True:
+        time.sleep(PENDING_FLUSH_SECONDS)
+        for shard in property_shards.loaded().values():
+            # A property still loading pushes its own changes once Sheets answers
+            if not shard.data_ready.is_set() or not shard.sync_status["dirty"]:
+                continue
+            # Checked without taking the half-open trial call, which save_data makes
+            if google_governor.breaker.state == CircuitBreaker.OPEN:
+                break
+            _active_shard.set(shard)
+            with shard.lock:
+                if shard.sync_status["dirty"] and save_data(full_state()):
+                    logger.info(f"Pending local changes of {shard.config.name} pushed to Google Sheets")
+        property_shards.evict_idle()
+
+def flush_in_background():
+    if setup_google_credentials():
+        flush_pending_changes()
+
+def release_property(shard):
+    shard.history.close()
+    logger.info(f"Property {shard.config.name} idle; dropped from memory")
+
+# The property described by the settings above; with a properties file, its first entry
+DEFAULT_PROPERTY = "default"
+property_configs = {DEFAULT_PROPERTY: PropertyConfig(
+    DEFAULT_PROPERTY, SPREADSHEET_ID, DRIVE_FOLDER_ID, SNAPSHOT_PATH, DEFAULT_ROOMS, name="Default")}
+if PROPERTIES_FILE:
+    property_configs = load_property_configs(PROPERTIES_FILE, property_configs[DEFAULT_PROPERTY])
+    DEFAULT_PROPERTY = next(iter(property_configs))
+
+# The default property stays loaded; the others come and go with use
+property_shards = ShardRegistry(
+    property_configs, load_property, can_evict_property,
+    on_evict=release_property,
+    idle_seconds=PROPERTY_IDLE_SECONDS, pinned=[DEFAULT_PROPERTY])
+current_shard()
+
+if BACKGROUND_SYNC:
+    threading.Thread(target=flush_in_background, name="sheets-flush", daemon=True).start()
+
+# ----- REQUEST INSTRUMENTATION -----
+metrics.Gauge("lodge_log_entries", "Entries held in memory per property and log type", ("property", "type"),
+              callback=lambda: {(property_id, log_type): len(entries)
+                                for property_id, shard in property_shards.loaded().items()
+                                for log_type, entries in shard.logs.items()})
+metrics.Gauge("lodge_bookings", "Bookings held in memory per property", ("property",),
+              callback=lambda: {property_id: len(shard.bookings)
+                                for property_id, shard in property_shards.loaded().items()})
+metrics.Gauge("lodge_occupied_rooms", "Rooms currently occupied per property", ("property",),
+              callback=lambda: {property_id: sum(1 for room in shard.rooms.values() if room["status"] == "occupied")
+                                for property_id, shard in property_shards.loaded().items()})
+metrics.Gauge("lodge_loaded_properties", "Properties whose state is in memory",
+              callback=lambda: len(property_shards.loaded()))
+
+metrics.Gauge("lodge_google_circuit_state", "Google API circuit breaker state (1 for the current state)", ("state",),
+              callback=lambda: {state: int(google_governor.breaker.state == state) for state in
+                                (CircuitBreaker.CLOSED, CircuitBreaker.HALF_OPEN, CircuitBreaker.OPEN)})
+metrics.Gauge("lodge_unsynced_changes", "1 while a property's local changes have not reached Google Sheets",
+              ("property",), callback=lambda: {property_id: int(shard.sync_status["dirty"])
+                                               for property_id, shard in property_shards.loaded().items()})
+
+metrics.Gauge("lodge_startup_seconds", "Seconds from worker boot to each startup milestone", ("phase",),
+              callback=lambda: dict(_boot_timings))
+metrics.Gauge("lodge_resident_memory_bytes", "Resident memory of this worker", callback=resident_bytes)
+
+# ----- MEMORY ACCOUNTING -----
+# Indexes and caches built from a property's state, sized apart from the state itself
+SHARD_CACHES = ("guest_directory", "expense_ledger", "shift_ledger", "occupancy_grid", "occupancy_cache",
+                "log_index", "search_index", "log_fragments", "read_cache", "synced_rows", "row_stamps",
+                "replayed_mutations")
+
+memory_watch = MemoryWatch(MEMORY_LIMIT_MB * 2**20, logger)
+allocation_tracker = AllocationTracker()
+if TRACEMALLOC_FRAMES:
+    allocation_tracker.start(TRACEMALLOC_FRAMES)
+
+def state_memory(shard):
+    """Deep sizes of one property's rooms, logs and bookings, and of what its caches add"""
+    seen = set()
+    sizes = {"logs": {}}
+    for name in ("rooms", "bookings"):
+        size, estimated = container_size(getattr(shard, name), seen)
+        sizes[name] = {"entries": len(getattr(shard, name)), "bytes": size, "estimated": estimated}
+    for log_type, entries in shard.logs.items():
+        size, estimated = container_size(entries, seen)
+        sizes["logs"][log_type] = {"entries": len(entries), "bytes": size, "estimated": estimated}
+    
+    # The caches point at the same entries; only what they hold besides is counted
+    seen.update(id(entry) for entries in shard.logs.values() for entry in entries)
+    seen.update(id(entry) for entry in shard.bookings.values())
+    seen.update(id(entry) for entry in shard.rooms.values())
+    sizes["caches"] = {name: deep_size([getattr(shard, name)], seen) for name in SHARD_CACHES}
+    sizes["total_bytes"] = (sizes["rooms"]["bytes"] + sizes["bookings"]["bytes"] + sum(sizes["caches"].values())
+                            + sum(log["bytes"] for log in sizes["logs"].values()))
+    return sizes
+
+def largest_structures(count=3):
+    """The biggest logs, bookings and caches across loaded properties, for the memory warnings"""
+    found = []
+    for property_id, shard in property_shards.loaded().items():
+        sizes = state_memory(shard)
+        found.append((sizes["bookings"]["bytes"], f"{property_id}/bookings"))
+        found += [(log["bytes"], f"{property_id}/logs/{log_type}") for log_type, log in sizes["logs"].items()]
+        found += [(size, f"{property_id}/{name}") for name, size in sizes["caches"].items()]
+    return ", ".join(f"{name} {size / 2**20:.1f} MB" for size, name in sorted(found, reverse=True)[:count])
+
+def watch_memory():
+    while True:
+        time.sleep(MEMORY_CHECK_SECONDS)
+        memory_watch.check(resident_bytes(), detail=largest_structures)
+
+threading.Thread(target=watch_memory, name="memory-watch", daemon=True).start()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.google_calls = 0
+    g.google_seconds = 0.0
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_KEEP)
+
+def debug_authorized():
+    """Whether the request carries the profiling token"""
+    token = request.headers.get(PROFILE_HEADER) or request.args.get("_profile")
+    return bool(PROFILE_TOKEN and token and hmac.compare_digest(token, PROFILE_TOKEN))
+
+@app.before_request
+def start_profiling():
+    """Run an authorized request under the sampling profiler"""
+    if debug_authorized() and not request.path.startswith("/debug/"):
+        g.profiler = SamplingProfiler(wait_functions=("execute_google_request",))
+        g.profiler.start()
+
+@app.before_request
+def select_property():
+    """Serve the request from the property named by its header, query string or cookie"""
+    property_id = request.headers.get(PROPERTY_HEADER) or request.args.get("property")
+    if not property_id:
+        # A cookie naming a property no longer configured falls back to the default
+        property_id = request.cookies.get(PROPERTY_COOKIE)
+        if property_id not in property_configs:
+            property_id = DEFAULT_PROPERTY
+    try:
+        shard = property_shards.get(property_id)
+    except UnknownProperty:
+        return jsonify(success=False, message=f"Unknown property: {property_id}"), 404
+    _active_shard.set(shard)
+    g.property_id = property_id
+    return None
+
+# Reads that are posted for their JSON body; like GETs, they share the state lock
+POSTED_READ_ENDPOINTS = {"check_availability", "get_reports", "get_history"}
+
+@app.before_request
+def hold_state_lock():
+    """Let reads share the state and give each write it alone, once the first state load has finished"""
+    if request.method == "OPTIONS" or "property_id" not in g:
+        return None
+    shard = current_shard()
+    if request.method in ("GET", "HEAD") or request.endpoint in POSTED_READ_ENDPOINTS:
+        shard.lock.acquire_shared()
+        g.release_state_lock = shard.lock.release_shared
+        return None
+    if not shard.data_ready.wait(STARTUP_WAIT_SECONDS):
+        return jsonify(success=False, message="Data is still loading, please try again shortly."), 503
+    shard.lock.acquire()
+    g.release_state_lock = shard.lock.release
+    return None
+
+@app.teardown_request
+def release_state_lock(exc):
+    release = g.pop("release_state_lock", None)
+    if release is not None:
+        release()
+
+@app.after_request
+def save_profile(response):
+    """Store the capture of a profiled request and name it in X-Lodge-Profile-Id"""
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    summary = profiler.stop()
+    summary.update(
+        route=request.url_rule.rule if request.url_rule else "unmatched", path=request.path,
+        method=request.method, status=response.status_code, property=g.get("property_id"),
+        google_calls=g.get("google_calls", 0), google_seconds=g.get("google_seconds", 0.0),
+        captured_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    try:
+        response.headers["X-Lodge-Profile-Id"] = profile_store.save(summary, profiler.folded())
+    except OSError as e:
+        logger.error(f"Could not store profile of {request.path}: {str(e)}")
+    return response
+
+@app.teardown_request
+def stop_profiler(exc):
+    """A request that failed before its response still stops its sampler"""
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+
+@app.after_request
+def record_request_metrics(response):
+    if "request_start" not in g:
+        return response
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    elapsed = time.perf_counter() - g.request_start
+    metrics.http_request_duration.observe(elapsed, route, request.method, str(response.status_code))
+    metrics.request_google_calls.observe(g.google_calls, route)
+    if g.google_calls:
+        metrics.request_google_seconds.observe(g.google_seconds, route)
+    if response.is_streamed:
+        # Streamed bodies have no length up front; count them as they are sent
+        response.response = count_streamed_bytes(response.response, route)
+    elif response.content_length is not None:
+        metrics.http_response_size.observe(response.content_length, route)
+    return response
+
+def count_streamed_bytes(body, route):
+    """Pass a streamed body through, recording its size once it has been sent"""
+    size = 0
+    try:
+        for chunk in body:
+            size += len(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+        metrics.http_response_size.observe(size, route)
 
 # ----- ROUTES -----
+@app.route("/metrics")
+def get_metrics():
+    """Expose request, Google API and state metrics in Prometheus text format"""
+    return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/debug/profiles", methods=["GET"])
+def list_profiles():
+    """Stored request profiles, newest first; needs the profiling token"""
+    if not debug_authorized():
+        return jsonify(success=False, message="Not authorized"), 403
+    return jsonify(success=True, profiles=profile_store.list())
+
+@app.route("/debug/profiles/<profile_id>", methods=["GET"])
+def download_profile(profile_id):
+    """One profile's collapsed stacks, for flamegraph.pl or speedscope"""
+    if not debug_authorized():
+        return jsonify(success=False, message="Not authorized"), 403
+    name = profile_store.folded_path(profile_id)
+    if name is None:
+        return jsonify(success=False, message="No such profile"), 404
+    return send_from_directory(os.path.abspath(PROFILE_DIR), name, mimetype="text/plain", as_attachment=True)
+
+@app.route("/debug/memory", methods=["GET"])
+def get_memory_report():
+    """Resident memory, deep sizes of each property's state and caches, and top allocators"""
+    if not debug_authorized():
+        return jsonify(success=False, message="Not authorized"), 403
+    start = time.perf_counter()
+    tracing = request.args.get("tracemalloc")
+    if tracing == "start":
+        allocation_tracker.start(TRACEMALLOC_FRAMES or 1)
+    elif tracing == "stop":
+        allocation_tracker.stop()
+    
+    rss = resident_bytes()
+    properties = {property_id: state_memory(shard) for property_id, shard in property_shards.loaded().items()}
+    return jsonify(
+        success=True, rss_bytes=rss, limit_bytes=memory_watch.limit_bytes, level=memory_watch.check(rss),
+        properties=properties, tracemalloc=allocation_tracker.report(),
+        seconds=round(time.perf_counter() - start, 4))
+
+def initial_state(today):
+    """What the page needs for its first paint: the room grid, totals, and today's logs and bookings"""
+    return {
+        "version": _sync_status["version"],
+        "property": current_shard().config.property_id,
+        "date": today,
+        "rooms": rooms,
+        "totals": totals,
+        "logs": {log_type: [entry for entry in entries if entry.get("date") == today]
+                 for log_type, entries in logs.items()},
+        "bookings": [dict(booking, booking_id=booking_id) for booking_id, booking in bookings.items()
+                     if booking.get("status") != "cancelled"
+                     and (booking.get("check_in_date") or "")[:10] <= today <= (booking.get("check_out_date") or "")[:10]]
+    }
+
 @app.route("/")
 def index():
-    """Serve the main page"""
-    return render_template("index.html")
+    """Serve the main page with its initial state; /?property=<id> switches this browser to another property"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    page = cached_for_version(("index", today), lambda: render_template(
+        "index.html", initial_state=fast_json.dumps_html(initial_state(today))))
+    response = app.make_response(page)
+    if request.args.get("property"):
+        response.set_cookie(PROPERTY_COOKIE, g.property_id, max_age=365 * 24 * 3600, samesite="Lax")
+    return response
+
+@app.route("/properties", methods=["GET"])
+def list_properties():
+    """Properties this deployment serves, which one is selected and which are in memory"""
+    loaded = property_shards.loaded()
+    properties = []
+    for property_id, config in property_configs.items():
+        item = config.describe()
+        item["loaded"] = property_id in loaded
+        if item["loaded"]:
+            item["source"] = loaded[property_id].sync_status["source"]
+            item["unsynced_changes"] = loaded[property_id].sync_status["dirty"]
+        properties.append(item)
+    return jsonify(success=True, current=g.property_id, default=DEFAULT_PROPERTY, properties=properties)
 
 @app.route("/static/<path:path>")
 def serve_static(path):
     """Serve static files"""
     return send_from_directory("static", path)
 
+@app.route("/sw.js")
+def service_worker():
+    """Serve the service worker from the root so it controls the whole app"""
+    response = send_from_directory("static", "sw.js")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 @app.route("/uploads/<path:filename>")
 def uploaded_file(filename):
     """Serve uploaded files"""
@@ -437,6 +1323,7 @@ def upload_photo():
 def upload_to_drive(file_path, file_name):
     """Upload a file to Google Drive with enhanced error handling and debugging"""
     logger.info(f"Starting upload to Drive: {file_name}")
+    drive_folder_id = current_shard().config.drive_folder_id
     
     try:
         # Get Google Drive service
@@ -448,16 +1335,16 @@ def upload_to_drive(file_path, file_name):
             
         # Verify Drive folder exists
         try:
-            folder = drive_service.files().get(fileId=DRIVE_FOLDER_ID).execute()
+            folder = execute_google_request(drive_service.files().get(fileId=drive_folder_id), "drive.files.get")
             logger.info(f"Target Drive folder verified: {folder.get('name', 'unknown')}")
         except Exception as e:
-            logger.error(f"Error verifying Drive folder {DRIVE_FOLDER_ID}: {str(e)}")
+            logger.error(f"Error verifying Drive folder {drive_folder_id}: {str(e)}")
             return None
         
         # Prepare file metadata
         file_metadata = {
             'name': file_name,
-            'parents': [DRIVE_FOLDER_ID]
+            'parents': [drive_folder_id]
         }
         
         # Check if file exists
@@ -465,14 +1352,15 @@ def upload_to_drive(file_path, file_name):
             logger.error(f"File not found: {file_path}")
             return None
             
-        logger.info(f"Uploading file {file_path} to Drive folder {DRIVE_FOLDER_ID}")
+        logger.info(f"Uploading file {file_path} to Drive folder {drive_folder_id}")
         
         # Upload the file
+        from googleapiclient.http import MediaFileUpload
         media = MediaFileUpload(file_path, resumable=True)
-        file = drive_service.files().create(
+        file = execute_google_request(drive_service.files().create(
             body=file_metadata,
             media_body=media,
-            fields='id,webContentLink').execute()
+            fields='id,webContentLink'), "drive.files.create")
         
         # Make the file publicly accessible
         permission = {
@@ -481,9 +1369,9 @@ def upload_to_drive(file_path, file_name):
         }
         
         logger.info(f"Setting public permission for file ID: {file.get('id')}")
-        drive_service.permissions().create(
+        execute_google_request(drive_service.permissions().create(
             fileId=file.get('id'),
-            body=permission).execute()
+            body=permission), "drive.permissions.create")
         
         # Return the public link
         logger.info(f"Upload successful, webContentLink: {file.get('webContentLink')}")
@@ -527,21 +1415,35 @@ def checkin():
         rooms[room]["balance"] = balance
         rooms[room]["add_ons"] = []
         rooms[room]["renewal_count"] = 0
+        guest_directory.add_room_stay(room, rooms[room])
+        occupancy_grid.update_room(room, rooms[room])
+        
+        # Walk-in check-ins are kept so occupancy can be reported later
+        logs.setdefault("checkins", []).append({
+            "room": room,
+            "name": guest["name"],
+            "amount": price,
+            "time": datetime.now().strftime("%H:%M"),
+            "date": datetime.now().strftime("%Y-%m-%d")
+        })
+        search_index.add_log("checkins", len(logs["checkins"]) - 1, logs["checkins"][-1])
         
         # Log payment if any
         if amount_paid > 0:
-            logs[payment].append({
+            payment_log = {
                 "room": room, 
                 "name": guest["name"], 
                 "amount": amount_paid, 
                 "time": datetime.now().strftime("%H:%M"),
                 "date": datetime.now().strftime("%Y-%m-%d")
-            })
+            }
+            append_log(payment, payment_log)
+            shift_ledger.add(payment, payment_log)
             totals[payment] += amount_paid
         
         # Log balance if any
         if balance > 0:
-            logs["balance"].append({
+            append_log("balance", {
                 "room": room, 
                 "name": guest["name"], 
                 "amount": balance,
@@ -576,13 +1478,15 @@ def checkout():
             current_balance = rooms[room]["balance"]
             
             # Log the payment
-            logs[payment_mode].append({
+            payment_log = {
                 "room": room, 
                 "name": rooms[room]["guest"]["name"], 
                 "amount": amount, 
                 "time": datetime.now().strftime("%H:%M"),
                 "date": datetime.now().strftime("%Y-%m-%d")
-            })
+            }
+            append_log(payment_mode, payment_log)
+            shift_ledger.add(payment_mode, payment_log)
             totals[payment_mode] += amount
             
             # Update balance
@@ -637,7 +1541,8 @@ def checkout():
             # Update logs and totals
             if "refunds" not in logs:
                 logs["refunds"] = []
-            logs["refunds"].append(refund_log)
+            append_log("refunds", refund_log)
+            shift_ledger.add("refunds", refund_log)
             
             rooms[room]["balance"] += amount
             
@@ -675,7 +1580,8 @@ def checkout():
                 
                 if "refunds" not in logs:
                     logs["refunds"] = []
-                logs["refunds"].append(refund_log)
+                append_log("refunds", refund_log)
+                shift_ledger.add("refunds", refund_log)
                 
                 if "refunds" not in totals:
                     totals["refunds"] = 0
@@ -692,6 +1598,7 @@ def checkout():
                 "balance": 0, 
                 "add_ons": []
             }
+            occupancy_grid.update_room(room, rooms[room])
             
             save_data({"rooms": rooms, "logs": logs, "totals": totals, "bookings": bookings, 
                       "last_rent_check": data.get("last_rent_check")})
@@ -728,7 +1635,7 @@ def add_on():
         
         # Handle immediate payment
         if payment_method in ["cash", "online"]:
-            logs[payment_method].append({
+            payment_log = {
                 "room": room,
                 "name": rooms[room]["guest"]["name"],
                 "amount": price,
@@ -736,14 +1643,16 @@ def add_on():
                 "date": datetime.now().strftime("%Y-%m-%d"),
                 "item": item,
                 "payment_method": payment_method
-            })
+            }
+            append_log(payment_method, payment_log)
+            shift_ledger.add(payment_method, payment_log)
             totals[payment_method] += price
         else:
             # Add to balance
             rooms[room]["balance"] += price
             totals["balance"] += price
             
-            logs["balance"].append({
+            append_log("balance", {
                 "room": room,
                 "name": rooms[room]["guest"]["name"],
                 "amount": price,
@@ -771,10 +1680,305 @@ def add_on():
         logger.error(f"Error adding add-on: {str(e)}")
         return jsonify(success=False, message=f"Error adding add-on: {str(e)}")
 
+# ----- ENCODED RESPONSES -----
+# Recent logs encoded by day, so closed days aren't re-encoded on every change
+log_fragments = LocalProxy(lambda: current_shard().log_fragments)
+
+def json_body(body):
+    """Response for an already encoded JSON body"""
+    return app.response_class(body, mimetype="application/json")
+
+def cached_for_version(key, compute):
+    """Result of compute() for the current state, computed only after a change
+
+    key is a name, or a tuple of a name and the request's parameters.
+    Identical requests arriving while it is being computed wait for that
+    computation instead of starting their own.
+    """
+    # Read the version first, so a change made while computing leaves the result stale
+    return current_shard().read_cache.get(key, _sync_status["version"], compute)
+
+def recent_since(today):
+    """First day of the logs /get_data sends whole"""
+    return (today - timedelta(days=RECENT_LOG_DAYS - 1)).isoformat()
+
+def recent_log_keys(today):
+    """Log index keys of the entries the front desk works from, in time order: the
+    last RECENT_LOG_DAYS days, and everything since check-in for the guests in house,
+    which checkout lists"""
+    keys = set(log_index.keys(logs, start_date=recent_since(today)))
+    for number, room in rooms.items():
+        if room.get("status") == "occupied" and room.get("checkin_time"):
+            keys.update(log_index.keys(logs, start_date=room["checkin_time"][:10], room=str(number)))
+    return sorted(keys)
+
+def recent_logs(today):
+    """The entries of recent_log_keys(), by log type"""
+    recent = {log_type: [] for log_type in logs}
+    for _, log_type, position in recent_log_keys(today):
+        recent[log_type].append(logs[log_type][position])
+    return recent
+
 @app.route("/get_data")
 def get_data():
-    """Return all data for the frontend"""
-    return jsonify(rooms=rooms, logs=logs, totals=totals)
+    """Rooms, totals and the recent logs for the frontend; older entries are paged from /logs"""
+    today = datetime.now().date()
+    return json_body(cached_for_version(("get_data", today.isoformat()), lambda: fast_json.dumps_object({
+        "rooms": fast_json.dumps(rooms),
+        "logs": log_fragments.encode(logs, recent_log_keys(today), recent_since(today), today.isoformat()),
+        "totals": fast_json.dumps(totals)
+    })))
+
+@app.route("/logs", methods=["GET"])
+def get_logs():
+    """One page of log entries, newest first unless ?order=asc, filtered by
+    ?type= (comma separated), ?from= and ?to= dates, ?room=, ?mode= and ?booking_id=
+
+    Pass the returned next_cursor as ?cursor= for the following page.
+    """
+    args = request.args
+    log_types = tuple(log_type for log_type in args.get("type", "").split(",") if log_type)
+    unknown = [log_type for log_type in log_types if log_type not in LOG_TYPES]
+    if unknown:
+        return jsonify(success=False, message=f"Unknown log type: {', '.join(unknown)}"), 400
+    start_date, end_date = args.get("from") or None, args.get("to") or None
+    try:
+        for day in (start_date, end_date):
+            if day:
+                datetime.strptime(day, "%Y-%m-%d")
+    except ValueError:
+        return jsonify(success=False, message="Dates must be YYYY-MM-DD."), 400
+    mode = args.get("mode") or None
+    if mode and mode not in PAYMENT_MODES:
+        return jsonify(success=False, message=f"Mode must be one of: {', '.join(PAYMENT_MODES)}"), 400
+    order = args.get("order", "desc")
+    if order not in ("asc", "desc"):
+        return jsonify(success=False, message="Order must be asc or desc."), 400
+    try:
+        limit = min(max(int(args.get("limit", DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify(success=False, message="Limit must be a number."), 400
+    cursor = args.get("cursor") or None
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError:
+        return jsonify(success=False, message="Invalid cursor; start again from the first page."), 400
+    room, booking_id = args.get("room") or None, args.get("booking_id") or None
+
+    def encode_page():
+        entries, next_cursor = log_index.page(logs, log_types, start_date, end_date, room, mode, booking_id,
+                                              descending=order == "desc", cursor=cursor, limit=limit)
+        return fast_json.dumps({"success": True, "entries": entries, "next_cursor": next_cursor,
+                                "version": _sync_status["version"]})
+
+    return json_body(cached_for_version(("logs", log_types, start_date, end_date, room, mode, booking_id,
+                                         order, cursor, limit), encode_page))
+
+# ----- OFFLINE REPLAY -----
+# Mutations the front desk may queue while offline, and the view that applies each
+REPLAYABLE_ENDPOINTS = {
+    "/checkin": "checkin",
+    "/checkout": "checkout",
+    "/add_on": "add_on",
+    "/add_expense": "add_expense"
+}
+
+def call_route(endpoint, view_name, body):
+    """Run a JSON route in-process, returning its status code and parsed body"""
+    with app.test_request_context(endpoint, method="POST", json=body):
+        response = app.make_response(app.view_functions[view_name]())
+    return response.status_code, response.get_json(silent=True) or {}
+
+def remember_replayed(mutation_id, outcome):
+    _replayed_mutations[mutation_id] = outcome
+    while len(_replayed_mutations) > MAX_REPLAYED_MUTATIONS:
+        _replayed_mutations.popitem(last=False)
+
+def replay_mutation(mutation, blocked_rooms, queued_checkins):
+    """Apply one queued mutation through its normal route, returning its outcome"""
+    mutation_id = str(mutation.get("id") or "")
+    endpoint = mutation.get("endpoint")
+    body = mutation.get("body") or {}
+    if not mutation_id or endpoint not in REPLAYABLE_ENDPOINTS or not isinstance(body, dict):
+        return {"id": mutation_id, "status": "rejected", "message": "Unsupported offline change"}
+    if mutation_id in _replayed_mutations:
+        return dict(_replayed_mutations[mutation_id], id=mutation_id, status="duplicate")
+    
+    room = body.get("room") if endpoint != "/add_expense" else None
+    if room is not None:
+        if room not in rooms:
+            outcome = {"status": "conflict", "message": f"Room {room} does not exist"}
+        elif room in blocked_rooms:
+            outcome = {"status": "skipped", "message": f"An earlier offline change to room {room} was not applied"}
+        elif endpoint == "/checkin":
+            outcome = None if rooms[room]["status"] == "vacant" else {
+                "status": "conflict", "message": f"Room {room} was occupied while offline"}
+        else:
+            # The change was made against a particular stay; make sure it is still the current one
+            stay = mutation.get("stay")
+            if isinstance(stay, str) and stay.startswith("queued:"):
+                stay = queued_checkins.get(stay[len("queued:"):])
+            outcome = None if rooms[room]["guest"] and rooms[room]["checkin_time"] == stay else {
+                "status": "conflict", "message": f"Room {room} changed guests while offline"}
+        if outcome:
+            blocked_rooms.add(room)
+            remember_replayed(mutation_id, outcome)
+            return dict(outcome, id=mutation_id)
+    
+    status_code, result = call_route(endpoint, REPLAYABLE_ENDPOINTS[endpoint], body)
+    if status_code == 200 and result.get("success"):
+        outcome = {"status": "applied", "message": result.get("message", "")}
+        if endpoint == "/checkin":
+            outcome["checkin_time"] = rooms[room]["checkin_time"]
+    else:
+        outcome = {"status": "failed", "message": result.get("message", f"HTTP {status_code}")}
+        if room is not None:
+            blocked_rooms.add(room)
+    remember_replayed(mutation_id, outcome)
+    return dict(outcome, id=mutation_id)
+
+@app.route("/replay", methods=["POST"])
+def replay_offline_mutations():
+    """Apply mutations queued by a client while offline, in order, with one save"""
+    try:
+        mutations = (request.json or {}).get("mutations", [])
+        if not isinstance(mutations, list):
+            return jsonify(success=False, message="mutations must be a list"), 400
+        
+        # Check-in times of queued check-ins, for later changes made against those stays
+        queued_checkins = {mutation_id: outcome["checkin_time"]
+                           for mutation_id, outcome in _replayed_mutations.items() if "checkin_time" in outcome}
+        results = []
+        blocked_rooms = set()
+        g.defer_saves = True
+        try:
+            for mutation in mutations:
+                result = replay_mutation(mutation, blocked_rooms, queued_checkins)
+                if "checkin_time" in result:
+                    queued_checkins[result["id"]] = result["checkin_time"]
+                results.append(result)
+        finally:
+            g.defer_saves = False
+        
+        if g.pop("save_pending", False):
+            save_data(full_state())
+        else:
+            # Outcomes must outlive a restart even when nothing was applied
+            save_snapshot()
+        
+        applied = sum(1 for result in results if result["status"] == "applied")
+        logger.info(f"Replayed offline changes: {applied} of {len(results)} applied")
+        return jsonify(success=True, results=results)
+    except Exception as e:
+        logger.error(f"Error replaying offline changes: {str(e)}")
+        return jsonify(success=False, message=f"Error replaying offline changes: {str(e)}")
+
+# ----- BATCHED OPERATIONS -----
+# Routes a /batch request may combine; all of them only append to the logs
+BATCHABLE_ENDPOINTS = {
+    "/checkin": "checkin",
+    "/checkout": "checkout",
+    "/add_on": "add_on",
+    "/apply_discount": "apply_discount",
+    "/renew_rent": "renew_rent",
+    "/update_checkin_time": "update_checkin_time",
+    "/add_expense": "add_expense"
+}
+MAX_BATCH_OPERATIONS = 50
+
+def capture_batch_state():
+    """What a failed batch needs to undo its changes: rooms, totals and log lengths"""
+    return {
+        "rooms": copy.deepcopy(rooms),
+        "totals": dict(totals),
+        "log_lengths": {log_type: len(entries) for log_type, entries in logs.items()}
+    }
+
+def restore_batch_state(saved):
+    rooms.clear()
+    rooms.update(saved["rooms"])
+    totals.clear()
+    totals.update(saved["totals"])
+    for log_type in list(logs):
+        if log_type in saved["log_lengths"]:
+            del logs[log_type][saved["log_lengths"][log_type]:]
+        else:
+            del logs[log_type]
+    guest_directory.rebuild(rooms, bookings, logs)
+    expense_ledger.rebuild(logs, budgets)
+    shift_ledger.rebuild(logs)
+    occupancy_grid.rebuild(rooms, bookings)
+    search_index.rebuild(bookings, logs)
+    log_fragments.clear()
+    log_index.clear()
+    # The version stays: saves were deferred and the batch held the state lock
+    # exclusively, so no read saw or cached the changes now undone
+
+@app.route("/batch", methods=["POST"])
+def batch_operations():
+    """Apply several operations in order, all or none, with one save"""
+    operations = (request.json or {}).get("operations")
+    if not isinstance(operations, list) or not operations:
+        return jsonify(success=False, message="operations must be a non-empty list"), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify(success=False, message=f"At most {MAX_BATCH_OPERATIONS} operations per batch"), 400
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get("endpoint") not in BATCHABLE_ENDPOINTS \
+                or not isinstance(operation.get("body"), dict):
+            return jsonify(success=False, message=f"Batchable endpoints: {', '.join(BATCHABLE_ENDPOINTS)}"), 400
+    
+    saved = capture_batch_state()
+    results = []
+    failed_index = None
+    g.defer_saves = True
+    try:
+        for index, operation in enumerate(operations):
+            endpoint = operation["endpoint"]
+            try:
+                status_code, result = call_route(endpoint, BATCHABLE_ENDPOINTS[endpoint], operation["body"])
+            except Exception as e:
+                status_code, result = 500, {"success": False, "message": str(e)}
+            results.append(dict(result, endpoint=endpoint))
+            if status_code != 200 or not result.get("success"):
+                failed_index = index
+                break
+    finally:
+        g.defer_saves = False
+    
+    if failed_index is not None:
+        restore_batch_state(saved)
+        g.pop("save_pending", None)
+        for result in results[:failed_index]:
+            result["rolled_back"] = True
+        results += [{"endpoint": operation["endpoint"], "success": False, "skipped": True}
+                    for operation in operations[failed_index + 1:]]
+        message = results[failed_index].get("message") or "Operation failed"
+        logger.info(f"Batch rolled back at operation {failed_index + 1} of {len(operations)}: {message}")
+        return jsonify(success=False, failed_index=failed_index, message=message, results=results)
+    
+    if g.pop("save_pending", False):
+        save_data(full_state())
+    logger.info(f"Batch of {len(operations)} operations applied with one save")
+    return jsonify(success=True, message=results[-1].get("message", ""), results=results)
+
+def encode_history(room, guest_name):
+    """A room and guest's payments, refunds, add-ons and renewals"""
+    # Filter logs for this specific room and guest
+    room_cash_logs = [log for log in logs["cash"] if log["room"] == room and log["name"] == guest_name]
+    room_online_logs = [log for log in logs["online"] if log["room"] == room and log["name"] == guest_name]
+    room_refund_logs = [log for log in logs.get("refunds", []) if log["room"] == room and log["name"] == guest_name]
+    room_addons_logs = [log for log in logs.get("add_ons", []) if log["room"] == room]
+    room_renewal_logs = [log for log in logs.get("renewals", []) if log["room"] == room and log["name"] == guest_name]
+    
+    return fast_json.dumps({
+        "success": True,
+        "cash": room_cash_logs,
+        "online": room_online_logs,
+        "refunds": room_refund_logs,
+        "addons": room_addons_logs,
+        "renewals": room_renewal_logs
+    })
 
 @app.route("/get_history", methods=["POST"])
 def get_history():
@@ -787,25 +1991,69 @@ def get_history():
         if not room or not guest_name:
             return jsonify(success=False, message="Room and guest name are required.")
         
-        # Filter logs for this specific room and guest
-        room_cash_logs = [log for log in logs["cash"] if log["room"] == room and log["name"] == guest_name]
-        room_online_logs = [log for log in logs["online"] if log["room"] == room and log["name"] == guest_name]
-        room_refund_logs = [log for log in logs.get("refunds", []) if log["room"] == room and log["name"] == guest_name]
-        room_addons_logs = [log for log in logs.get("add_ons", []) if log["room"] == room]
-        room_renewal_logs = [log for log in logs.get("renewals", []) if log["room"] == room and log["name"] == guest_name]
-        
-        return jsonify(
-            success=True, 
-            cash=room_cash_logs, 
-            online=room_online_logs,
-            refunds=room_refund_logs,
-            addons=room_addons_logs,
-            renewals=room_renewal_logs
-        )
+        return json_body(cached_for_version(("get_history", room, guest_name),
+                                             lambda: encode_history(room, guest_name)))
     except Exception as e:
         logger.error(f"Error getting history: {str(e)}")
         return jsonify(success=False, message=f"Error retrieving history: {str(e)}")
 
+@app.route("/guests/search", methods=["GET"])
+def search_guests():
+    """Find returning guests by name prefix or mobile number"""
+    try:
+        query = request.args.get("q", "").strip()
+        limit = min(int(request.args.get("limit", 10)), 50)
+        
+        if not query:
+            return jsonify(success=False, message="Search query is required.")
+        
+        guests = guest_directory.search(query, rooms, bookings, limit=limit)
+        return jsonify(success=True, guests=guests)
+    except Exception as e:
+        logger.error(f"Error searching guests: {str(e)}")
+        return jsonify(success=False, message=f"Error searching guests: {str(e)}")
+
+def search_hit(kind, reference, score, matched):
+    """A search result with the fields the front desk needs to recognise it"""
+    hit = {"kind": kind, "score": score, "matched": matched}
+    if kind == "booking":
+        booking = bookings.get(reference, {})
+        hit.update({field: booking.get(field, "") for field in (
+            "guest_name", "guest_mobile", "room", "check_in_date", "check_out_date", "status", "notes",
+            "cancellation_reason")}, booking_id=reference)
+    elif kind == "expense":
+        entry = logs["expenses"][reference]
+        hit.update({field: entry.get(field, "") for field in (
+            "date", "time", "category", "description", "amount", "payment_method", "expense_type")})
+    else:
+        entry = logs["checkins"][reference]
+        hit.update({field: entry.get(field, "") for field in ("name", "room", "date", "time", "amount")})
+    return hit
+
+@app.route("/search", methods=["GET"])
+def search_records():
+    """Ranked full-text search over booking notes and names, expenses and walk-in stays
+
+    ?kind= limits the results to booking, expense or stay (comma separated).
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify(success=False, message="Search query is required."), 400
+    kinds = tuple(kind for kind in request.args.get("kind", "").split(",") if kind) or DOCUMENT_KINDS
+    unknown = [kind for kind in kinds if kind not in DOCUMENT_KINDS]
+    if unknown:
+        return jsonify(success=False, message=f"Kind must be one of: {', '.join(DOCUMENT_KINDS)}"), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify(success=False, message="Limit must be a number."), 400
+
+    def encode_results():
+        hits = [search_hit(*match) for match in search_index.search(query, kinds, limit)]
+        return fast_json.dumps({"success": True, "query": query, "results": hits})
+
+    return json_body(cached_for_version(("search", query, kinds, limit), encode_results))
+
 @app.route("/renew_rent", methods=["POST"])
 def renew_rent():
     """Renew rent for a room"""
@@ -838,10 +2086,10 @@ def renew_rent():
             "day": renewal_count + 1
         }
         
-        logs["balance"].append(renewal_log)
+        append_log("balance", renewal_log)
         
         if "renewals" in logs:
-            logs["renewals"].append(renewal_log)
+            append_log("renewals", renewal_log)
         
         save_data({"rooms": rooms, "logs": logs, "totals": totals, "bookings": bookings, 
                   "last_rent_check": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
@@ -871,6 +2119,7 @@ def update_checkin_time():
         
         # Update the checkin time
         rooms[room]["checkin_time"] = new_checkin_time
+        occupancy_grid.update_room(room, rooms[room])
         
         save_data({"rooms": rooms, "logs": logs, "totals": totals, "bookings": bookings, 
                   "last_rent_check": data.get("last_rent_check")})
@@ -881,34 +2130,38 @@ def update_checkin_time():
         logger.error(f"Error updating check-in time: {str(e)}")
         return jsonify(success=False, message=f"Error updating check-in time: {str(e)}")
 
+def encode_room_numbers():
+    """Every room number, sorted by floor and number, and grouped by floor"""
+    # Return a list of all room numbers for autocomplete
+    room_numbers = list(rooms.keys())
+    
+    # Sort rooms by floor and number
+    def room_sort_key(room_num):
+        # Second floor rooms (start with 2)
+        if room_num.startswith('2'):
+            return 2, int(room_num)
+        # First floor rooms
+        else:
+            return 1, int(room_num)
+    
+    room_numbers.sort(key=room_sort_key)
+    
+    # Group by floor
+    first_floor = [r for r in room_numbers if not r.startswith('2')]
+    second_floor = [r for r in room_numbers if r.startswith('2')]
+    
+    return fast_json.dumps({
+        "success": True,
+        "rooms": room_numbers,
+        "first_floor": first_floor,
+        "second_floor": second_floor
+    })
+
 @app.route("/get_room_numbers", methods=["GET"])
 def get_room_numbers():
     """Get all room numbers for the frontend"""
     try:
-        # Return a list of all room numbers for autocomplete
-        room_numbers = list(rooms.keys())
-        
-        # Sort rooms by floor and number
-        def room_sort_key(room_num):
-            # Second floor rooms (start with 2)
-            if room_num.startswith('2'):
-                return 2, int(room_num)
-            # First floor rooms
-            else:
-                return 1, int(room_num)
-        
-        room_numbers.sort(key=room_sort_key)
-        
-        # Group by floor
-        first_floor = [r for r in room_numbers if not r.startswith('2')]
-        second_floor = [r for r in room_numbers if r.startswith('2')]
-        
-        return jsonify(
-            success=True,
-            rooms=room_numbers,
-            first_floor=first_floor,
-            second_floor=second_floor
-        )
+        return json_body(cached_for_version("get_room_numbers", encode_room_numbers))
     except Exception as e:
         logger.error(f"Error retrieving room numbers: {str(e)}")
         return jsonify(success=False, message=f"Error retrieving room numbers: {str(e)}")
@@ -928,7 +2181,7 @@ def add_room():
         # Add the new room
         rooms[room_number] = {"status": "vacant", "guest": None, "checkin_time": None, "balance": 0, "add_ons": []}
         
-        save_data({"rooms": rooms, "logs": logs, "totals": totals, "last_rent_check": data.get("last_rent_check")})
+        save_data({"rooms": rooms, "logs": logs, "totals": totals, "bookings": bookings, "last_rent_check": data.get("last_rent_check")})
         logger.info(f"New room {room_number} added")
         return jsonify(success=True, message=f"Room {room_number} added successfully")
         
@@ -996,7 +2249,7 @@ def apply_discount():
         })
         
         # Save data
-        save_data({"rooms": rooms, "logs": logs, "totals": totals, "last_rent_check": data.get("last_rent_check")})
+        save_data({"rooms": rooms, "logs": logs, "totals": totals, "bookings": bookings, "last_rent_check": data.get("last_rent_check")})
         logger.info(f"Discount of ₹{amount} applied to room {room}, reason: {reason}")
         
         return jsonify(success=True, message=f"Discount of ₹{amount} applied successfully.")
@@ -1029,6 +2282,9 @@ def transfer_room():
         
         # Clear old room
         rooms[old_room] = {"status": "vacant", "guest": None, "checkin_time": None, "balance": 0, "add_ons": []}
+        guest_directory.add_room_stay(new_room, rooms[new_room])
+        occupancy_grid.update_room(old_room, rooms[old_room])
+        occupancy_grid.update_room(new_room, rooms[new_room])
         
         # Update log entries to point to the new room
         for log_type in ["cash", "online", "balance", "add_ons", "refunds", "renewals"]:
@@ -1038,6 +2294,8 @@ def transfer_room():
                         log["room"] = new_room
                         log["room_shifted"] = True
                         log["old_room"] = old_room
+        log_fragments.clear()
+        log_index.clear()
         
         # Record the room shift event
         shift_log = {
@@ -1056,7 +2314,7 @@ def transfer_room():
         logs["room_shifts"].append(shift_log)
         
         # Save the updated data
-        save_data({"rooms": rooms, "logs": logs, "totals": totals, "last_rent_check": data.get("last_rent_check")})
+        save_data({"rooms": rooms, "logs": logs, "totals": totals, "bookings": bookings, "last_rent_check": data.get("last_rent_check")})
         
         return jsonify(
             success=True, 
@@ -1082,6 +2340,8 @@ def add_expense():
         
         if not date or not category or not description or amount <= 0 or not payment_method:
             return jsonify(success=False, message="All fields are required")
+        if expense_type not in EXPENSE_TYPES:
+            return jsonify(success=False, message="Expense type must be transaction or report")
         
         # Ensure expenses log exists
         if "expenses" not in logs:
@@ -1100,6 +2360,9 @@ def add_expense():
         
         # Add to expenses log
         logs["expenses"].append(expense_entry)
+        expense_ledger.add(expense_entry)
+        search_index.add_log("expenses", len(logs["expenses"]) - 1, expense_entry)
+        shift_ledger.add("expenses", expense_entry)
         
         # Only transaction expenses affect daily totals
         if expense_type == "transaction":
@@ -1110,7 +2373,7 @@ def add_expense():
             # Update total expenses
             totals["expenses"] += amount
         
-        save_data({"rooms": rooms, "logs": logs, "totals": totals, "last_rent_check": data.get("last_rent_check")})
+        save_data({"rooms": rooms, "logs": logs, "totals": totals, "bookings": bookings, "last_rent_check": data.get("last_rent_check")})
         
         # Log the expense
         logger.info(f"Expense added: {description}, Category: {category}, Amount: ₹{amount}, Type: {expense_type}")
@@ -1120,9 +2383,94 @@ def add_expense():
         logger.error(f"Error adding expense: {str(e)}")
         return jsonify(success=False, message=f"Error adding expense: {str(e)}")
 
-# Update the reports endpoint to include expenses
+# ----- REPORTS -----
+# Log sections of a report and the logs they come from, in the order they are streamed
+REPORT_SECTIONS = [
+    ("cash_logs", "cash"),
+    ("online_logs", "online"),
+    ("expense_logs", "expenses"),
+    ("refund_logs", "refunds"),
+    ("addon_logs", "add_ons"),
+    ("renewal_logs", "renewals")
+]
+
+# Entries per NDJSON line when a report is streamed
+REPORT_CHUNK_ROWS = 500
+
+def build_report(start_date, end_date):
+    """Summary figures and log sections for [start_date, end_date]"""
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)  # Include end date
+    
+    # ISO dates compare correctly as strings, so no per-entry parsing is needed
+    sections = {}
+    for section, log_type in REPORT_SECTIONS:
+        if log_type == "expenses":
+            # Expenses come from the ledger's day index rather than a scan of every expense
+            sections[section] = expense_ledger.entries_between(start_date, end_date)
+        else:
+            sections[section] = [log for log in logs.get(log_type, [])
+                                 if start_date <= (log.get("date") or "1970-01-01")[:10] <= end_date]
+    expense_split = expense_ledger.totals_between(start_date, end_date)
+    
+    # Calculate summaries
+    cash_total = sum(log["amount"] for log in sections["cash_logs"])
+    online_total = sum(log["amount"] for log in sections["online_logs"])
+    addon_total = sum(log["price"] for log in sections["addon_logs"])
+    refund_total = sum(log["amount"] for log in sections["refund_logs"])
+    
+    # Calculate expense totals
+    transaction_expense_total = expense_split["transaction"]
+    report_expense_total = expense_split["report"]
+    
+    # Proper way to count check-ins from existing rooms
+    checkins = 0
+    for room_info in rooms.values():
+        if room_info["checkin_time"]:
+            try:
+                checkin_date = datetime.strptime(room_info["checkin_time"].split(" ")[0], "%Y-%m-%d")
+                if start <= checkin_date < end:
+                    checkins += 1
+            except Exception as e:
+                logger.error(f"Error parsing checkin date: {str(e)}")
+    
+    summary = {
+        "success": True,
+        "cash_total": cash_total,
+        "online_total": online_total,
+        "addon_total": addon_total,
+        "refund_total": refund_total,
+        "expense_total": transaction_expense_total + report_expense_total,
+        "transaction_expense_total": transaction_expense_total,
+        "report_expense_total": report_expense_total,
+        "total_revenue": cash_total + online_total - refund_total - transaction_expense_total,
+        "checkins": checkins,
+        "renewals": len(sections["renewal_logs"]),
+        "expense_categories": expense_ledger.categories_between(start_date, end_date)
+    }
+    return summary, sections
+
+def iter_report_lines(summary, sections):
+    """NDJSON report: the summary, then each section in chunks, then an end marker"""
+    counts = {section: len(entries) for section, entries in sections.items()}
+    yield fast_json.dumps(dict(summary, type="summary", counts=counts)) + b"\n"
+    for section, _ in REPORT_SECTIONS:
+        entries = sections[section]
+        for start in range(0, len(entries), REPORT_CHUNK_ROWS):
+            yield fast_json.dumps({"type": "logs", "section": section,
+                                   "entries": entries[start:start + REPORT_CHUNK_ROWS]}) + b"\n"
+    yield b'{"type":"end"}\n'
+
+def iter_gzip(chunks):
+    """Gzip a stream, flushing after each chunk so the client can decode as it arrives"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
 @app.route("/reports", methods=["POST"])
 def get_reports():
+    """Report for a date range, as one JSON body or streamed as NDJSON when asked for"""
     try:
         data_json = request.json
         start_date = data_json.get("start_date")
@@ -1131,87 +2479,277 @@ def get_reports():
         if not start_date or not end_date:
             return jsonify(success=False, message="Start and end dates are required.")
         
-        start = datetime.strptime(start_date, "%Y-%m-%d")
-        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)  # Include end date
-        
-        # Filter logs by date range
-        cash_logs = [log for log in logs["cash"] if start <= datetime.strptime(log.get("date", "1970-01-01"), "%Y-%m-%d") < end]
-        online_logs = [log for log in logs["online"] if start <= datetime.strptime(log.get("date", "1970-01-01"), "%Y-%m-%d") < end]
-        add_on_logs = [log for log in logs["add_ons"] if start <= datetime.strptime(log.get("date", "1970-01-01"), "%Y-%m-%d") < end]
-        refund_logs = [log for log in logs.get("refunds", []) if start <= datetime.strptime(log.get("date", "1970-01-01"), "%Y-%m-%d") < end]
-        renewal_logs = [log for log in logs.get("renewals", []) if start <= datetime.strptime(log.get("date", "1970-01-01"), "%Y-%m-%d") < end]
-        
-        # Filter expense logs
-        expense_logs = logs.get("expenses", [])
-        filtered_expense_logs = [log for log in expense_logs if start <= datetime.strptime(log.get("date", "1970-01-01"), "%Y-%m-%d") < end]
-        
-        # Calculate summaries
-        cash_total = sum(log["amount"] for log in cash_logs)
-        online_total = sum(log["amount"] for log in online_logs)
-        addon_total = sum(log["price"] for log in add_on_logs)
-        refund_total = sum(log["amount"] for log in refund_logs)
-        
-        # Calculate expense totals
-        transaction_expense_total = sum(log["amount"] for log in filtered_expense_logs if log.get("expense_type") == "transaction")
-        report_expense_total = sum(log["amount"] for log in filtered_expense_logs if log.get("expense_type") == "report")
-        total_expense = transaction_expense_total + report_expense_total
-        
-        # Count check-ins during this period
-        checkins = 0
-        renewals = len(renewal_logs)
-        
-        # Proper way to count check-ins from existing rooms
-        for room_info in rooms.values():
-            if room_info["checkin_time"]:
-                try:
-                    checkin_date = datetime.strptime(room_info["checkin_time"].split(" ")[0], "%Y-%m-%d")
-                    if start <= checkin_date < end:
-                        checkins += 1
-                except Exception as e:
-                    logger.error(f"Error parsing checkin date: {str(e)}")
-        
-        return jsonify(
-            success=True,
-            cash_total=cash_total,
-            online_total=online_total,
-            addon_total=addon_total,
-            refund_total=refund_total,
-            expense_total=total_expense,
-            transaction_expense_total=transaction_expense_total,
-            report_expense_total=report_expense_total,
-            total_revenue=cash_total + online_total - refund_total - transaction_expense_total,
-            checkins=checkins,
-            renewals=renewals,
-            cash_logs=cash_logs,
-            online_logs=online_logs,
-            addon_logs=add_on_logs,
-            refund_logs=refund_logs,
-            renewal_logs=renewal_logs,
-            expense_logs=filtered_expense_logs
-        )
+        summary, sections = cached_for_version(("reports", start_date, end_date),
+                                               lambda: build_report(start_date, end_date))
     
     except Exception as e:
         logger.error(f"Error generating report: {str(e)}")
         return jsonify(success=False, message=f"Error generating report: {str(e)}")
     
+    if "application/x-ndjson" not in request.headers.get("Accept", ""):
+        return json_body(cached_for_version(("reports.json", start_date, end_date),
+                                            lambda: fast_json.dumps(dict(summary, **sections))))
+    
+    # The sections are already filtered into their own lists, so the stream
+    # doesn't need the state lock once this view returns
+    body = iter_report_lines(summary, sections)
+    headers = {"Cache-Control": "no-store", "Vary": "Accept, Accept-Encoding", "X-Accel-Buffering": "no"}
+    if request.accept_encodings["gzip"]:
+        body = iter_gzip(body)
+        headers["Content-Encoding"] = "gzip"
+    return app.response_class(body, mimetype="application/x-ndjson", headers=headers)
+
+@app.route("/state_at", methods=["GET"])
+def get_state_at():
+    """Rooms and totals as they stood at ?ts=, optionally for one ?room="""
+    try:
+        moment = datetime.fromisoformat(request.args.get("ts", "").strip())
+    except ValueError:
+        return jsonify(success=False, message="ts must be a date and time, e.g. 2026-10-18T21:00"), 400
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    
+    state = current_shard().history.state_at(moment)
+    if state is None:
+        return jsonify(success=False, message="No state history recorded before that time"), 404
+    room_number = request.args.get("room")
+    if room_number:
+        if room_number not in state["rooms"]:
+            return jsonify(success=False, message=f"Room {room_number} did not exist at that time"), 404
+        state["rooms"] = {room_number: state["rooms"][room_number]}
+    return json_body(fast_json.dumps(dict(state, success=True, ts=timestamp(moment))))
+
+
+@app.route("/expenses/summary", methods=["GET"])
+def get_expense_summary():
+    """Expense rollups for a month, with each category's spend against its budget"""
+    month = request.args.get("month") or datetime.now().strftime("%Y-%m")
+    try:
+        datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        return jsonify(success=False, message="Month must be YYYY-MM."), 400
+    return jsonify(success=True, **expense_ledger.summary(month))
+
+@app.route("/expenses/budget", methods=["POST"])
+def set_expense_budget():
+    """Set a category's monthly budget; an amount of 0 removes it"""
+    try:
+        data_json = request.json or {}
+        category = (data_json.get("category") or "").strip()
+        amount = int(data_json.get("amount", 0))
+        if not category or amount < 0:
+            return jsonify(success=False, message="A category and a non-negative amount are required")
+        
+        if amount:
+            budgets[category] = amount
+        else:
+            budgets.pop(category, None)
+        expense_ledger.set_budget(category, amount)
+        save_data(full_state())
+        
+        logger.info(f"Expense budget for {category} set to ₹{amount}")
+        return jsonify(success=True, message=f"Budget for {category} updated")
+    except Exception as e:
+        logger.error(f"Error setting expense budget: {str(e)}")
+        return jsonify(success=False, message=f"Error setting expense budget: {str(e)}")
+
+
+@app.route("/shift", methods=["GET"])
+def get_current_shift():
+    """Money taken and paid out in the shift in progress, and the cash the drawer should hold"""
+    return jsonify(success=True, shift=shift_ledger.current())
+
+@app.route("/shift/close", methods=["POST"])
+def close_shift():
+    """Hand over: freeze the open shift into a summary and start the next one"""
+    try:
+        data_json = request.json or {}
+        closed_by = (data_json.get("closed_by") or "").strip()
+        if not closed_by:
+            return jsonify(success=False, message="Who is closing the shift is required")
+        counted_cash = data_json.get("counted_cash")
+        counted_cash = int(counted_cash) if counted_cash not in (None, "") else None
+        
+        summary = shift_ledger.close(logs, datetime.now().strftime("%Y-%m-%d %H:%M"), closed_by,
+                                     handed_to=(data_json.get("handed_to") or "").strip(),
+                                     counted_cash=counted_cash, note=data_json.get("note", ""))
+        logs.setdefault("shifts", []).append(to_log_entry(summary))
+        save_data(full_state())
+        
+        logger.info(f"Shift closed by {closed_by}: net cash ₹{summary['net_cash']}, "
+                    f"expected in drawer ₹{summary['expected_cash']}")
+        return jsonify(success=True, shift=summary)
+    except Exception as e:
+        logger.error(f"Error closing shift: {str(e)}")
+        return jsonify(success=False, message=f"Error closing shift: {str(e)}")
+
+@app.route("/shifts", methods=["GET"])
+def list_shifts():
+    """Closed shifts, most recent first"""
+    try:
+        limit = max(int(request.args.get("limit", 20)), 1)
+    except ValueError:
+        return jsonify(success=False, message="Limit must be a number."), 400
+    closed = logs.get("shifts", [])
+    return jsonify(success=True, shifts=[from_log_entry(entry) for entry in reversed(closed[-limit:])])
+
+
+# Occupancy matrices, rebuilt only when the state has changed since they were built
+_occupancy_cache = LocalProxy(lambda: current_shard().occupancy_cache)
+
+def occupancy_index():
+    version = _sync_status["version"]
+    if _occupancy_cache["version"] != version:
+        start = time.perf_counter()
+        _occupancy_cache["index"] = OccupancyIndex(rooms, bookings, logs)
+        _occupancy_cache["version"] = version
+        logger.info(f"Occupancy index rebuilt in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return _occupancy_cache["index"]
+
+@app.route("/analytics/kpis", methods=["GET"])
+def get_kpis():
+    """Occupancy rate, ADR and RevPAR for a date range"""
+    start_date = request.args.get("start_date", "")
+    end_date = request.args.get("end_date", "")
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify(success=False, message="Start and end dates are required (YYYY-MM-DD)."), 400
+    if end < start:
+        return jsonify(success=False, message="Start date must be before end date."), 400
+    
+    # Daily points up to about two months, monthly beyond that
+    granularity = request.args.get("granularity") or ("day" if (end - start).days <= 62 else "month")
+    if granularity not in ["day", "month"]:
+        return jsonify(success=False, message="Granularity must be day or month."), 400
+    
+    try:
+        return jsonify(success=True, **occupancy_index().kpis(start_date, end_date, granularity))
+    except Exception as e:
+        logger.error(f"Error computing KPIs: {str(e)}")
+        return jsonify(success=False, message=f"Error computing KPIs: {str(e)}")
+
+@app.route("/export", methods=["GET"])
+def export_transactions():
+    """Stream transaction logs for a date range as CSV or XLSX"""
+    start_date = request.args.get("start_date", "")
+    end_date = request.args.get("end_date", "")
+    export_format = request.args.get("format", "csv").lower()
+    try:
+        datetime.strptime(start_date, "%Y-%m-%d")
+        datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify(success=False, message="Start and end dates are required (YYYY-MM-DD)."), 400
+    if export_format not in ["csv", "xlsx"]:
+        return jsonify(success=False, message="Format must be csv or xlsx."), 400
+
+    log_types = EXPORT_LOG_TYPES
+    if request.args.get("types"):
+        allowed = EXPORT_LOG_TYPES + OPTIONAL_EXPORT_LOG_TYPES
+        log_types = [t for t in request.args["types"].split(",") if t in allowed]
+        if not log_types:
+            return jsonify(success=False, message=f"Types must be among: {', '.join(allowed)}"), 400
+
+    # The body is sent after this view returns, outside the request's property and
+    # state lock, so it reads this property's entries as they stand now
+    shard_logs = current_shard().logs
+    rows = iter_export_rows({log_type: list(shard_logs.get(log_type, [])) for log_type in log_types},
+                            start_date, end_date, log_types)
+    if export_format == "xlsx":
+        body = iter_xlsx(rows)
+        mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        body = iter_csv(rows)
+        mimetype = "text/csv; charset=utf-8"
+
+    logger.info(f"Export started: {export_format} from {start_date} to {end_date}")
+    return app.response_class(body, mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="transactions_{start_date}_{end_date}.{export_format}"',
+        "Cache-Control": "no-store",
+        # Let reverse proxies pass chunks through as they are produced
+        "X-Accel-Buffering": "no"
+    })
+
+def flush_import_chunk(new_bookings, new_transactions):
+    """Persist an imported chunk to the local snapshot and mark it for the Sheets push"""
+    shard = current_shard()
+    _sync_status["mutations"] += 1
+    _sync_status["version"] += 1
+    _sync_status["dirty"] = True
+    if shard.synced_rows is None:
+        _, shard.synced_rows = build_sheet_rows(full_state())
+    else:
+        # Imported records are only ever added, so their rows are appended to the last ones
+        new_logs = {}
+        for log_type, entry in new_transactions:
+            new_logs.setdefault(log_type, []).append(entry)
+        _, new_rows = build_sheet_rows({"rooms": {}, "logs": new_logs, "bookings": dict(new_bookings)},
+                                       partial=True)
+        for sheet, sheet_rows in new_rows.items():
+            shard.synced_rows[sheet].extend(sheet_rows)
+    save_snapshot()
+
+@app.route("/import", methods=["POST"])
+def import_records():
+    """Import historical bookings and transactions from a CSV or JSONL body or upload"""
+    upload = request.files.get("file")
+    stream = upload.stream if upload else request.stream
+    import_format = (request.args.get("format") or bulk_import.detect_format(
+        upload.filename if upload else "", request.content_type))
+    if import_format not in bulk_import.CONTENT_TYPES:
+        return jsonify(success=False, message="Format must be csv or jsonl."), 400
+    dry_run = request.args.get("dry_run") in ("1", "true")
+    
+    start = time.perf_counter()
+    summary = bulk_import.ImportSummary(dry_run)
+    duplicates = bulk_import.DuplicateIndex(bookings, logs)
+    try:
+        for chunk in bulk_import.chunked(bulk_import.iter_records(stream, import_format)):
+            new_bookings, new_transactions = bulk_import.validate_chunk(chunk, duplicates, rooms, summary)
+            if dry_run or not (new_bookings or new_transactions):
+                continue
+            for booking_id, booking in new_bookings:
+                bookings[booking_id] = booking
+                guest_directory.add_booking(booking_id, booking)
+                occupancy_grid.update_booking(booking_id, booking)
+                search_index.update_booking(booking_id, booking)
+            for log_type, entry in new_transactions:
+                logs.setdefault(log_type, []).append(entry)
+                search_index.add_log(log_type, len(logs[log_type]) - 1, entry)
+                if log_type in STAY_LOG_TYPES:
+                    guest_directory.add_log(log_type, entry)
+                elif log_type == "expenses":
+                    expense_ledger.add(entry)
+            flush_import_chunk(new_bookings, new_transactions)
+    except (UnicodeDecodeError, csv.Error) as e:
+        logger.error(f"Import stopped after {summary.rows} rows: {str(e)}")
+        return jsonify(success=False, message=f"Could not read the file: {str(e)}", **summary.as_dict()), 400
+    except Exception as e:
+        logger.error(f"Error importing records: {str(e)}")
+        return jsonify(success=False, message=f"Error importing records: {str(e)}", **summary.as_dict())
+    finally:
+        if summary.chunks and not dry_run and (summary.bookings or summary.transactions):
+            # Everything imported so far goes to Sheets in a single save
+            save_data(full_state())
+    
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(f"Imported {summary.bookings} bookings and {sum(summary.transactions.values())} transactions "
+                f"from {summary.rows} rows in {elapsed_ms:.0f} ms ({summary.duplicates} duplicates, "
+                f"{summary.invalid} invalid{', dry run' if dry_run else ''})")
+    return jsonify(success=True, elapsed_ms=round(elapsed_ms, 1), **summary.as_dict())
+    
+def encode_bookings():
+    """Bookings as a list, most recent check-in first, each with its id"""
+    bookings_list = [dict(booking, booking_id=booking_id) for booking_id, booking in bookings.items()]
+    bookings_list.sort(key=lambda b: b.get("check_in_date", ""), reverse=True)
+    return fast_json.dumps({"success": True, "bookings": bookings_list})
+
 # Get all future bookings
 @app.route("/get_bookings", methods=["GET"])
 def get_bookings():
     try:
-        # Load bookings from data
-        bookings = data.get("bookings", {})
-        
-        # Convert to list for easier frontend handling
-        bookings_list = []
-        for booking_id, booking in bookings.items():
-            booking_copy = booking.copy()
-            booking_copy["booking_id"] = booking_id
-            bookings_list.append(booking_copy)
-        
-        # Sort by check-in date (most recent first)
-        bookings_list.sort(key=lambda b: b.get("check_in_date", ""), reverse=True)
-        
-        return jsonify(success=True, bookings=bookings_list)
+        return json_body(cached_for_version("get_bookings", encode_bookings))
     except Exception as e:
         logger.error(f"Error getting bookings: {str(e)}")
         return jsonify(success=False, message=f"Error getting bookings: {str(e)}")
@@ -1255,7 +2793,7 @@ def create_booking():
             payment_method = booking_data.get("payment_method", "cash")
             
             # Add to payment logs
-            logs[payment_method].append({
+            payment_log = {
                 "booking_id": booking_id,
                 "room": booking["room"],
                 "name": booking["guest_name"],
@@ -1263,7 +2801,9 @@ def create_booking():
                 "time": datetime.now().strftime("%H:%M"),
                 "date": datetime.now().strftime("%Y-%m-%d"),
                 "type": "booking_advance"
-            })
+            }
+            append_log(payment_method, payment_log)
+            shift_ledger.add(payment_method, payment_log)
             
             # Add to booking payments log specifically
             logs["booking_payments"].append({
@@ -1286,6 +2826,9 @@ def create_booking():
             data["bookings"] = {}
         
         data["bookings"][booking_id] = booking
+        guest_directory.add_booking(booking_id, booking)
+        occupancy_grid.update_booking(booking_id, booking)
+        search_index.update_booking(booking_id, booking)
         
         # Save data
         save_data(data)
@@ -1316,7 +2859,7 @@ def update_booking():
             payment_method = booking_data.get("payment_method", "cash")
             
             # Add to payment logs
-            logs[payment_method].append({
+            payment_log = {
                 "booking_id": booking_id,
                 "room": booking["room"],
                 "name": booking["guest_name"],
@@ -1324,7 +2867,9 @@ def update_booking():
                 "time": datetime.now().strftime("%H:%M"),
                 "date": datetime.now().strftime("%Y-%m-%d"),
                 "type": "booking_payment"
-            })
+            }
+            append_log(payment_method, payment_log)
+            shift_ledger.add(payment_method, payment_log)
             
             # Add to booking payments log specifically
             logs["booking_payments"].append({
@@ -1365,6 +2910,10 @@ def update_booking():
         if "status" in booking_data:
             booking["status"] = booking_data["status"]
         
+        guest_directory.add_booking(booking_id, booking)
+        occupancy_grid.update_booking(booking_id, booking)
+        search_index.update_booking(booking_id, booking)
+        
         # Save data
         save_data(data)
         
@@ -1394,7 +2943,7 @@ def cancel_booking():
             refund_method = booking_data.get("refund_method", "cash")
             
             # Log the refund
-            logs["refunds"].append({
+            refund_log = {
                 "booking_id": booking_id,
                 "room": booking["room"],
                 "name": booking["guest_name"],
@@ -1403,7 +2952,9 @@ def cancel_booking():
                 "date": datetime.now().strftime("%Y-%m-%d"),
                 "payment_mode": refund_method,
                 "note": "Booking cancellation refund"
-            })
+            }
+            append_log("refunds", refund_log)
+            shift_ledger.add("refunds", refund_log)
             
             # Update total refunds
             totals["refunds"] += refund_amount
@@ -1416,6 +2967,8 @@ def cancel_booking():
         booking["status"] = "cancelled"
         booking["cancellation_date"] = datetime.now().strftime("%Y-%m-%d")
         booking["cancellation_reason"] = booking_data.get("reason", "")
+        occupancy_grid.update_booking(booking_id, booking)
+        search_index.update_booking(booking_id, booking)
         
         # Save data
         save_data(data)
@@ -1452,7 +3005,7 @@ def convert_booking_to_checkin():
         
         if remaining_payment > 0:
             # Add payment to logs
-            logs[payment_method].append({
+            payment_log = {
                 "booking_id": booking_id,
                 "room": booking["room"],
                 "name": booking["guest_name"],
@@ -1460,7 +3013,9 @@ def convert_booking_to_checkin():
                 "time": datetime.now().strftime("%H:%M"),
                 "date": datetime.now().strftime("%Y-%m-%d"),
                 "type": "booking_final_payment"
-            })
+            }
+            append_log(payment_method, payment_log)
+            shift_ledger.add(payment_method, payment_log)
             
             # Add to booking payments log
             logs["booking_payments"].append({
@@ -1496,10 +3051,11 @@ def convert_booking_to_checkin():
         rooms[room_number]["add_ons"] = []
         rooms[room_number]["renewal_count"] = 0
         rooms[room_number]["last_renewal_time"] = None
+        guest_directory.add_room_stay(room_number, rooms[room_number])
         
         # If there's still balance, add to balance log
         if balance_after_payment > 0:
-            logs["balance"].append({
+            append_log("balance", {
                 "room": room_number,
                 "name": guest["name"],
                 "amount": balance_after_payment,
@@ -1511,6 +3067,8 @@ def convert_booking_to_checkin():
         # Update booking status
         booking["status"] = "checked_in"
         booking["check_in_time"] = datetime.now().strftime("%Y-%m-%d %H:%M")
+        occupancy_grid.update_booking(booking_id, booking)
+        occupancy_grid.update_room(room_number, rooms[room_number])
         
         # Save data
         save_data(data)
@@ -1522,6 +3080,48 @@ def convert_booking_to_checkin():
         logger.error(f"Error converting booking to check-in: {str(e)}")
         return jsonify(success=False, message=f"Error converting booking to check-in: {str(e)}")
 
+@app.route("/calendar", methods=["GET"])
+def get_calendar():
+    """Every room's state per day between two dates, run-length encoded"""
+    start = day_number(request.args.get("from", ""))
+    end = day_number(request.args.get("to", ""))
+    if start is None or end is None:
+        return jsonify(success=False, message="from and to dates are required (YYYY-MM-DD)."), 400
+    if end < start or end - start >= MAX_CALENDAR_DAYS:
+        return jsonify(success=False, message=f"The range must run forward and cover at most {MAX_CALENDAR_DAYS} days."), 400
+    
+    room_numbers = sorted(rooms, key=lambda r: (int(r) if r.isdigit() else float('inf'), r))
+    return jsonify(
+        success=True,
+        start_date=request.args["from"][:10],
+        end_date=request.args["to"][:10],
+        days=end - start + 1,
+        states={"free": 0, "booked": 1, "in_house": 2},
+        rooms=room_numbers,
+        runs=occupancy_grid.encode(room_numbers, start, end)
+    )
+
+def encode_availability(check_in, check_out, today):
+    """Rooms free for every night from check_in to check_out"""
+    # Rooms with a confirmed booking overlapping the requested nights, from the grid
+    booked_rooms = occupancy_grid.booked_rooms(check_in.toordinal(), check_out.toordinal())
+    
+    # For current occupancy, ONLY exclude rooms if check-in date is TODAY
+    if check_in.date() == today:
+        # Only check currently occupied rooms if check-in is today
+        booked_rooms |= occupancy_grid.in_house_rooms()
+    
+    # Compile available rooms (all rooms except those already booked for the requested dates)
+    available_rooms = []
+    for room_number in rooms.keys():
+        if room_number not in booked_rooms:
+            available_rooms.append(room_number)
+    
+    # Sort room numbers
+    available_rooms.sort(key=lambda r: (int(r) if r.isdigit() else float('inf'), r))
+    
+    return fast_json.dumps({"success": True, "available_rooms": available_rooms})
+
 @app.route("/check_availability", methods=["POST"])
 def check_availability():
     try:
@@ -1539,122 +3139,18 @@ def check_availability():
         except ValueError:
             return jsonify(success=False, message="Invalid date format. Use YYYY-MM-DD")
         
-        # Get all bookings that overlap with the requested date range
-        bookings = data.get("bookings", {})
-        booked_rooms = set()
-        
-        for booking_id, booking in bookings.items():
-            # Skip cancelled bookings
-            if booking.get("status") == "cancelled":
-                continue
-                
-            # Skip checked-in bookings
-            if booking.get("status") == "checked_in":
-                continue
-                
-            # Parse booking dates
-            booking_check_in = datetime.strptime(booking["check_in_date"], "%Y-%m-%d")
-            booking_check_out = datetime.strptime(booking["check_out_date"], "%Y-%m-%d")
-            
-            # Check if there's any overlap in the date ranges
-            if (check_in < booking_check_out and check_out > booking_check_in):
-                booked_rooms.add(booking["room"])
-        
-        # For current occupancy, ONLY exclude rooms if check-in date is TODAY
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        if check_in.date() == today.date():
-            # Only check currently occupied rooms if check-in is today
-            for room_number, room_info in rooms.items():
-                if room_info["status"] == "occupied":
-                    booked_rooms.add(room_number)
-        
-        # Compile available rooms (all rooms except those already booked for the requested dates)
-        available_rooms = []
-        for room_number in rooms.keys():
-            if room_number not in booked_rooms:
-                available_rooms.append(room_number)
-        
-        # Sort room numbers
-        available_rooms.sort(key=lambda r: (int(r) if r.isdigit() else float('inf'), r))
-        
-        return jsonify(success=True, available_rooms=available_rooms)
+        # Whether guests in house block the rooms depends on today's date, so it is part of the key
+        today = datetime.now().date()
+        return json_body(cached_for_version(
+            ("check_availability", check_in_date, check_out_date, today.isoformat()),
+            lambda: encode_availability(check_in, check_out, today)))
         
     except Exception as e:
         logger.error(f"Error checking availability: {str(e)}")
         return jsonify(success=False, message=f"Error checking availability: {str(e)}")
     
-# Add this to app.py - Enhanced Google API Authentication
-
-# Improved Google credentials handling
-def setup_google_credentials():
-    """Initialize and validate Google API credentials with enhanced error logging"""
-    logger.info("Setting up Google API credentials...")
-    
-    try:
-        # Try environment variable first
-        google_credentials = os.environ.get('GOOGLE_CREDENTIALS')
-        if google_credentials:
-            logger.info("Using Google credentials from environment variable")
-            try:
-                credentials_info = json.loads(google_credentials)
-                credentials = service_account.Credentials.from_service_account_info(
-                    credentials_info, scopes=SCOPES)
-                logger.info("Successfully loaded credentials from environment variable")
-                return credentials
-            except json.JSONDecodeError:
-                logger.error("Failed to parse GOOGLE_CREDENTIALS environment variable: Invalid JSON")
-            except Exception as e:
-                logger.error(f"Error creating credentials from environment variable: {str(e)}")
-        
-        # Fall back to file
-        logger.info("Trying to load credentials from service account file")
-        SERVICE_ACCOUNT_FILE = 'lodge-service-account.json'
-        if os.path.exists(SERVICE_ACCOUNT_FILE):
-            try:
-                credentials = service_account.Credentials.from_service_account_file(
-                    SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-                logger.info(f"Successfully loaded credentials from {SERVICE_ACCOUNT_FILE}")
-                return credentials
-            except Exception as e:
-                logger.error(f"Error loading credentials from file: {str(e)}")
-        else:
-            logger.error(f"Service account file {SERVICE_ACCOUNT_FILE} not found")
-        
-        logger.critical("No valid Google credentials found. API functionality will be disabled.")
-        return None
-    except Exception as e:
-        logger.critical(f"Unexpected error setting up Google credentials: {str(e)}")
-        return None
-
-# Use this to get services with proper error handling
-def get_google_services():
-    """Initialize and return Google Sheets and Drive services with better error handling"""
-    try:
-        credentials = setup_google_credentials()
-        if not credentials:
-            logger.error("Failed to obtain valid credentials")
-            return None, None
-        
-        logger.info("Initializing Google API services...")
-        try:
-            sheets_service = build('sheets', 'v4', credentials=credentials)
-            logger.info("Successfully initialized Google Sheets service")
-        except Exception as e:
-            logger.error(f"Failed to build Sheets service: {str(e)}")
-            sheets_service = None
-            
-        try:
-            drive_service = build('drive', 'v3', credentials=credentials)
-            logger.info("Successfully initialized Google Drive service")
-        except Exception as e:
-            logger.error(f"Failed to build Drive service: {str(e)}")
-            drive_service = None
-            
-        return sheets_service, drive_service
-    except Exception as e:
-        logger.error(f"Error connecting to Google services: {str(e)}")
-        return None, None
+_boot_timings["import"] = time.perf_counter() - BOOT_STARTED
+logger.info(f"App imported in {_boot_timings['import'] * 1000:.0f} ms, serving from {_sync_status['source']} state")
 
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
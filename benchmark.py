@@ -0,0 +1,355 @@
+"""Benchmark app.py routes against a local Google Sheets/Drive stand-in.
+
+Generates a synthetic lodge, loads it through the app's own loader and
+drives the hot routes through the Flask test client, reporting
+throughput, p50/p99 latency and Google API calls per request.
+
+    python benchmark.py --bookings 3000 --months 6 --latency 0.02
+    python benchmark.py --json results.json
+    python benchmark.py --baseline results.json --tolerance 0.25
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fake_google import build_fake_services
+
+FIRST_FLOOR_ROOMS = [str(i) for i in range(1, 6)] + [str(i) for i in range(13, 21)] + [str(i) for i in range(23, 28)]
+SECOND_FLOOR_ROOMS = [str(i) for i in range(200, 229)]
+
+FIRST_NAMES = ["Ravi", "Anita", "Suresh", "Priya", "Amit", "Neha", "Vikram", "Kavita", "Rahul", "Sunita",
+               "Arjun", "Meera", "Karan", "Pooja", "Sanjay", "Deepa", "Manoj", "Rekha", "Ajay", "Lata"]
+LAST_NAMES = ["Sharma", "Patil", "Kulkarni", "Deshmukh", "Joshi", "Rao", "Iyer", "Gupta", "Singh", "Naik"]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+# ----- SYNTHETIC LODGE -----
+def generate_lodge(backend, months=6, bookings=3000, occupancy=0.6, extra_rooms=0, seed=42):
+    """Fill the fake spreadsheet with rooms, months of logs and bookings"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    room_numbers = FIRST_FLOOR_ROOMS + SECOND_FLOOR_ROOMS + [str(300 + i) for i in range(extra_rooms)]
+
+    def guest_name():
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    def mobile():
+        return str(rng.randint(7000000000, 9999999999))
+
+    rooms_rows = []
+    for room in room_numbers:
+        if rng.random() < occupancy:
+            price = rng.choice([800, 1000, 1200, 1500, 2000])
+            balance = rng.choice([0, 0, price, price // 2, -100])
+            guest = {"name": guest_name(), "mobile": mobile(), "price": price, "guests": rng.randint(1, 4),
+                     "payment": "cash", "balance": max(balance, 0), "photo": None}
+            checkin = now - timedelta(hours=rng.randint(1, 72))
+            add_ons = [{"room": room, "item": "Tea", "price": 20, "time": "08:00",
+                        "date": checkin.strftime("%Y-%m-%d"), "payment_method": "balance"}]
+            rooms_rows.append([room, "occupied", json.dumps(guest), checkin.strftime("%Y-%m-%d %H:%M"),
+                               str(balance), json.dumps(add_ons)])
+        else:
+            rooms_rows.append([room, "vacant", "", "", "0", ""])
+
+    logs_rows = []
+    totals = {"cash": 0, "online": 0, "balance": 0, "refunds": 0, "advance_bookings": 0}
+    days = max(1, months * 30)
+    for day in range(days, -1, -1):
+        date = (now - timedelta(days=day)).strftime("%Y-%m-%d")
+        for _ in range(rng.randint(15, 35)):
+            log_type = rng.choice(["cash", "cash", "online", "online", "balance", "renewals", "refunds", "add_ons"])
+            amount = rng.choice([20, 100, 500, 800, 1000, 1200, 1500])
+            time_str = f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+            logs_rows.append([log_type, rng.choice(room_numbers), guest_name(), str(amount), time_str, date, ""])
+            if log_type in totals:
+                totals[log_type] += amount
+
+    bookings_rows = []
+    for index in range(bookings):
+        check_in = now + timedelta(days=rng.randint(-days, 90))
+        check_out = check_in + timedelta(days=rng.randint(1, 5))
+        total = rng.choice([1000, 2000, 3000, 4500])
+        paid = rng.choice([0, total // 2, total])
+        status = rng.choice(["confirmed", "confirmed", "confirmed", "cancelled", "checked_in"])
+        bookings_rows.append([f"bench-{index:06d}", rng.choice(room_numbers), guest_name(), mobile(),
+                              check_in.strftime("%Y-%m-%d"), check_out.strftime("%Y-%m-%d"), status,
+                              str(total), str(paid), str(total - paid), rng.choice(["cash", "online"]),
+                              rng.choice(["", "Extra mattress", "Late arrival", "Corporate"]), ""])
+        if paid:
+            totals["advance_bookings"] += paid
+
+    backend.sheets["Rooms"] = [[]] + rooms_rows
+    backend.sheets["Logs"] = [[]] + logs_rows
+    backend.sheets["Totals"] = [[]] + [[key, str(value)] for key, value in totals.items()]
+    backend.sheets["Bookings"] = [[]] + bookings_rows
+    return {"rooms": len(rooms_rows), "logs": len(logs_rows), "bookings": len(bookings_rows)}
+
+
+# ----- APP HARNESS -----
+def load_app(sheets_service, drive_service, snapshot_path):
+    """Import app.py, point it at the fakes and load the synthetic lodge"""
+    # The harness drives the load itself, against a throwaway snapshot
+    os.environ["LODGE_BACKGROUND_SYNC"] = "0"
+    os.environ["LODGE_SNAPSHOT_PATH"] = snapshot_path
+    # The stand-in has no quota, so don't pace calls to Google's
+    os.environ.setdefault("LODGE_SHEETS_READS_PER_MINUTE", "1000000")
+    os.environ.setdefault("LODGE_SHEETS_WRITES_PER_MINUTE", "1000000")
+    start = time.perf_counter()
+    import app as lodge_app
+    import_seconds = time.perf_counter() - start
+    lodge_app.get_google_services = lambda: (sheets_service, drive_service)
+    start = time.perf_counter()
+    lodge_app.replace_state(lodge_app.initialize_data())
+    return lodge_app, import_seconds, time.perf_counter() - start
+
+
+def measure_cold_load(lodge_app, backend, runs):
+    """Time repeated full loads from the sheets, as a cold start would do them"""
+    backend.reset_counts()
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        lodge_app.initialize_data()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return {
+        "runs": runs,
+        "p50_ms": percentile(durations, 50) * 1000,
+        "max_ms": durations[-1] * 1000 if durations else 0.0,
+        "api_calls_per_load": backend.total_calls() / runs if runs else 0.0
+    }
+
+
+def measure_serialization(lodge_app, runs):
+    """Time encoding a /get_data body with jsonify's encoder and with fast_json, on the same state
+
+    Both encoders are timed on every log and again on the recent logs alone,
+    which is what /get_data sends, so the encoder and the trimming are
+    measured apart; picking the recent entries out is timed on its own.
+    Last, the recent logs as /get_data encodes them: by day, with nothing
+    cached and then with the closed days already encoded.
+    """
+    import flask.json
+    import fast_json
+
+    shard = lodge_app.current_shard()
+    today = datetime.now().date()
+    full = {"rooms": shard.rooms, "logs": shard.logs, "totals": shard.totals}
+    recent = dict(full, logs=lodge_app.recent_logs(today))
+
+    def time_runs(encode):
+        durations = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            encode()
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+        return percentile(durations, 50) * 1000
+
+    with lodge_app.app.app_context():
+        timings = {f"{encoder}_{name}_ms": time_runs(lambda: encode(state))
+                   for encoder, encode in (("jsonify", flask.json.dumps), ("fast", fast_json.dumps))
+                   for name, state in (("full", full), ("recent", recent))}
+
+    def encode_by_day(fragments):
+        return fragments.encode(full["logs"], lodge_app.recent_log_keys(today), lodge_app.recent_since(today),
+                                today.isoformat())
+
+    warm = fast_json.LogFragments()
+    encode_by_day(warm)
+    return dict(timings,
+                select_recent_ms=time_runs(lambda: lodge_app.recent_logs(today)),
+                by_day_cold_ms=time_runs(lambda: encode_by_day(fast_json.LogFragments())),
+                by_day_warm_ms=time_runs(lambda: encode_by_day(warm)),
+                backend=fast_json.BACKEND,
+                entries=sum(len(entries) for entries in full["logs"].values()),
+                recent_entries=sum(len(entries) for entries in recent["logs"].values()))
+
+
+def run_requests(name, backend, calls):
+    """Time each request callable and summarize latency, errors and API calls"""
+    backend.reset_counts()
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for send in calls:
+        t0 = time.perf_counter()
+        response = send()
+        latencies.append(time.perf_counter() - t0)
+        body = response.get_json(silent=True) or {}
+        if response.status_code != 200 or body.get("success") is False:
+            errors += 1
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "scenario": name,
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": count / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": (sum(latencies) / count * 1000) if count else 0.0,
+        "api_calls": backend.total_calls(),
+        "api_calls_per_request": backend.total_calls() / count if count else 0.0,
+        "api_calls_by_operation": dict(backend.calls)
+    }
+
+
+def build_scenarios(lodge_app, iterations, rng):
+    client = lodge_app.app.test_client()
+    today = datetime.now()
+    checked_in = []
+
+    def get_data():
+        return [lambda: client.get("/get_data") for _ in range(iterations)]
+
+    def check_availability():
+        calls = []
+        for _ in range(iterations):
+            check_in = today + timedelta(days=rng.randint(0, 60))
+            payload = {"check_in_date": check_in.strftime("%Y-%m-%d"),
+                       "check_out_date": (check_in + timedelta(days=rng.randint(1, 4))).strftime("%Y-%m-%d")}
+            calls.append(lambda payload=payload: client.post("/check_availability", json=payload))
+        return calls
+
+    def reports():
+        payload = {"start_date": (today - timedelta(days=30)).strftime("%Y-%m-%d"),
+                   "end_date": today.strftime("%Y-%m-%d")}
+        return [lambda: client.post("/reports", json=payload) for _ in range(iterations)]
+
+    def checkin():
+        vacant = [room for room, info in lodge_app.rooms.items() if info["status"] == "vacant"]
+        calls = []
+        for room in vacant[:iterations]:
+            payload = {"room": room, "name": f"Bench Guest {room}", "mobile": "9000000000",
+                       "price": 1000, "guests": 2, "payment": "cash", "amountPaid": 900}
+            checked_in.append(room)
+            calls.append(lambda payload=payload: client.post("/checkin", json=payload))
+        return calls
+
+    def checkout():
+        calls = []
+        for room in checked_in:
+            # Clear the remaining balance, then vacate the room
+            calls.append(lambda room=room: client.post("/checkout", json={
+                "room": room, "payment_mode": "cash", "amount": 100}))
+            calls.append(lambda room=room: client.post("/checkout", json={
+                "room": room, "final_checkout": True}))
+        checked_in.clear()
+        return calls
+
+    return [("/get_data", get_data), ("/check_availability", check_availability), ("/reports", reports),
+            ("/checkin", checkin), ("/checkout", checkout)]
+
+
+# ----- REPORTING -----
+def print_results(dataset, loaded, import_seconds, load_seconds, cold_load, serialization, results):
+    print(f"Dataset: {dataset['rooms']} rooms, {dataset['logs']} log rows, {dataset['bookings']} bookings")
+    print(f"Loaded:  {loaded['rooms']} rooms, {loaded['logs']} log rows, {loaded['bookings']} bookings")
+    print(f"App import: {import_seconds * 1000:.1f} ms, initial load: {load_seconds * 1000:.1f} ms")
+    print(f"Cold load: p50 {cold_load['p50_ms']:.1f} ms, max {cold_load['max_ms']:.1f} ms "
+          f"over {cold_load['runs']} runs, {cold_load['api_calls_per_load']:.1f} API calls each")
+    print(f"Encoding all {serialization['entries']} log entries: jsonify {serialization['jsonify_full_ms']:.1f} ms, "
+          f"{serialization['backend']} {serialization['fast_full_ms']:.1f} ms")
+    print(f"Encoding the {serialization['recent_entries']} recent entries /get_data sends "
+          f"(picked out in {serialization['select_recent_ms']:.1f} ms): "
+          f"jsonify {serialization['jsonify_recent_ms']:.1f} ms, "
+          f"{serialization['backend']} {serialization['fast_recent_ms']:.1f} ms")
+    print(f"Encoding them by day as /get_data does: {serialization['by_day_cold_ms']:.1f} ms cold, "
+          f"{serialization['by_day_warm_ms']:.1f} ms with closed days cached")
+    header = f"{'scenario':<22}{'reqs':>6}{'err':>5}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'api/req':>9}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['scenario']:<22}{result['requests']:>6}{result['errors']:>5}"
+              f"{result['throughput_rps']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+              f"{result['api_calls_per_request']:>9.1f}")
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """Return scenarios whose p50 latency or API calls regressed beyond the tolerance"""
+    with open(baseline_path) as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["scenario"])
+        if not previous:
+            continue
+        if previous["p50_ms"] > 0 and result["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{result['scenario']}: p50 {previous['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms")
+        if result["api_calls_per_request"] > previous["api_calls_per_request"] + 1e-9:
+            regressions.append(f"{result['scenario']}: api calls/request "
+                               f"{previous['api_calls_per_request']:.1f} -> {result['api_calls_per_request']:.1f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark lodge routes against a local Sheets/Drive stand-in")
+    parser.add_argument("--months", type=int, default=6, help="months of transaction logs to generate")
+    parser.add_argument("--bookings", type=int, default=3000, help="number of bookings to generate")
+    parser.add_argument("--occupancy", type=float, default=0.6, help="fraction of rooms occupied at start")
+    parser.add_argument("--extra-rooms", type=int, default=0, help="rooms to add beyond the default layout")
+    parser.add_argument("--iterations", type=int, default=50, help="requests per read scenario")
+    parser.add_argument("--load-runs", type=int, default=5, help="full loads to time for the cold start figure")
+    parser.add_argument("--encode-runs", type=int, default=5, help="encodings of the full state to time")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency injected per API call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency per API call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--baseline", help="fail if results regress against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    # Keep per-request INFO logging out of the measurements
+    logging.disable(logging.INFO)
+
+    backend, sheets_service, drive_service = build_fake_services(
+        latency=args.latency, jitter=args.jitter, seed=args.seed)
+    dataset = generate_lodge(backend, months=args.months, bookings=args.bookings,
+                             occupancy=args.occupancy, extra_rooms=args.extra_rooms, seed=args.seed)
+    snapshot_dir = tempfile.mkdtemp(prefix="lodge-bench-")
+    lodge_app, import_seconds, load_seconds = load_app(
+        sheets_service, drive_service, os.path.join(snapshot_dir, "snapshot.bin"))
+    loaded = {"rooms": len(lodge_app.rooms), "bookings": len(lodge_app.bookings),
+              "logs": sum(len(entries) for entries in lodge_app.logs.values())}
+
+    cold_load = measure_cold_load(lodge_app, backend, args.load_runs)
+    serialization = measure_serialization(lodge_app, args.encode_runs)
+
+    rng = random.Random(args.seed)
+    results = [run_requests(name, backend, build()) for name, build in build_scenarios(lodge_app, args.iterations, rng)]
+    print_results(dataset, loaded, import_seconds, load_seconds, cold_load, serialization, results)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"dataset": dataset, "loaded": loaded, "import_ms": import_seconds * 1000,
+                       "load_ms": load_seconds * 1000, "cold_load": cold_load, "serialization": serialization,
+                       "args": vars(args),
+                       "results": results}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+"""Bulk import of historical bookings and transactions from CSV or JSONL
+
+The app exposes this as POST /import. Run this file to stream an export to
+a running server:
+
+    python bulk_import.py register.csv --url http://localhost:5000
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import urllib.request
+import uuid
+from datetime import date, datetime
+
+from guest_directory import normalize_mobile, normalize_name
+
+# Rows validated and applied together, with one flush each
+CHUNK_ROWS = 20000
+
+# Row errors returned in the summary; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Transaction logs a row may be imported into, keyed by its "type" column
+IMPORT_LOG_TYPES = ("cash", "online", "balance", "add_ons", "refunds", "renewals",
+                    "booking_payments", "checkins", "expenses")
+
+BOOKING_STATUSES = ("confirmed", "checked_in", "cancelled")
+
+# Formats tried when a date isn't ISO; register exports use day-first dates
+DATE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d", "%d.%m.%Y")
+
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+class ImportRowError(ValueError):
+    """Raised for a row that cannot be imported"""
+
+
+# ----- READING -----
+def _text_lines(stream):
+    """Decode a binary stream line by line, dropping a UTF-8 byte order mark"""
+    for number, line in enumerate(stream):
+        text = line.decode("utf-8")
+        yield text.lstrip("﻿") if number == 0 else text
+
+
+def iter_csv_records(stream):
+    """Yield (line number, row dict) for each CSV row, keyed by the lowercased header"""
+    reader = csv.reader(_text_lines(stream))
+    header = [name.strip().lower() for name in next(reader, [])]
+    for row in reader:
+        if any(cell.strip() for cell in row):
+            yield reader.line_num, dict(zip(header, row))
+
+
+def iter_jsonl_records(stream):
+    """Yield (line number, object) for each JSONL line; unparsable lines yield their error"""
+    for number, line in enumerate(_text_lines(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, ImportRowError(f"Invalid JSON: {str(e)}")
+            continue
+        if isinstance(record, dict):
+            yield number, {str(key).lower(): value for key, value in record.items()}
+        else:
+            yield number, ImportRowError("Each line must be a JSON object")
+
+
+def iter_records(stream, import_format):
+    if import_format == "jsonl":
+        return iter_jsonl_records(stream)
+    return iter_csv_records(stream)
+
+
+def detect_format(filename="", content_type=""):
+    """Guess csv or jsonl from a file name or content type"""
+    filename, content_type = (filename or "").lower(), (content_type or "").lower()
+    if filename.endswith((".jsonl", ".ndjson", ".json")) or "json" in content_type:
+        return "jsonl"
+    if filename.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    return None
+
+
+def chunked(records, size=CHUNK_ROWS):
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ----- NORMALIZING -----
+def _text(row, *names):
+    for name in names:
+        value = row.get(name)
+        if value is not None:
+            text = str(value).strip()
+            if text:
+                return text
+    return ""
+
+
+def parse_date(value, field):
+    text = str(value or "").strip()[:10]
+    try:
+        # Most exports are ISO already; this skips strptime for them
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ImportRowError(f"{field} is not a date: {value!r}")
+
+
+def parse_amount(value, field, required=True):
+    text = str(value if value is not None else "").replace(",", "").replace("₹", "").strip()
+    if not text:
+        if required:
+            raise ImportRowError(f"{field} is required")
+        return 0
+    try:
+        amount = float(text)
+    except ValueError:
+        raise ImportRowError(f"{field} is not a number: {value!r}")
+    if amount < 0:
+        raise ImportRowError(f"{field} cannot be negative")
+    return int(round(amount))
+
+
+def record_type(row):
+    """'booking' or the log type a row belongs to"""
+    kind = _text(row, "record_type", "type").lower()
+    if not kind and _text(row, "check_in_date", "check_out_date"):
+        return "booking"
+    return kind
+
+
+def normalize_booking(row, known_rooms):
+    """Build a booking from a row, returning (booking_id, booking)"""
+    room = _text(row, "room")
+    if room not in known_rooms:
+        raise ImportRowError(f"Room {room!r} does not exist")
+    guest_name = _text(row, "guest_name", "name")
+    if not guest_name:
+        raise ImportRowError("guest_name is required")
+    check_in_date = parse_date(_text(row, "check_in_date"), "check_in_date")
+    check_out_date = parse_date(_text(row, "check_out_date"), "check_out_date")
+    if check_out_date < check_in_date:
+        raise ImportRowError("check_out_date is before check_in_date")
+
+    # Past stays default to checked in, future ones to confirmed
+    status = _text(row, "status").lower() or (
+        "confirmed" if check_in_date >= date.today().isoformat() else "checked_in")
+    if status not in BOOKING_STATUSES:
+        raise ImportRowError(f"status must be one of {', '.join(BOOKING_STATUSES)}")
+
+    total_amount = parse_amount(_text(row, "total_amount", "amount"), "total_amount")
+    paid_amount = parse_amount(_text(row, "paid_amount"), "paid_amount", required=False)
+    booking = {
+        "room": room,
+        "guest_name": guest_name,
+        "guest_mobile": _text(row, "guest_mobile", "mobile"),
+        "booking_date": parse_date(_text(row, "booking_date"), "booking_date")
+        if _text(row, "booking_date") else check_in_date,
+        "check_in_date": check_in_date,
+        "check_out_date": check_out_date,
+        "status": status,
+        "total_amount": total_amount,
+        "paid_amount": paid_amount,
+        "balance": total_amount - paid_amount,
+        "payment_method": _text(row, "payment_method") or "cash",
+        "notes": _text(row, "notes"),
+        "photo_path": None,
+        "guest_count": parse_amount(_text(row, "guest_count"), "guest_count", required=False) or 1
+    }
+    return _text(row, "booking_id") or str(uuid.uuid4()), booking
+
+
+def normalize_transaction(row, log_type):
+    """Build a log entry from a row in the same shape the routes log it"""
+    amount = parse_amount(_text(row, "amount", "price"), "amount")
+    entry = {
+        "room": _text(row, "room"),
+        "name": _text(row, "name", "guest_name"),
+        "amount": amount,
+        "time": _text(row, "time") or "00:00",
+        "date": parse_date(_text(row, "date"), "date")
+    }
+    notes = _text(row, "notes", "note")
+    if notes:
+        entry["notes"] = notes
+    if _text(row, "booking_id"):
+        entry["booking_id"] = _text(row, "booking_id")
+
+    if log_type == "add_ons":
+        entry["price"] = amount
+        entry["item"] = _text(row, "item", "description", "notes")
+    elif log_type == "expenses":
+        entry["category"] = _text(row, "category") or "others"
+        entry["description"] = _text(row, "description", "notes")
+        entry["payment_method"] = _text(row, "payment_method") or "cash"
+        entry["expense_type"] = _text(row, "expense_type").lower() or "transaction"
+        if not entry["description"]:
+            raise ImportRowError("description is required for expenses")
+        if entry["expense_type"] not in ("transaction", "report"):
+            raise ImportRowError("expense_type must be transaction or report")
+    elif log_type in ("refunds", "booking_payments") and _text(row, "payment_method"):
+        entry["payment_mode" if log_type == "refunds" else "payment_method"] = _text(row, "payment_method")
+
+    # Expenses belong to the lodge rather than a room
+    if log_type not in ("balance", "expenses") and not entry["room"]:
+        raise ImportRowError("room is required")
+    return entry
+
+
+# ----- DUPLICATES -----
+def transaction_key(log_type, entry):
+    return (log_type, entry.get("date"), entry.get("time"), str(entry.get("room", "")),
+            normalize_name(entry.get("name")), entry.get("amount", entry.get("price", 0)),
+            entry.get("description") or entry.get("item") or "")
+
+
+class DuplicateIndex:
+    """Keys of records already held or already imported, for duplicate detection
+
+    Bookings match on booking_id, or on guest mobile and check-in date;
+    transactions match on type, date, time, room, name, amount and description.
+    """
+
+    def __init__(self, bookings, logs):
+        self._booking_ids = set(bookings)
+        self._stays = set()
+        for booking in bookings.values():
+            self._stays.add(self._stay_key(booking))
+        self._stays.discard(None)
+        self._transactions = {transaction_key(log_type, entry)
+                              for log_type in IMPORT_LOG_TYPES for entry in logs.get(log_type, [])}
+
+    @staticmethod
+    def _stay_key(booking):
+        mobile = normalize_mobile(booking.get("guest_mobile"))
+        return (mobile, booking.get("check_in_date")) if mobile else None
+
+    def booking_seen(self, booking_id, booking):
+        """Check a booking and remember it; True if it is a duplicate"""
+        stay = self._stay_key(booking)
+        if booking_id in self._booking_ids or (stay and stay in self._stays):
+            return True
+        self._booking_ids.add(booking_id)
+        if stay:
+            self._stays.add(stay)
+        return False
+
+    def transaction_seen(self, log_type, entry):
+        key = transaction_key(log_type, entry)
+        if key in self._transactions:
+            return True
+        self._transactions.add(key)
+        return False
+
+
+# ----- VALIDATION -----
+class ImportSummary:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.chunks = 0
+        self.bookings = 0
+        self.transactions = {}
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+
+    def reject(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "message": message})
+
+    def as_dict(self):
+        return {
+            "dry_run": self.dry_run,
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "bookings_imported": self.bookings,
+            "transactions_imported": sum(self.transactions.values()),
+            "transactions_by_type": dict(self.transactions),
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": self.errors
+        }
+
+
+def validate_chunk(chunk, duplicates, known_rooms, summary):
+    """Normalize one chunk of (line, row) records, returning (bookings, transactions) to apply"""
+    new_bookings, new_transactions = [], []
+    for line, row in chunk:
+        summary.rows += 1
+        try:
+            if isinstance(row, ImportRowError):
+                raise row
+            kind = record_type(row)
+            if kind == "booking":
+                booking_id, booking = normalize_booking(row, known_rooms)
+                if duplicates.booking_seen(booking_id, booking):
+                    summary.duplicates += 1
+                    continue
+                new_bookings.append((booking_id, booking))
+            elif kind in IMPORT_LOG_TYPES:
+                entry = normalize_transaction(row, kind)
+                if duplicates.transaction_seen(kind, entry):
+                    summary.duplicates += 1
+                    continue
+                new_transactions.append((kind, entry))
+            else:
+                raise ImportRowError(f"Unknown record type {kind!r}")
+        except ImportRowError as e:
+            summary.reject(line, str(e))
+    summary.chunks += 1
+    summary.bookings += len(new_bookings)
+    for log_type, _ in new_transactions:
+        summary.transactions[log_type] = summary.transactions.get(log_type, 0) + 1
+    return new_bookings, new_transactions
+
+
+# ----- CLI -----
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import historical bookings and transactions into a lodge server")
+    parser.add_argument("path", help="CSV or JSONL file to import")
+    parser.add_argument("--url", default="http://localhost:5000", help="base URL of the lodge server")
+    parser.add_argument("--format", choices=sorted(CONTENT_TYPES), help="file format (default: from the extension)")
+    parser.add_argument("--dry-run", action="store_true", help="validate and count without importing")
+    parser.add_argument("--property", help="property to import into (default: the server's default)")
+    args = parser.parse_args(argv)
+
+    import_format = args.format or detect_format(args.path)
+    if not import_format:
+        parser.error("cannot tell the format from the file name; pass --format")
+
+    query = f"format={import_format}" + ("&dry_run=1" if args.dry_run else "")
+    with open(args.path, "rb") as f:
+        headers = {"Content-Type": CONTENT_TYPES[import_format],
+                   "Content-Length": str(os.fstat(f.fileno()).st_size)}
+        if args.property:
+            headers["X-Lodge-Property"] = args.property
+        # The file is streamed as the request body rather than read into memory
+        request = urllib.request.Request(
+            f"{args.url.rstrip('/')}/import?{query}", data=f, method="POST", headers=headers)
+        with urllib.request.urlopen(request) as response:
+            result = json.load(response)
+
+    print(json.dumps(result, indent=2))
+    return 0 if result.get("success") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
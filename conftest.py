@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+import pytest
+
+from fake_google import build_fake_services
+
+# app.py reads its configuration on import; point it at throwaway files and keep Sheets in the foreground
+_STATE_DIR = tempfile.mkdtemp(prefix="lodge-tests-")
+os.environ.setdefault("LODGE_SNAPSHOT_PATH", os.path.join(_STATE_DIR, "data_snapshot.bin"))
+os.environ.setdefault("LODGE_PROFILE_DIR", os.path.join(_STATE_DIR, "profiles"))
+os.environ["LODGE_BACKGROUND_SYNC"] = "0"
+os.environ.setdefault("LODGE_SHEETS_READS_PER_MINUTE", "1000000")
+os.environ.setdefault("LODGE_SHEETS_WRITES_PER_MINUTE", "1000000")
+
+
+@pytest.fixture
+def sheets():
+    """In-memory stand-in for the spreadsheet, as (backend, sheets_service, drive_service)"""
+    return build_fake_services()
+
+
+@pytest.fixture
+def lodge(sheets):
+    """The app module with fresh default state, saving to the stand-in spreadsheet"""
+    import app
+    _, sheets_service, drive_service = sheets
+    app.get_google_services = lambda: (sheets_service, drive_service)
+    app.replace_state(app.default_data())
+    return app
+
+
+@pytest.fixture
+def client(lodge):
+    return lodge.app.test_client()
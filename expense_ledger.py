@@ -0,0 +1,159 @@
+from bisect import bisect_left, bisect_right, insort
+
+EXPENSE_TYPES = ("transaction", "report")
+
+# Monthly budgets are saved next to the totals, as "budget:<category>" rows of
+# the Totals sheet, and kept apart from them in memory
+BUDGET_PREFIX = "budget:"
+
+# Share of a budget spent before it is flagged
+BUDGET_WARNING_RATIO = 0.8
+
+
+def budget_key(category):
+    return f"{BUDGET_PREFIX}{category}"
+
+
+def split_budgets(saved_totals):
+    """The totals and the monthly budget per category, from the totals as saved"""
+    totals, budgets = {}, {}
+    for key, amount in saved_totals.items():
+        if not key.startswith(BUDGET_PREFIX):
+            totals[key] = amount
+        elif amount > 0:
+            budgets[key[len(BUDGET_PREFIX):]] = amount
+    return totals, budgets
+
+
+def with_budgets(totals, budgets):
+    """The totals as saved, with a budget:<category> entry per budget"""
+    saved = dict(totals)
+    saved.update((budget_key(category), amount) for category, amount in budgets.items())
+    return saved
+
+
+def _empty_split():
+    return {expense_type: 0 for expense_type in EXPENSE_TYPES}
+
+
+class ExpenseLedger:
+    """Expenses indexed by day, with category and month rollups kept current on insert
+
+    Ranges are answered from the per-day index, so a report touches the days
+    it covers rather than every expense ever recorded.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._by_day = {}
+        self._days = []
+        self._day_totals = {}
+        self._month_totals = {}
+        self._month_categories = {}
+        self._category_totals = {}
+        self.budgets = {}
+
+    # ----- BUILDING -----
+    def rebuild(self, logs, budgets):
+        """Index every expense in the logs and take the monthly budget per category"""
+        self.clear()
+        for entry in logs.get("expenses", []):
+            self.add(entry)
+        self.budgets = dict(budgets)
+
+    def add(self, entry):
+        """Fold one expense into the day index and the rollups"""
+        date = entry.get("date") or ""
+        month = date[:7]
+        category = entry.get("category") or "others"
+        expense_type = entry.get("expense_type") if entry.get("expense_type") in EXPENSE_TYPES else "transaction"
+        amount = entry.get("amount", 0)
+
+        if date not in self._by_day:
+            self._by_day[date] = []
+            self._day_totals[date] = _empty_split()
+            insort(self._days, date)
+        self._by_day[date].append(entry)
+        self._day_totals[date][expense_type] += amount
+
+        self._month_totals.setdefault(month, _empty_split())[expense_type] += amount
+        month_categories = self._month_categories.setdefault(month, {})
+        rollup = month_categories.setdefault(category, dict(_empty_split(), count=0))
+        rollup[expense_type] += amount
+        rollup["count"] += 1
+        self._category_totals.setdefault(category, _empty_split())[expense_type] += amount
+
+    def set_budget(self, category, amount):
+        if amount > 0:
+            self.budgets[category] = amount
+        else:
+            self.budgets.pop(category, None)
+
+    # ----- QUERIES -----
+    def _day_range(self, start_date, end_date):
+        return self._days[bisect_left(self._days, start_date):bisect_right(self._days, end_date)]
+
+    def entries_between(self, start_date, end_date):
+        """Expenses dated within [start_date, end_date], oldest day first"""
+        entries = []
+        for day in self._day_range(start_date, end_date):
+            entries.extend(self._by_day[day])
+        return entries
+
+    def totals_between(self, start_date, end_date):
+        """Transaction and report expense totals for [start_date, end_date]"""
+        split = _empty_split()
+        for day in self._day_range(start_date, end_date):
+            for expense_type, amount in self._day_totals[day].items():
+                split[expense_type] += amount
+        return split
+
+    def categories_between(self, start_date, end_date):
+        """Count and total per category for [start_date, end_date], largest first"""
+        categories = {}
+        for day in self._day_range(start_date, end_date):
+            for entry in self._by_day[day]:
+                rollup = categories.setdefault(entry.get("category") or "others",
+                                               {"count": 0, "total": 0})
+                rollup["count"] += 1
+                rollup["total"] += entry.get("amount", 0)
+        return sorted(({"category": category, **rollup} for category, rollup in categories.items()),
+                      key=lambda item: -item["total"])
+
+    def summary(self, month):
+        """Month totals, per-category spend against budgets, and the monthly trend"""
+        month_categories = self._month_categories.get(month, {})
+        categories = []
+        for category in sorted(set(month_categories) | set(self.budgets)):
+            rollup = month_categories.get(category, dict(_empty_split(), count=0))
+            spent = rollup["transaction"] + rollup["report"]
+            item = {"category": category, "count": rollup["count"], "total": spent,
+                    "transaction": rollup["transaction"], "report": rollup["report"]}
+            budget = self.budgets.get(category)
+            if budget:
+                ratio = spent / budget
+                item.update(budget=budget, remaining=budget - spent, used=round(ratio, 4),
+                            status="over" if ratio > 1 else "warning" if ratio >= BUDGET_WARNING_RATIO else "ok")
+            categories.append(item)
+        categories.sort(key=lambda item: -item["total"])
+
+        month_split = self._month_totals.get(month, _empty_split())
+        return {
+            "month": month,
+            "total": month_split["transaction"] + month_split["report"],
+            "transaction_total": month_split["transaction"],
+            "report_total": month_split["report"],
+            "budget_total": sum(self.budgets.values()),
+            "categories": categories,
+            "over_budget": [item["category"] for item in categories if item.get("status") == "over"],
+            "months": [
+                {"month": key, "total": split["transaction"] + split["report"], **split}
+                for key, split in sorted(self._month_totals.items()) if key
+            ],
+            "all_time_categories": {
+                category: split["transaction"] + split["report"]
+                for category, split in self._category_totals.items()
+            }
+        }
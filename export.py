@@ -0,0 +1,178 @@
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# Log types included in an export by default, in the order they are written
+EXPORT_LOG_TYPES = ["cash", "online", "refunds", "add_ons", "renewals", "expenses"]
+
+# Types exported only when asked for: every booking payment is also logged as a
+# cash or online entry, so adding them by default would count the money twice
+OPTIONAL_EXPORT_LOG_TYPES = ["booking_payments"]
+
+EXPORT_COLUMNS = ["type", "date", "time", "room", "name", "amount", "payment_method",
+                  "category", "description", "booking_id", "notes"]
+
+# Rows written between flushes to the client
+FLUSH_ROWS = 500
+
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def export_row(log_type, entry):
+    """Flatten a log entry into the export columns"""
+    amount = entry.get("price", 0) if log_type == "add_ons" else entry.get("amount", 0)
+    if log_type in ["cash", "online"]:
+        payment_method = log_type
+    else:
+        payment_method = entry.get("payment_method") or entry.get("payment_mode") or ""
+    description = entry.get("description") or entry.get("item") or ""
+    notes = entry.get("notes") or entry.get("note") or ""
+    return [log_type, entry.get("date", ""), entry.get("time", ""), entry.get("room", ""),
+            entry.get("name", ""), amount, payment_method, entry.get("category", ""),
+            description, entry.get("booking_id", ""), notes]
+
+
+def iter_export_rows(logs, start_date, end_date, log_types=EXPORT_LOG_TYPES):
+    """Yield export rows for log entries dated within [start_date, end_date]
+
+    Dates are ISO strings, so they are compared without parsing.
+    """
+    for log_type in log_types:
+        for entry in logs.get(log_type, []):
+            date = entry.get("date", "")
+            if start_date <= date <= end_date:
+                yield export_row(log_type, entry)
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Unseekable sink that collects written bytes until they are drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_csv(rows, columns=EXPORT_COLUMNS):
+    """Encode rows as CSV, yielding the header immediately and then every FLUSH_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode("utf-8-sig")
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= FLUSH_ROWS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode("utf-8")
+
+
+# ----- XLSX -----
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def _xlsx_cell(value):
+    if isinstance(value, bool):
+        value = str(value)
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_INVALID_XML_CHARS.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(row):
+    return "<row>" + "".join(_xlsx_cell(value) for value in row) + "</row>"
+
+
+def iter_xlsx(rows, columns=EXPORT_COLUMNS, sheet_name="Transactions"):
+    """Write rows into a single-sheet workbook, yielding zip bytes as the sheet is compressed
+
+    The zip goes to an unseekable sink, so zipfile emits data descriptors and
+    the sheet never has to be held in memory.
+    """
+    sink = _ChunkWriter()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as workbook:
+        workbook.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        workbook.writestr("_rels/.rels", _ROOT_RELS)
+        workbook.writestr("xl/workbook.xml", _WORKBOOK.format(sheet_name=escape(sheet_name)))
+        workbook.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        yield sink.drain()
+
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((_SHEET_START + _xlsx_row(columns)).encode("utf-8"))
+            pending = []
+            for row in rows:
+                pending.append(_xlsx_row(row))
+                if len(pending) >= FLUSH_ROWS:
+                    sheet.write("".join(pending).encode("utf-8"))
+                    pending.clear()
+                    data = sink.drain()
+                    if data:
+                        yield data
+            if pending:
+                sheet.write("".join(pending).encode("utf-8"))
+            sheet.write(_SHEET_END.encode("utf-8"))
+    yield sink.drain()
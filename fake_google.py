@@ -0,0 +1,243 @@
+"""Local stand-in for the Google Sheets and Drive APIs used by app.py.
+
+Implements just enough of the ``spreadsheets().values()`` and
+``files()``/``permissions()`` surfaces for the app to run against an
+in-memory spreadsheet, with configurable latency injected per call.
+"""
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+
+_A1_RE = re.compile(r"^(?:'?([^'!]+)'?!)?([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+
+def _column_index(letters):
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+
+def parse_range(a1_range):
+    """Split A1 notation into (sheet, first_row, first_col, last_row, last_col), zero based"""
+    match = _A1_RE.match(a1_range.strip())
+    if not match:
+        raise ValueError(f"Unsupported range: {a1_range}")
+    sheet, start_col, start_row, end_col, end_row = match.groups()
+    first_col = _column_index(start_col) if start_col else 0
+    first_row = int(start_row) - 1 if start_row else 0
+    if end_col is None and end_row is None:
+        # A single cell anchor such as 'Rooms!A2' is open ended when writing
+        last_col = first_col if start_col and start_row else None
+        last_row = first_row if start_col and start_row else None
+    else:
+        last_col = _column_index(end_col) if end_col else None
+        last_row = int(end_row) - 1 if end_row else None
+    return sheet, first_row, first_col, last_row, last_col
+
+
+class FakeResponse(dict):
+    """Minimal httplib2 response carrying a status, as HttpError.resp does"""
+
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = ""
+
+
+class FakeHttpError(Exception):
+    """Error shaped like googleapiclient's HttpError, for queueing in FakeBackend.failures"""
+
+    def __init__(self, status, reason=""):
+        super().__init__(f"<HttpError {status}: {reason}>")
+        self.resp = FakeResponse(status)
+        self.reason = reason
+
+
+class FakeRequest:
+    """Deferred call that mimics googleapiclient's HttpRequest.execute()"""
+
+    def __init__(self, backend, operation, func):
+        self._backend = backend
+        self._operation = operation
+        self._func = func
+
+    def execute(self, num_retries=0):
+        return self._backend.call(self._operation, self._func)
+
+
+class FakeBackend:
+    """Shared state, latency injection and call accounting for the fakes"""
+
+    def __init__(self, latency=0.0, jitter=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.sheets = {}
+        self.files = {}
+        self.calls = Counter()
+        self.failures = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, operation, func):
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.calls[operation] += 1
+            if self.failures:
+                error = self.failures.pop(0)
+                if error is not None:
+                    raise error
+            return func()
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls.clear()
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+class FakeValues:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def _grid(self, sheet):
+        return self._backend.sheets.setdefault(sheet, [])
+
+    def _read(self, a1_range):
+        sheet, first_row, first_col, last_row, last_col = parse_range(a1_range)
+        grid = self._grid(sheet)
+        stop_row = len(grid) if last_row is None else min(len(grid), last_row + 1)
+        values = []
+        for row in grid[first_row:stop_row]:
+            cells = row[first_col:] if last_col is None else row[first_col:last_col + 1]
+            # Like the real API, drop trailing empty cells
+            while cells and cells[-1] == "":
+                cells = cells[:-1]
+            values.append(list(cells))
+        while values and not values[-1]:
+            values.pop()
+        result = {"range": a1_range, "majorDimension": "ROWS"}
+        if values:
+            result["values"] = values
+        return result
+
+    def _write(self, a1_range, values):
+        sheet, first_row, first_col, _, _ = parse_range(a1_range)
+        grid = self._grid(sheet)
+        for offset, row in enumerate(values):
+            index = first_row + offset
+            while len(grid) <= index:
+                grid.append([])
+            target = grid[index]
+            needed = first_col + len(row)
+            if len(target) < needed:
+                target.extend([""] * (needed - len(target)))
+            target[first_col:needed] = [str(cell) if not isinstance(cell, str) else cell for cell in row]
+        return {"updatedRange": a1_range, "updatedRows": len(values)}
+
+    def _clear(self, a1_range):
+        sheet, first_row, first_col, last_row, last_col = parse_range(a1_range)
+        grid = self._grid(sheet)
+        stop_row = len(grid) if last_row is None else min(len(grid), last_row + 1)
+        for row in grid[first_row:stop_row]:
+            stop_col = len(row) if last_col is None else min(len(row), last_col + 1)
+            for col in range(first_col, stop_col):
+                row[col] = ""
+        return {"clearedRange": a1_range}
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return FakeRequest(self._backend, "sheets.values.get", lambda: self._read(range))
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        if isinstance(ranges, str):
+            ranges = [ranges]
+        return FakeRequest(self._backend, "sheets.values.batchGet", lambda: {
+            "spreadsheetId": spreadsheetId,
+            "valueRanges": [self._read(r) for r in ranges]
+        })
+
+    def update(self, spreadsheetId, range, body, valueInputOption=None, **kwargs):
+        return FakeRequest(self._backend, "sheets.values.update",
+                           lambda: self._write(range, body.get("values", [])))
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        def run():
+            responses = [self._write(item["range"], item.get("values", [])) for item in body.get("data", [])]
+            return {"spreadsheetId": spreadsheetId, "responses": responses}
+        return FakeRequest(self._backend, "sheets.values.batchUpdate", run)
+
+    def clear(self, spreadsheetId, range, body=None, **kwargs):
+        return FakeRequest(self._backend, "sheets.values.clear", lambda: self._clear(range))
+
+    def batchClear(self, spreadsheetId, body, **kwargs):
+        def run():
+            return {"clearedRanges": [self._clear(r)["clearedRange"] for r in body.get("ranges", [])]}
+        return FakeRequest(self._backend, "sheets.values.batchClear", run)
+
+
+class FakeSpreadsheets:
+    def __init__(self, backend):
+        self._values = FakeValues(backend)
+
+    def values(self):
+        return self._values
+
+
+class FakeSheetsService:
+    def __init__(self, backend):
+        self._spreadsheets = FakeSpreadsheets(backend)
+
+    def spreadsheets(self):
+        return self._spreadsheets
+
+
+class FakeFiles:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def get(self, fileId, **kwargs):
+        def run():
+            return self._backend.files.get(fileId, {"id": fileId, "name": "Lodge Photos"})
+        return FakeRequest(self._backend, "drive.files.get", run)
+
+    def create(self, body=None, media_body=None, fields=None, **kwargs):
+        def run():
+            file_id = uuid.uuid4().hex
+            self._backend.files[file_id] = {"id": file_id, "name": (body or {}).get("name", "")}
+            return {"id": file_id, "webContentLink": f"https://drive.example/{file_id}"}
+        return FakeRequest(self._backend, "drive.files.create", run)
+
+
+class FakePermissions:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def create(self, fileId, body=None, **kwargs):
+        return FakeRequest(self._backend, "drive.permissions.create",
+                           lambda: {"id": "anyoneWithLink", "role": (body or {}).get("role")})
+
+
+class FakeDriveService:
+    def __init__(self, backend):
+        self._files = FakeFiles(backend)
+        self._permissions = FakePermissions(backend)
+
+    def files(self):
+        return self._files
+
+    def permissions(self):
+        return self._permissions
+
+
+def build_fake_services(latency=0.0, jitter=0.0, seed=None):
+    """Return (backend, sheets_service, drive_service) sharing one in-memory store"""
+    backend = FakeBackend(latency=latency, jitter=jitter, seed=seed)
+    return backend, FakeSheetsService(backend), FakeDriveService(backend)
@@ -0,0 +1,87 @@
+import json
+import os
+from itertools import groupby
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# "json" forces the standard library encoder even where orjson is installed
+BACKEND = "orjson" if orjson is not None and os.environ.get("LODGE_JSON_BACKEND", "orjson") != "json" else "json"
+
+
+def _unproxied(value):
+    """Stand-in for a context-local proxy, such as the app's per-property state"""
+    if hasattr(value, "_get_current_object"):
+        return value._get_current_object()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if BACKEND == "orjson":
+    def dumps(value):
+        """Encode a value as compact UTF-8 JSON bytes with sorted keys, as jsonify does"""
+        return orjson.dumps(value, default=_unproxied, option=orjson.OPT_SORT_KEYS)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), sort_keys=True, default=_unproxied)
+
+    def dumps(value):
+        """Encode a value as compact UTF-8 JSON bytes with sorted keys, as jsonify does"""
+        return _encoder.encode(value).encode("utf-8")
+
+
+if BACKEND == "orjson":
+    loads = orjson.loads
+else:
+    loads = json.loads
+
+
+def dumps_object(fragments):
+    """Join already encoded values into a JSON object, keys in sorted order"""
+    return b"{" + b",".join(dumps(key) + b":" + fragments[key] for key in sorted(fragments)) + b"}"
+
+
+class LogFragments:
+    """Encoded log entries per log type and day, reusing days that are closed
+
+    A whole day before today is encoded once and kept while its number of
+    entries stays the same; an import adding to it re-encodes it. Anything
+    that rewrites or drops existing entries must call clear(). Days before
+    the oldest one asked for are forgotten.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._days = {}
+
+    def encode(self, logs, keys, whole_since, today):
+        """Encode the entries at keys, (moment, log type, position) in time order, as {log_type: [entries]}
+
+        Every log type in logs gets a list, empty or not. The entries of a
+        day from whole_since on must be there in full; older days may be
+        partial and are never kept.
+        """
+        for day_key in [day_key for day_key in self._days if day_key[1] < whole_since]:
+            del self._days[day_key]
+        parts = {log_type: [] for log_type in logs}
+        by_type_and_day = sorted(keys, key=lambda key: (key[1], key[0], key[2]))
+        for (log_type, day), group in groupby(by_type_and_day, key=lambda key: (key[1], key[0][:10])):
+            entries = logs[log_type]
+            positions = [key[2] for key in group]
+            if not whole_since <= day < today:
+                parts[log_type].append(dumps([entries[position] for position in positions])[1:-1])
+                continue
+            cached = self._days.get((log_type, day))
+            if cached is None or cached[0] != len(positions):
+                cached = self._days[(log_type, day)] = (
+                    len(positions), dumps([entries[position] for position in positions])[1:-1])
+            parts[log_type].append(cached[1])
+        return dumps_object({log_type: b"[" + b",".join(encoded) + b"]" for log_type, encoded in parts.items()})
+
+
+def dumps_html(value):
+    """JSON text safe to place inside a <script> element, with <, > and & escaped"""
+    return (dumps(value).decode("utf-8")
+            .replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026"))
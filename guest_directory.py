@@ -0,0 +1,247 @@
+import re
+
+# Log types that carry a guest name and room for a stay
+STAY_LOG_TYPES = ["cash", "online", "balance", "refunds", "renewals"]
+
+
+def normalize_name(name):
+    """Lowercase a guest name and collapse whitespace"""
+    return " ".join(str(name or "").lower().split())
+
+
+def normalize_mobile(mobile):
+    """Reduce a mobile number to its last 10 digits"""
+    digits = re.sub(r"\D", "", str(mobile or ""))
+    return digits[-10:] if digits else ""
+
+
+class GuestDirectory:
+    """Index of known guests with a name prefix trie and an exact mobile index"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._trie = {}
+        self._by_mobile = {}
+        self._by_name = {}
+        self._guests = {}
+        # Guest key each room stay and booking is recorded under
+        self._stay_owners = {}
+
+    # ----- BUILDING -----
+    def rebuild(self, rooms, bookings, logs):
+        """Index every guest found in rooms, bookings and logs"""
+        self.clear()
+        for booking_id, booking in bookings.items():
+            self.add_booking(booking_id, booking)
+        for room_number, room_info in rooms.items():
+            if room_info.get("guest"):
+                self.add_room_stay(room_number, room_info)
+        for log_type in STAY_LOG_TYPES:
+            for entry in logs.get(log_type, []):
+                self.add_log(log_type, entry)
+
+    def add_room_stay(self, room_number, room_info):
+        """Record the current occupant of a room as a stay"""
+        guest = room_info.get("guest") or {}
+        key = self._guest_key(guest.get("name"), guest.get("mobile"))
+        if not key:
+            return
+        checkin_time = room_info.get("checkin_time") or ""
+        self._claim(("room", room_number, checkin_time), key, ("room", checkin_time))
+        record = self._record(key, guest.get("name"), guest.get("mobile"))
+        if guest.get("photo"):
+            record["photo"] = guest["photo"]
+        record["stays"][("room", checkin_time)] = {
+            "source": "room",
+            "room": room_number,
+            "date": checkin_time.split(" ")[0],
+            "checkin_time": checkin_time,
+            "price": guest.get("price", 0),
+            "guests": guest.get("guests", 1)
+        }
+        self._touch(record, checkin_time)
+
+    def add_booking(self, booking_id, booking):
+        """Record a booking as a stay for its guest"""
+        key = self._guest_key(booking.get("guest_name"), booking.get("guest_mobile"))
+        if not key:
+            return
+        self._claim(("booking", booking_id), key, ("booking", booking_id))
+        record = self._record(key, booking.get("guest_name"), booking.get("guest_mobile"))
+        if booking.get("photo_path"):
+            record["photo"] = booking["photo_path"]
+        record["stays"][("booking", booking_id)] = {
+            "source": "booking",
+            "booking_id": booking_id,
+            "room": booking.get("room", ""),
+            "date": booking.get("check_in_date", ""),
+            "check_out_date": booking.get("check_out_date", ""),
+            "status": booking.get("status", ""),
+            "price": booking.get("total_amount", 0),
+            "guests": booking.get("guest_count", 1)
+        }
+        self._touch(record, booking.get("check_in_date", ""))
+
+    def add_log(self, log_type, entry):
+        """Fold a logged payment into the stay it belongs to"""
+        name = entry.get("name")
+        room = entry.get("room", "")
+        keys = self._by_name.get(normalize_name(name))
+        if keys:
+            key = max(keys, key=lambda k: self._guests[k]["last_seen"])
+        else:
+            key = self._guest_key(name, None)
+        if not key:
+            return
+        record = self._record(key, name, None)
+
+        # Payments made during a known stay in the same room belong to it
+        date = entry.get("date", "")
+        for stay in record["stays"].values():
+            if stay["room"] == room and stay["source"] != "log" and stay["date"] <= date:
+                return
+
+        stay = record["stays"].setdefault(("log", room), {
+            "source": "log",
+            "room": room,
+            "date": date,
+            "last_date": date,
+            "paid": 0
+        })
+        stay["date"] = min(stay["date"], date) if stay["date"] else date
+        stay["last_date"] = max(stay["last_date"], date)
+        if log_type in ["cash", "online"]:
+            stay["paid"] += entry.get("amount", 0)
+        self._touch(record, date)
+
+    # ----- SEARCH -----
+    def search(self, query, rooms, bookings, limit=10):
+        """Return guests matching a mobile number or name prefix, most recent first"""
+        mobile = normalize_mobile(query)
+        if mobile and len(mobile) == 10 and not re.search(r"[^\d\s+()-]", query):
+            keys = set(self._by_mobile.get(mobile, ()))
+        else:
+            tokens = normalize_name(query).split()
+            if not tokens:
+                return []
+            keys = None
+            for token in tokens:
+                matches = self._prefix_keys(token)
+                keys = matches if keys is None else keys & matches
+                if not keys:
+                    return []
+            # Trie entries are never removed, so confirm against current guests and names
+            keys = {k for k in keys if k in self._guests and self._name_matches(self._guests[k]["name"], tokens)}
+
+        records = sorted((self._guests[k] for k in keys), key=lambda r: r["last_seen"], reverse=True)
+        return [self._present(record, rooms, bookings) for record in records[:limit]]
+
+    # ----- INTERNALS -----
+    def _guest_key(self, name, mobile):
+        mobile = normalize_mobile(mobile)
+        if mobile:
+            return "m:" + mobile
+        name = normalize_name(name)
+        return "n:" + name if name else None
+
+    def _record(self, key, name, mobile):
+        record = self._guests.get(key)
+        if record is None:
+            record = {"key": key, "name": "", "mobile": "", "photo": None, "last_seen": "", "stays": {}}
+            self._guests[key] = record
+        if name and normalize_name(name) != normalize_name(record["name"]):
+            record["name"] = " ".join(str(name).split())
+            self._index_name(key, record["name"])
+        mobile = normalize_mobile(mobile)
+        if mobile and mobile != record["mobile"]:
+            self._discard(self._by_mobile, record["mobile"], key)
+            record["mobile"] = mobile
+            self._by_mobile.setdefault(mobile, set()).add(key)
+        return record
+
+    def _claim(self, stay_id, key, stay_key):
+        """Take a stay away from the guest it was recorded under before, as
+        when a booking's mobile number is corrected, dropping that guest if
+        it has no stays left"""
+        previous = self._stay_owners.get(stay_id)
+        self._stay_owners[stay_id] = key
+        if previous is None or previous == key or previous not in self._guests:
+            return
+        record = self._guests[previous]
+        record["stays"].pop(stay_key, None)
+        if not record["stays"]:
+            del self._guests[previous]
+            self._discard(self._by_mobile, record["mobile"], previous)
+            self._discard(self._by_name, normalize_name(record["name"]), previous)
+
+    @staticmethod
+    def _discard(index, value, key):
+        keys = index.get(value)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[value]
+
+    def _index_name(self, key, name):
+        normalized = normalize_name(name)
+        self._by_name.setdefault(normalized, set()).add(key)
+        for token in set(normalized.split()):
+            node = self._trie
+            for char in token:
+                node = node.setdefault(char, {})
+                node.setdefault("", set()).add(key)
+
+    def _prefix_keys(self, prefix):
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return set(node.get("", ()))
+
+    @staticmethod
+    def _name_matches(name, tokens):
+        parts = normalize_name(name).split()
+        return all(any(part.startswith(token) for part in parts) for token in tokens)
+
+    @staticmethod
+    def _touch(record, seen):
+        if seen and seen > record["last_seen"]:
+            record["last_seen"] = seen
+
+    def _present(self, record, rooms, bookings, max_stays=5):
+        stays = sorted(record["stays"].values(), key=lambda s: s["date"], reverse=True)[:max_stays]
+        result_stays = []
+        current_room = None
+        balance = 0
+        for stay in stays:
+            stay = dict(stay)
+            if stay["source"] == "room":
+                room_info = rooms.get(stay["room"]) or {}
+                if room_info.get("guest") and room_info.get("checkin_time") == stay["checkin_time"]:
+                    stay["balance"] = room_info.get("balance", 0)
+                    stay["active"] = True
+                    current_room = stay["room"]
+                    balance += max(stay["balance"], 0)
+                else:
+                    stay["active"] = False
+            elif stay["source"] == "booking":
+                booking = bookings.get(stay["booking_id"]) or {}
+                stay["status"] = booking.get("status", stay["status"])
+                stay["balance"] = booking.get("balance", 0)
+                stay["active"] = stay["status"] == "confirmed"
+                if stay["active"]:
+                    balance += max(stay["balance"], 0)
+            result_stays.append(stay)
+
+        return {
+            "name": record["name"],
+            "mobile": record["mobile"],
+            "photo": record["photo"],
+            "last_seen": record["last_seen"],
+            "current_room": current_room,
+            "balance": balance,
+            "stays": result_stays
+        }
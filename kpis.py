@@ -0,0 +1,165 @@
+import numpy as np
+
+# Bookings that hold a room; cancelled ones don't
+OCCUPYING_BOOKING_STATUSES = ("confirmed", "checked_in")
+
+# When two sources claim the same room-night, the lower number wins
+SOURCE_PRIORITY = {"booking": 0, "checkin": 1, "current": 2, "renewal": 3}
+
+
+def _to_date(value):
+    try:
+        return np.datetime64(value, "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def _day_numbers(values):
+    """Parse values starting 'YYYY-MM-DD' in one pass; returns (day numbers, valid mask)"""
+    texts = np.array([value[:10] if isinstance(value, str) else "" for value in values] or [""])[:len(values)]
+    try:
+        dates = texts.astype("datetime64[D]")
+    except ValueError:
+        # A malformed date somewhere; parse one by one so only it is dropped
+        dates = np.array([_to_date(text) for text in texts], dtype="datetime64[D]")
+    return dates.astype(np.int64), ~np.isnat(dates)
+
+
+class OccupancyIndex:
+    """Room x day occupancy and revenue matrices built from stays, for range KPIs
+
+    Every stay is expanded into room-nights: bookings cover check-in to
+    check-out, a walk-in check-in covers its first night, and each rent
+    renewal covers one more. Where sources overlap (a converted booking that
+    was later renewed, say) the night is counted once, at the rate of the
+    highest-priority source.
+    """
+
+    def __init__(self, rooms, bookings, logs):
+        self.room_numbers = sorted(rooms, key=lambda r: (len(r), r))
+        room_index = {room: i for i, room in enumerate(self.room_numbers)}
+
+        room_ids, start_days, end_days, amounts, priorities = [], [], [], [], []
+
+        def add(room, start, end, amount, source):
+            index = room_index.get(room)
+            if index is None:
+                return
+            room_ids.append(index)
+            start_days.append(start)
+            end_days.append(end)
+            amounts.append(amount or 0)
+            priorities.append(SOURCE_PRIORITY[source])
+
+        for booking in bookings.values():
+            if booking.get("status") in OCCUPYING_BOOKING_STATUSES and booking.get("check_out_date"):
+                add(booking.get("room"), booking.get("check_in_date"), booking["check_out_date"],
+                    booking.get("total_amount", 0), "booking")
+        for entry in logs.get("checkins", []):
+            add(entry.get("room"), entry.get("date"), None, entry.get("amount", 0), "checkin")
+        for room, info in rooms.items():
+            if info.get("guest"):
+                add(room, info.get("checkin_time"), None, info["guest"].get("price", 0), "current")
+        for entry in logs.get("renewals", []):
+            add(entry.get("room"), entry.get("date"), None, entry.get("amount", 0), "renewal")
+
+        starts, valid = _day_numbers(start_days)
+        ends, has_end = _day_numbers(end_days)
+        # Stays without an end cover one night, as do same-day bookings
+        nights = np.where(has_end, np.maximum(ends - starts, 1), 1)
+        starts, nights = starts[valid], nights[valid]
+        amounts = np.array(amounts, dtype=np.float64)[valid]
+        room_ids = np.array(room_ids, dtype=np.int64)[valid]
+        priorities = np.array(priorities, dtype=np.int64)[valid]
+
+        # Expand every stay into one entry per night
+        total_nights = int(nights.sum())
+        stay_of_night = np.repeat(np.arange(len(nights)), nights)
+        first_night = np.cumsum(nights) - nights
+        night_offset = np.arange(total_nights) - np.repeat(first_night, nights)
+        night_day = starts[stay_of_night] + night_offset
+        night_room = room_ids[stay_of_night]
+        night_rate = (amounts / np.maximum(nights, 1))[stay_of_night]
+        night_priority = priorities[stay_of_night]
+
+        self.first_day = int(night_day.min()) if total_nights else 0
+        self.days = int(night_day.max()) - self.first_day + 1 if total_nights else 0
+        shape = (len(self.room_numbers), self.days)
+        self.occupied = np.zeros(shape, dtype=bool)
+        self.revenue = np.zeros(shape, dtype=np.float64)
+
+        if total_nights:
+            # Keep one night per (room, day): the best-priority source
+            cell = night_room * self.days + (night_day - self.first_day)
+            order = np.lexsort((night_priority, cell))
+            unique_cells, first = np.unique(cell[order], return_index=True)
+            kept = order[first]
+            self.occupied.flat[unique_cells] = True
+            self.revenue.flat[unique_cells] = night_rate[kept]
+
+        # Prefix sums over days make any range total two lookups
+        self.sold_prefix = np.concatenate(([0], np.cumsum(self.occupied.sum(axis=0))))
+        self.revenue_prefix = np.concatenate(([0.0], np.cumsum(self.revenue.sum(axis=0))))
+
+    def _clip(self, start_day, end_day):
+        """Column bounds in the matrices for days [start_day, end_day)"""
+        lo = min(max(start_day - self.first_day, 0), self.days)
+        hi = min(max(end_day - self.first_day, 0), self.days)
+        return lo, hi
+
+    def kpis(self, start_date, end_date, granularity="day"):
+        """Occupancy, ADR and RevPAR between two ISO dates, inclusive, with a series"""
+        (start_day, end_day), _ = _day_numbers([start_date, end_date])
+        start_day, end_day = int(start_day), int(end_day) + 1
+        room_count = len(self.room_numbers)
+        lo, hi = self._clip(start_day, end_day)
+
+        sold = int(self.sold_prefix[hi] - self.sold_prefix[lo])
+        revenue = float(self.revenue_prefix[hi] - self.revenue_prefix[lo])
+        summary = _summary(sold, revenue, room_count * (end_day - start_day))
+
+        # Series buckets: each day, or each calendar month touching the range
+        days = np.arange(start_day, end_day, dtype=np.int64)
+        if granularity == "month":
+            months = days.astype("datetime64[D]").astype("datetime64[M]")
+            bucket_starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+            labels = [str(m) for m in months[bucket_starts]]
+        else:
+            bucket_starts = np.arange(len(days))
+            labels = [str(d) for d in days.astype("datetime64[D]")]
+        bucket_ends = np.r_[bucket_starts[1:], len(days)]
+
+        # Range totals per bucket from the prefix sums, clipped to the matrix
+        edges_lo = np.clip(start_day + bucket_starts - self.first_day, 0, self.days)
+        edges_hi = np.clip(start_day + bucket_ends - self.first_day, 0, self.days)
+        bucket_sold = self.sold_prefix[edges_hi] - self.sold_prefix[edges_lo]
+        bucket_revenue = self.revenue_prefix[edges_hi] - self.revenue_prefix[edges_lo]
+        bucket_available = (bucket_ends - bucket_starts) * room_count
+
+        series = [
+            dict(_summary(int(s), float(r), int(a)), period=label)
+            for label, s, r, a in zip(labels, bucket_sold, bucket_revenue, bucket_available)
+        ]
+
+        room_sold = self.occupied[:, lo:hi].sum(axis=1)
+        room_revenue = self.revenue[:, lo:hi].sum(axis=1)
+        nights_in_range = end_day - start_day
+        by_room = [
+            {"room": room, "sold_room_nights": int(s), "occupancy_rate": round(float(s) / nights_in_range, 4),
+             "room_revenue": round(float(r), 2)}
+            for room, s, r in zip(self.room_numbers, room_sold, room_revenue)
+        ]
+
+        return dict(summary, rooms=room_count, start_date=start_date, end_date=end_date,
+                    granularity=granularity, series=series, by_room=by_room)
+
+
+def _summary(sold, revenue, available):
+    return {
+        "available_room_nights": available,
+        "sold_room_nights": sold,
+        "room_revenue": round(revenue, 2),
+        "occupancy_rate": round(sold / available, 4) if available else 0.0,
+        "adr": round(revenue / sold, 2) if sold else 0.0,
+        "revpar": round(revenue / available, 2) if available else 0.0
+    }
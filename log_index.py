@@ -0,0 +1,156 @@
+import base64
+import binascii
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+
+import fast_json
+
+# Modes money is taken or paid out in; the cash and online logs are their own mode
+PAYMENT_MODES = ("cash", "online")
+
+# Entries per page when none is asked for, and the most one page may hold
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Sorts after any time on the same date, for inclusive date ranges
+_END_OF_DAY = "\uffff"
+
+
+def payment_mode(log_type, entry):
+    """'cash' or 'online' for entries that moved money that way, otherwise None"""
+    if log_type in PAYMENT_MODES:
+        return log_type
+    mode = entry.get("payment_mode") or entry.get("payment_method")
+    return mode if mode in PAYMENT_MODES else None
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(fast_json.dumps(list(key))).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Position after which the next page starts; ValueError if the cursor wasn't one of ours"""
+    try:
+        moment, log_type, position = fast_json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(moment, str) or not isinstance(log_type, str) or not isinstance(position, int):
+        raise ValueError("Invalid cursor")
+    return moment, log_type, position
+
+
+class LogIndex:
+    """Every log entry in time order, with postings by type, room, payment mode and booking
+
+    An entry is keyed by (moment, log type, position in its log), which is
+    unique and stable while logs only grow. Each query first indexes just
+    the entries appended since the last one, so writes need not tell the
+    index anything; anything that rewrites or drops existing entries must
+    call clear().
+    Pages are read with a keyset cursor: the key of the last entry returned.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._indexed = {}
+            self._all = []
+            self._postings = {}
+
+    # ----- BUILDING -----
+    def _sync(self, logs):
+        if any(len(logs.get(log_type, ())) < count for log_type, count in self._indexed.items()):
+            # Entries were removed from under the index
+            self._indexed, self._all, self._postings = {}, [], {}
+        added = {}
+        for log_type, entries in list(logs.items()):
+            start, end = self._indexed.get(log_type, 0), len(entries)
+            if start == end:
+                continue
+            keys = [(f"{entry.get('date') or ''} {entry.get('time') or '00:00'}", log_type, position)
+                    for position, entry in enumerate(entries[start:end], start)]
+            added.setdefault(None, []).extend(keys)
+            added.setdefault(("type", log_type), []).extend(keys)
+            for key, entry in zip(keys, entries[start:end]):
+                if entry.get("room"):
+                    added.setdefault(("room", str(entry["room"])), []).append(key)
+                mode = payment_mode(log_type, entry)
+                if mode:
+                    added.setdefault(("mode", mode), []).append(key)
+                if entry.get("booking_id"):
+                    added.setdefault(("booking", entry["booking_id"]), []).append(key)
+            self._indexed[log_type] = end
+        for posting, keys in added.items():
+            target = self._all if posting is None else self._postings.setdefault(posting, [])
+            keys.sort()
+            # Appends are almost always newer than what is indexed; imported history is not
+            in_order = not target or keys[0] >= target[-1]
+            target.extend(keys)
+            if not in_order:
+                target.sort()
+
+    # ----- QUERIES -----
+    def keys(self, logs, start_date=None, room=None):
+        """Keys of the entries dated start_date or later, optionally in one room, in time order"""
+        with self._lock:
+            self._sync(logs)
+            keys = self._postings.get(("room", room), []) if room else self._all
+            return keys[bisect_left(keys, (start_date,)):] if start_date else list(keys)
+
+    def page(self, logs, log_types=None, start_date=None, end_date=None, room=None, mode=None,
+             booking_id=None, descending=True, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """One page of matching entries, each with its log_type, and the cursor for the next page
+
+        The cursor is None on the last page.
+        """
+        with self._lock:
+            self._sync(logs)
+            # Walk the shortest posting list and check the other filters entry by entry
+            filters = [("room", room), ("mode", mode), ("booking", booking_id)]
+            lists = [self._postings.get(posting, []) for posting in filters if posting[1]]
+            if log_types and len(log_types) == 1:
+                lists.append(self._postings.get(("type", log_types[0]), []))
+            merged_types = bool(log_types) and len(log_types) > 1 and not lists
+
+            low = (start_date,) if start_date else None
+            high = (end_date + _END_OF_DAY,) if end_date else None
+            after = decode_cursor(cursor) if cursor else None
+            if after and descending:
+                high = min(high, after) if high else after
+            elif after:
+                low = max(low, after) if low else after
+
+            def bounded(keys):
+                lo = 0 if low is None else (bisect_right(keys, low) if low == after else bisect_left(keys, low))
+                hi = len(keys) if high is None else bisect_left(keys, high)
+                return (keys[i] for i in (range(hi - 1, lo - 1, -1) if descending else range(lo, hi)))
+
+            if merged_types:
+                # Several types and nothing narrower: merge their lists, which are each in order
+                walk = heapq.merge(*(bounded(self._postings.get(("type", log_type), [])) for log_type in log_types),
+                                   reverse=descending)
+            else:
+                walk = bounded(min(lists, key=len) if lists else self._all)
+
+            found, next_cursor = [], None
+            wanted_types = set(log_types) if log_types else None
+            for key in walk:
+                log_type, position = key[1], key[2]
+                entry = logs[log_type][position]
+                if wanted_types and log_type not in wanted_types:
+                    continue
+                if room and str(entry.get("room") or "") != room:
+                    continue
+                if mode and payment_mode(log_type, entry) != mode:
+                    continue
+                if booking_id and entry.get("booking_id") != booking_id:
+                    continue
+                if len(found) == limit:
+                    next_cursor = encode_cursor(found[-1][0])
+                    break
+                found.append((key, dict(entry, log_type=log_type)))
+            return [entry for _, entry in found], next_cursor
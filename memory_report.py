@@ -0,0 +1,152 @@
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+
+# Lists and dicts longer than twice this are sized from a sample of this many entries
+SAMPLE_ENTRIES = 500
+
+# Shares of the memory limit at which a warning, then an error, is logged
+WARN_RATIO = 0.75
+CRITICAL_RATIO = 0.9
+
+# While above a threshold, the message is repeated this often
+REPEAT_SECONDS = 900
+
+# Allocating lines listed by the tracemalloc report
+TOP_ALLOCATORS = 10
+
+# Shared by everything; not part of any one structure's size
+_NOT_COUNTED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+
+def resident_bytes():
+    """Resident set size of this process; the peak where the current figure isn't available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def deep_size(roots, seen):
+    """Bytes held by the roots and everything they reach, skipping objects already in seen"""
+    total = 0
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _NOT_COUNTED):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
+
+
+def container_size(container, seen):
+    """Deep size of a list or dict of entries as (bytes, estimated)
+
+    A long container is sized from an evenly spaced sample of its entries,
+    scaled to its length, so the cost stays flat as the data grows.
+    """
+    if len(container) <= 2 * SAMPLE_ENTRIES:
+        return deep_size([container], seen), False
+    step = len(container) // SAMPLE_ENTRIES
+    seen.add(id(container))
+    if isinstance(container, dict):
+        keys = list(container)[::step]
+        sampled = deep_size(keys, seen) + deep_size([container[key] for key in keys], seen)
+        count = len(keys)
+    else:
+        sample = container[::step]
+        sampled, count = deep_size(sample, seen), len(sample)
+    return sys.getsizeof(container) + int(sampled / count * len(container)), True
+
+
+class MemoryWatch:
+    """Compares resident memory with a limit and logs as it crosses the thresholds
+
+    A message is logged when the level changes and repeated every
+    REPEAT_SECONDS while it stays above the warning threshold.
+    """
+
+    def __init__(self, limit_bytes, logger, warn_ratio=WARN_RATIO, critical_ratio=CRITICAL_RATIO):
+        self.limit_bytes = limit_bytes
+        self.logger = logger
+        self.warn_ratio = warn_ratio
+        self.critical_ratio = critical_ratio
+        self.last_level = "ok"
+        self._last_logged = 0.0
+
+    def level(self, rss):
+        if rss >= self.limit_bytes * self.critical_ratio:
+            return "critical"
+        if rss >= self.limit_bytes * self.warn_ratio:
+            return "warning"
+        return "ok"
+
+    def check(self, rss, detail=None):
+        """Level for rss, logging it if due; detail() may add the largest structures to the message"""
+        level = self.level(rss)
+        now = time.monotonic()
+        if level != self.last_level or (level != "ok" and now - self._last_logged >= REPEAT_SECONDS):
+            message = f"Resident memory {rss / 2**20:.0f} MB of a {self.limit_bytes / 2**20:.0f} MB limit"
+            if level == "ok":
+                self.logger.info(f"{message}; back under the warning threshold")
+            else:
+                if detail:
+                    message = f"{message}; largest: {detail()}"
+                (self.logger.error if level == "critical" else self.logger.warning)(message)
+            self._last_logged = now
+        self.last_level = level
+        return level
+
+
+def _statistic(stat):
+    frame = stat.traceback[0]
+    return {"where": f"{frame.filename}:{frame.lineno}", "bytes": stat.size, "count": stat.count}
+
+
+class AllocationTracker:
+    """tracemalloc's top allocating lines, and their growth since the previous report"""
+
+    def __init__(self, top=TOP_ALLOCATORS):
+        self.top = top
+        self._previous = None
+        self._previous_at = None
+        self._lock = threading.Lock()
+
+    def start(self, frames=1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = self._previous_at = None
+
+    def report(self):
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        traced, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            previous, since = self._previous, self._previous_at
+            self._previous, self._previous_at = snapshot, time.strftime("%Y-%m-%d %H:%M:%S")
+        growth = []
+        if previous is not None:
+            for stat in snapshot.compare_to(previous, "lineno")[:self.top]:
+                growth.append(dict(_statistic(stat), bytes_diff=stat.size_diff, count_diff=stat.count_diff))
+        return {
+            "tracing": True,
+            "traced_bytes": traced,
+            "peak_traced_bytes": peak,
+            "top": [_statistic(stat) for stat in snapshot.statistics("lineno")[:self.top]],
+            "growth_since": since,
+            "growth": growth
+        }
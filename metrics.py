@@ -0,0 +1,177 @@
+import threading
+from bisect import bisect_left
+
+# Latency buckets in seconds (Prometheus client defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Response size buckets in bytes
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Google API calls made while serving one request
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32)
+
+_registry = []
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution keyed by label values"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        # Counts are stored per bucket and only made cumulative when rendered
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for labelvalues, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    """Value computed by a callback only when metrics are scraped"""
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        values = self.callback() if self.callback else {}
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in sorted(values.items()):
+            if not isinstance(labelvalues, tuple):
+                labelvalues = (labelvalues,)
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+def render():
+    """Render every registered metric in the Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ----- LODGE METRICS -----
+http_request_duration = Histogram(
+    "lodge_http_request_duration_seconds", "Time spent serving HTTP requests",
+    ("route", "method", "status"))
+
+http_response_size = Histogram(
+    "lodge_http_response_size_bytes", "Size of HTTP response bodies",
+    ("route",), buckets=SIZE_BUCKETS)
+
+google_api_calls = Counter(
+    "lodge_google_api_calls_total", "Google API calls by operation and outcome",
+    ("operation", "outcome"))
+
+google_api_duration = Histogram(
+    "lodge_google_api_duration_seconds", "Latency of Google API calls",
+    ("operation",))
+
+request_google_calls = Histogram(
+    "lodge_request_google_api_calls", "Google API calls made while serving one request",
+    ("route",), buckets=COUNT_BUCKETS)
+
+request_google_seconds = Histogram(
+    "lodge_request_google_api_seconds", "Time spent waiting on Google APIs while serving one request",
+    ("route",))
+
+google_api_throttled = Counter(
+    "lodge_google_api_throttled_total", "Google API calls delayed by the local quota limiter",
+    ("operation",))
+
+google_api_throttle_seconds = Counter(
+    "lodge_google_api_throttle_seconds_total", "Time Google API calls spent waiting for quota",
+    ("operation",))
+
+google_api_retries = Counter(
+    "lodge_google_api_retries_total", "Google API calls retried after a transient failure",
+    ("operation", "reason"))
+
+google_api_rejected = Counter(
+    "lodge_google_api_rejected_total", "Google API calls skipped while the circuit breaker was open",
+    ("operation",))
+
+read_cache_requests = Counter(
+    "lodge_read_cache_requests_total",
+    "Coalesced reads by outcome: cached, shared with a computation in flight, or computed",
+    ("name", "outcome"))
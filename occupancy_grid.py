@@ -0,0 +1,140 @@
+from datetime import date
+
+# Day states sent to the calendar
+FREE = 0
+BOOKED = 1
+IN_HOUSE = 2
+
+# Bookings in these states no longer hold their room for future nights
+RELEASED_STATUSES = ("cancelled", "checked_in")
+
+# Longest range /calendar will encode in one response
+MAX_CALENDAR_DAYS = 400
+
+
+def day_number(value):
+    """Ordinal of a 'YYYY-MM-DD...' string, or None if it isn't a date"""
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def _span_mask(start, end):
+    return (1 << (end - start)) - 1
+
+
+class OccupancyGrid:
+    """Room x day grid with one integer bitset per room
+
+    Bit i of a room's bitset is set when the room is held by an open
+    booking on day origin + i. Each booking's span is remembered, so a
+    change to one booking recomputes only its room. Guests in house are
+    kept apart as an open stay from their check-in day to today.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.origin = date.today().toordinal()
+        self._booked = {}
+        self._spans = {}
+        self._room_spans = {}
+        self._in_house = {}
+
+    # ----- BUILDING -----
+    def rebuild(self, rooms, bookings):
+        """Fill the grid from every booking and every occupied room"""
+        self.clear()
+        for booking_id, booking in bookings.items():
+            self.update_booking(booking_id, booking)
+        for room_number, room_info in rooms.items():
+            self.update_room(room_number, room_info)
+
+    def update_booking(self, booking_id, booking):
+        """Add, move or drop a booking's nights after it has changed"""
+        old = self._spans.pop(booking_id, None)
+        if old:
+            self._room_spans[old[0]].discard(booking_id)
+        start = day_number(booking.get("check_in_date"))
+        end = day_number(booking.get("check_out_date"))
+        if booking.get("status") not in RELEASED_STATUSES and start is not None and end is not None:
+            room = str(booking.get("room"))
+            end = max(end, start + 1)
+            self._rebase(start)
+            self._spans[booking_id] = (room, start, end)
+            self._room_spans.setdefault(room, set()).add(booking_id)
+            self._recompute(room)
+        if old and (booking_id not in self._spans or self._spans[booking_id][0] != old[0]):
+            self._recompute(old[0])
+
+    def update_room(self, room_number, room_info):
+        """Track whether a room has a guest in house, and since when"""
+        if room_info.get("status") == "occupied":
+            start = day_number(room_info.get("checkin_time"))
+            self._in_house[room_number] = start if start is not None else date.today().toordinal()
+        else:
+            self._in_house.pop(room_number, None)
+
+    def _rebase(self, day):
+        """Move the origin back so day fits in every bitset"""
+        if day < self.origin:
+            shift = self.origin - day
+            self._booked = {room: bits << shift for room, bits in self._booked.items()}
+            self.origin = day
+
+    def _recompute(self, room):
+        bits = 0
+        for booking_id in self._room_spans.get(room, ()):
+            _, start, end = self._spans[booking_id]
+            bits |= _span_mask(start, end) << (start - self.origin)
+        if bits:
+            self._booked[room] = bits
+        else:
+            self._booked.pop(room, None)
+
+    # ----- QUERIES -----
+    def _window(self, bits, start, days):
+        """Bits for days [start, start + days) of a bitset, as an int"""
+        offset = start - self.origin
+        bits = bits >> offset if offset >= 0 else bits << -offset
+        return bits & _span_mask(0, days)
+
+    def booked_rooms(self, start, end):
+        """Rooms held by an open booking on any day in [start, end)"""
+        days = max(end - start, 1)
+        return {room for room, bits in self._booked.items() if self._window(bits, start, days)}
+
+    def in_house_rooms(self):
+        return set(self._in_house)
+
+    def states(self, room, start, days, today):
+        """Per-day state of one room for days [start, start + days)"""
+        booked = self._window(self._booked.get(room, 0), start, days)
+        checked_in = self._in_house.get(room)
+        states = []
+        for i in range(days):
+            day = start + i
+            if checked_in is not None and checked_in <= day <= today:
+                states.append(IN_HOUSE)
+            elif booked >> i & 1:
+                states.append(BOOKED)
+            else:
+                states.append(FREE)
+        return states
+
+    def encode(self, room_numbers, start, end):
+        """Run-length encode every room for days [start, end] as flat [state, run, ...] lists"""
+        days = end - start + 1
+        today = date.today().toordinal()
+        encoded = {}
+        for room in room_numbers:
+            runs = []
+            for state in self.states(room, start, days, today):
+                if runs and runs[-2] == state:
+                    runs[-1] += 1
+                else:
+                    runs += [state, 1]
+            encoded[room] = runs
+        return encoded
@@ -0,0 +1,127 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+# Seconds between stack samples of a profiled request
+DEFAULT_INTERVAL = 0.005
+
+# Captures kept on disk; the oldest are removed beyond this
+DEFAULT_KEEP = 50
+
+# Roots of the collapsed stacks, so waiting and computing show as separate towers
+WAITING_ROOT = "[waiting]"
+RUNNING_ROOT = "[running]"
+
+_PROFILE_ID = re.compile(r"^\d{8}-\d{6}-[0-9a-f]{6}$")
+
+
+def frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Samples one thread's stack on a timer and counts the collapsed stacks
+
+    Stacks passing through one of wait_functions are filed under
+    WAITING_ROOT, the rest under RUNNING_ROOT. start() and stop() must be
+    called from the profiled thread, which is also what measures its CPU
+    time.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, wait_functions=()):
+        self.interval = interval
+        self.wait_functions = set(wait_functions)
+        self.stacks = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._started = time.perf_counter()
+        self._cpu_started = time.thread_time()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """Stop sampling; returns wall and CPU seconds and the sample counts"""
+        wall = time.perf_counter() - self._started
+        cpu = time.thread_time() - self._cpu_started
+        self._stop.set()
+        self._sampler.join()
+        waiting = sum(count for stack, count in self.stacks.items() if stack.startswith(WAITING_ROOT))
+        return {"wall_seconds": wall, "cpu_seconds": cpu,
+                "samples": sum(self.stacks.values()), "waiting_samples": waiting}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                break
+            labels = []
+            waiting = False
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                waiting = waiting or frame.f_code.co_name in self.wait_functions
+                frame = frame.f_back
+            labels.append(WAITING_ROOT if waiting else RUNNING_ROOT)
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def folded(self):
+        """Collapsed stacks, one "root;caller;callee count" line each, as flamegraph tools read them"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Captures in a local directory, each a .folded stack file with a .json summary beside it"""
+
+    def __init__(self, directory, keep=DEFAULT_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, summary, folded):
+        """Write a capture, drop the oldest beyond keep, and return the capture's id"""
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{profile_id}.folded"), "w") as f:
+                f.write(folded)
+            with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+                json.dump(dict(summary, id=profile_id), f)
+            for old_id in self._ids()[:-self.keep]:
+                for extension in (".folded", ".json"):
+                    try:
+                        os.remove(os.path.join(self.directory, old_id + extension))
+                    except FileNotFoundError:
+                        pass
+        return profile_id
+
+    def _ids(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(".json")] for name in os.listdir(self.directory)
+                      if name.endswith(".json") and _PROFILE_ID.match(name[:-len(".json")]))
+
+    def list(self):
+        """Summaries of the stored captures, newest first"""
+        summaries = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return summaries
+
+    def folded_path(self, profile_id):
+        """File name of a capture's stacks within the directory, or None if there is no such capture"""
+        if not _PROFILE_ID.match(profile_id or ""):
+            return None
+        name = f"{profile_id}.folded"
+        return name if os.path.exists(os.path.join(self.directory, name)) else None
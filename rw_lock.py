@@ -0,0 +1,77 @@
+import threading
+
+
+class ReadWriteLock:
+    """Any number of readers at once, or one writer
+
+    acquire()/release() and the with statement take the lock exclusively,
+    as an RLock would: the writer may re-enter, and may also take the
+    shared side. acquire_shared()/release_shared() take it shared; the
+    shared side is not re-entrant. Once a writer is waiting, new readers
+    wait behind it, so a steady stream of reads can't hold writes off.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self._waiting_writers = 0
+
+    # ----- EXCLUSIVE -----
+    def acquire(self, blocking=True, timeout=None):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._depth += 1
+                return True
+            if not blocking and (self._writer is not None or self._readers):
+                return False
+            self._waiting_writers += 1
+            try:
+                if not self._condition.wait_for(lambda: self._writer is None and not self._readers, timeout):
+                    return False
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._depth = 1
+            return True
+
+    def release(self):
+        with self._condition:
+            if self._writer != threading.get_ident():
+                raise RuntimeError("Cannot release a lock held by another thread")
+            self._depth -= 1
+            if not self._depth:
+                self._writer = None
+                self._condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def held_exclusively(self):
+        """Whether the calling thread holds the lock as its writer"""
+        return self._writer == threading.get_ident()
+
+    # ----- SHARED -----
+    def acquire_shared(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._depth += 1
+                return
+            self._condition.wait_for(lambda: self._writer is None and not self._waiting_writers)
+            self._readers += 1
+
+    def release_shared(self):
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
@@ -0,0 +1,208 @@
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+
+import numpy as np
+
+# Searchable text of each kind of document, with the weight of a word found in each field
+BOOKING_FIELDS = {"guest_name": 2.0, "notes": 1.0, "cancellation_reason": 1.0}
+EXPENSE_FIELDS = {"description": 1.5, "category": 1.0}
+STAY_FIELDS = {"name": 2.0}
+
+DOCUMENT_KINDS = ("booking", "expense", "stay")
+
+# Function words, which carry no meaning of their own to match on
+STOP_WORDS = frozenset(("a", "an", "and", "the", "of", "for", "to", "in", "on", "at", "with", "about", "that", "this",
+                        "was", "is", "by", "from"))
+
+# A query word of at least this many letters also matches longer words it begins,
+# at a discount, up to this many of them
+MIN_PREFIX_LENGTH = 3
+MAX_PREFIX_EXPANSIONS = 50
+PREFIX_WEIGHT = 0.7
+
+# Okapi BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Documents matching more query words rank first; this outweighs any score difference
+_COVERAGE_RANK = 1e6
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercase words of a text, with the stop words left out"""
+    return [word for word in _WORD.findall(str(text or "").lower()) if word not in STOP_WORDS]
+
+
+class SearchIndex:
+    """Inverted index over booking, expense and stay text, ranked with BM25
+
+    Documents are numbered as they are added; each word maps to the weighted
+    count of it in every document that contains it. Bookings can be edited,
+    so their words are remembered and replaced on update_booking(). Expenses
+    and stays come from logs that only grow and are added once. The
+    vocabulary is kept sorted so a query word can also match the words it
+    is a prefix of. A word's postings are copied into arrays when it is
+    first searched for, and dropped when they change, so a query scores
+    every matching document in a few array operations.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._postings = {}
+            self._vocabulary = []
+            self._documents = []
+            # Per document, read as arrays without copying while searching
+            self._kinds = array("b")
+            self._lengths = array("d")
+            self._arrays = {}
+            self._total_length = 0
+            self._live = 0
+            self._booking_docs = {}
+            self._booking_terms = {}
+
+    # ----- BUILDING -----
+    def rebuild(self, bookings, logs):
+        """Index every booking, expense and walk-in stay"""
+        self.clear()
+        for booking_id, booking in bookings.items():
+            self.update_booking(booking_id, booking)
+        for log_type in ("expenses", "checkins"):
+            for position, entry in enumerate(logs.get(log_type, [])):
+                self.add_log(log_type, position, entry)
+
+    @staticmethod
+    def _terms(record, fields):
+        terms = {}
+        for field, weight in fields.items():
+            for word in tokenize(record.get(field)):
+                terms[word] = terms.get(word, 0) + weight
+        return terms
+
+    def _add(self, reference, terms):
+        doc = len(self._documents)
+        self._documents.append(reference)
+        length = sum(terms.values())
+        self._lengths.append(length)
+        self._kinds.append(DOCUMENT_KINDS.index(reference[0]))
+        self._total_length += length
+        self._live += 1
+        for word, weight in terms.items():
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = {}
+                insort(self._vocabulary, word)
+            posting[doc] = weight
+            self._arrays.pop(word, None)
+        return doc
+
+    def _remove(self, doc, terms):
+        for word in terms:
+            posting = self._postings[word]
+            del posting[doc]
+            self._arrays.pop(word, None)
+            if not posting:
+                del self._postings[word]
+                del self._vocabulary[bisect_left(self._vocabulary, word)]
+        self._total_length -= self._lengths[doc]
+        self._documents[doc] = None
+        self._live -= 1
+
+    def update_booking(self, booking_id, booking):
+        """Index a new booking, or re-index one whose notes, name or cancellation changed"""
+        terms = self._terms(booking, BOOKING_FIELDS)
+        with self._lock:
+            if self._booking_terms.get(booking_id) == terms:
+                return
+            if booking_id in self._booking_docs:
+                self._remove(self._booking_docs[booking_id], self._booking_terms[booking_id])
+            self._booking_docs[booking_id] = self._add(("booking", booking_id), terms)
+            self._booking_terms[booking_id] = terms
+
+    def add_log(self, log_type, position, entry):
+        """Index an expense, or a walk-in check-in as a stay; other log types have no searchable text"""
+        if log_type == "expenses":
+            reference, terms = ("expense", position), self._terms(entry, EXPENSE_FIELDS)
+        elif log_type == "checkins":
+            reference, terms = ("stay", position), self._terms(entry, STAY_FIELDS)
+        else:
+            return
+        if terms:
+            with self._lock:
+                self._add(reference, terms)
+
+    # ----- SEARCH -----
+    def _expand(self, word):
+        """Indexed words a query word matches, with the weight of each match"""
+        matches = {word: 1.0} if word in self._postings else {}
+        if len(word) >= MIN_PREFIX_LENGTH:
+            start = bisect_left(self._vocabulary, word)
+            for candidate in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+                if not candidate.startswith(word):
+                    break
+                matches.setdefault(candidate, PREFIX_WEIGHT)
+        return matches
+
+    def _posting_arrays(self, word):
+        arrays = self._arrays.get(word)
+        if arrays is None:
+            posting = self._postings[word]
+            arrays = self._arrays[word] = (np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                                           np.fromiter(posting.values(), dtype=np.float64, count=len(posting)))
+        return arrays
+
+    def search(self, query, kinds=DOCUMENT_KINDS, limit=20):
+        """Best matches as (kind, reference, score, matched words), best first
+
+        Documents matching more of the query's words rank first, then by
+        their BM25 score; a word counts as matched once, through its best
+        matching indexed word.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if not words or not self._live:
+                return []
+            count = len(self._documents)
+            average_length = self._total_length / self._live
+            lengths = np.frombuffer(self._lengths, dtype=np.float64)
+            totals = np.zeros(count)
+            coverage = np.zeros(count)
+            expansions = []
+            for word in words:
+                best = np.zeros(count)
+                expanded = self._expand(word)
+                for indexed_word, match_weight in expanded.items():
+                    ids, weights = self._posting_arrays(indexed_word)
+                    idf = math.log(1 + (self._live - len(ids) + 0.5) / (len(ids) + 0.5))
+                    norms = K1 * (1 - B + B * lengths[ids] / average_length)
+                    best[ids] = np.maximum(best[ids], match_weight * idf * weights * (K1 + 1) / (weights + norms))
+                totals += best
+                coverage += best > 0
+                expansions.append(expanded)
+
+            if len(kinds) < len(DOCUMENT_KINDS):
+                wanted = [DOCUMENT_KINDS.index(kind) for kind in kinds]
+                coverage[~np.isin(np.frombuffer(self._kinds, dtype=np.int8), wanted)] = 0
+            candidates = np.flatnonzero(coverage)
+            ranks = coverage[candidates] * _COVERAGE_RANK + totals[candidates]
+            if len(candidates) > limit:
+                top = np.argpartition(-ranks, limit - 1)[:limit]
+                candidates, ranks = candidates[top], ranks[top]
+            ranked = candidates[np.argsort(-ranks, kind="stable")]
+
+            results = []
+            for doc in ranked.tolist():
+                # The indexed word behind each query word's match, preferring an exact one
+                matched = [max((indexed_word for indexed_word in expanded if doc in self._postings[indexed_word]),
+                               key=expanded.get, default=None) for expanded in expansions]
+                results.append((*self._documents[doc], round(float(totals[doc]), 3),
+                                [indexed_word for indexed_word in matched if indexed_word]))
+            return results
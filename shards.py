@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+
+# Properties not used for this long are dropped from memory
+DEFAULT_IDLE_SECONDS = 900
+
+
+class UnknownProperty(Exception):
+    """Raised for a property id that isn't configured"""
+
+
+class PropertyConfig:
+    """Where one property keeps its data: spreadsheet, Drive folder, local snapshot and room layout"""
+
+    def __init__(self, property_id, spreadsheet_id, drive_folder_id, snapshot_path, rooms, name=None):
+        self.property_id = property_id
+        self.name = name or property_id
+        self.spreadsheet_id = spreadsheet_id
+        self.drive_folder_id = drive_folder_id
+        self.snapshot_path = snapshot_path
+        self.rooms = rooms
+
+    def describe(self):
+        return {"id": self.property_id, "name": self.name, "rooms": len(self.rooms)}
+
+
+def load_property_configs(path, default):
+    """Read the properties file, {id: {name, spreadsheet_id, drive_folder_id, snapshot_path, rooms}}
+
+    The default property is the first one in the file; settings it leaves
+    out are taken from the deployment's own. Every other property must name
+    its own spreadsheet and Drive folder, so no two properties write to the
+    same ones; its rooms may be left to the default's, and its snapshot path
+    defaults to one file per property.
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, dict) or not entries:
+        raise ValueError(f"{path} must map property ids to their settings")
+    configs = {}
+    for property_id, settings in entries.items():
+        if configs:
+            missing = [key for key in ("spreadsheet_id", "drive_folder_id") if not settings.get(key)]
+            if missing:
+                raise ValueError(f"Property {property_id} in {path} must set its own {' and '.join(missing)}")
+        configs[property_id] = PropertyConfig(
+            property_id,
+            spreadsheet_id=settings.get("spreadsheet_id", default.spreadsheet_id),
+            drive_folder_id=settings.get("drive_folder_id", default.drive_folder_id),
+            snapshot_path=settings.get("snapshot_path", f"data_snapshot.{property_id}.bin"),
+            rooms=[str(room) for room in settings.get("rooms", default.rooms)],
+            name=settings.get("name"))
+    for setting in ("spreadsheet_id", "drive_folder_id"):
+        owners = {}
+        for config in configs.values():
+            value = getattr(config, setting)
+            if value in owners:
+                raise ValueError(f"Properties {owners[value]} and {config.property_id} in {path} "
+                                 f"share the {setting} {value}")
+            owners[value] = config.property_id
+    return configs
+
+
+class ShardRegistry:
+    """Loads each property's shard on first use and evicts shards left idle
+
+    loader(config) builds a shard; can_evict(shard) says whether it may be
+    dropped (nothing unsaved, not still loading) and on_evict(shard) is told
+    when it is. Pinned properties stay loaded.
+    """
+
+    def __init__(self, configs, loader, can_evict, on_evict=None, idle_seconds=DEFAULT_IDLE_SECONDS,
+                 pinned=(), clock=time.monotonic):
+        self.configs = configs
+        self._loader = loader
+        self._can_evict = can_evict
+        self._on_evict = on_evict
+        self.idle_seconds = idle_seconds
+        self.pinned = set(pinned)
+        self._clock = clock
+        self._shards = {}
+        self._last_used = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def get(self, property_id):
+        """The shard for a property, loading it if it isn't in memory"""
+        if property_id not in self.configs:
+            raise UnknownProperty(property_id)
+        now = self._clock()
+        with self._lock:
+            shard = self._shards.get(property_id)
+            if shard is not None:
+                self._last_used[property_id] = now
+            else:
+                # One thread loads a property; others asking meanwhile wait for it
+                loading = self._loading.get(property_id)
+                if loading is None:
+                    loading = self._loading[property_id] = threading.Lock()
+                    loading.acquire()
+                    owner = True
+                else:
+                    owner = False
+        if shard is None:
+            shard = self._load(property_id, loading) if owner else self._wait_for(property_id, loading)
+        if now >= self._next_sweep:
+            self._next_sweep = now + min(self.idle_seconds, 60)
+            self.evict_idle()
+        return shard
+
+    def _load(self, property_id, loading):
+        try:
+            shard = self._loader(self.configs[property_id])
+            with self._lock:
+                self._shards[property_id] = shard
+                self._last_used[property_id] = self._clock()
+            return shard
+        finally:
+            with self._lock:
+                del self._loading[property_id]
+            loading.release()
+
+    def _wait_for(self, property_id, loading):
+        with loading:
+            pass
+        # The load may have failed; try again as the loader
+        return self._shards.get(property_id) or self.get(property_id)
+
+    def loaded(self):
+        """Shards currently in memory, by property id"""
+        with self._lock:
+            return dict(self._shards)
+
+    def last_used(self, property_id):
+        return self._last_used.get(property_id)
+
+    def evict_idle(self):
+        """Drop shards idle longer than idle_seconds; returns the evicted property ids"""
+        cutoff = self._clock() - self.idle_seconds
+        evicted = []
+        with self._lock:
+            for property_id, shard in list(self._shards.items()):
+                if property_id in self.pinned or self._last_used[property_id] > cutoff:
+                    continue
+                if not self._can_evict(shard):
+                    continue
+                del self._shards[property_id]
+                del self._last_used[property_id]
+                evicted.append((property_id, shard))
+        for _, shard in evicted:
+            if self._on_evict:
+                self._on_evict(shard)
+        return [property_id for property_id, _ in evicted]
@@ -0,0 +1,113 @@
+from datetime import date
+
+# Log types whose entries move money in or out during a shift
+COUNTED_LOG_TYPES = ("cash", "online", "refunds", "expenses")
+
+# Shift details that don't fit the log columns, kept as JSON in the notes column
+SHIFT_DETAIL_FIELDS = ["opened_at", "closed_at", "handed_to", "note", "opening_cash", "cash_received",
+                       "online_received", "cash_refunds", "online_refunds", "cash_expenses", "online_expenses",
+                       "entries", "expected_cash", "counted_cash", "difference", "net_cash", "log_positions"]
+
+
+def _empty_counters():
+    return {"cash_received": 0, "online_received": 0, "cash_refunds": 0, "online_refunds": 0,
+            "cash_expenses": 0, "online_expenses": 0, "entries": 0}
+
+
+def _mode(value):
+    return "online" if value == "online" else "cash"
+
+
+def entry_moment(entry):
+    """'YYYY-MM-DD HH:MM' of a log entry, for comparing with shift boundaries"""
+    return f"{entry.get('date') or ''} {entry.get('time') or '00:00'}"
+
+
+def to_log_entry(summary):
+    """Log entry for a closed shift: closed by whom and the net cash, on the day it closed"""
+    details = {field: summary[field] for field in SHIFT_DETAIL_FIELDS if field in summary}
+    closed_date, _, closed_time = summary["closed_at"].partition(" ")
+    return dict(details, room="", name=summary["closed_by"], amount=summary["net_cash"],
+                date=closed_date, time=closed_time)
+
+
+def from_log_entry(entry):
+    """Summary of a closed shift from its log entry"""
+    summary = {field: entry[field] for field in SHIFT_DETAIL_FIELDS if field in entry}
+    summary["closed_by"] = entry.get("name", "")
+    # Shifts closed before the net was kept in the details carry it only as the amount
+    summary.setdefault("net_cash", entry.get("amount", 0))
+    return summary
+
+
+class ShiftLedger:
+    """Running money counters for the shift in progress, so a handover is a lookup
+
+    A shift opens where the last one closed, or at the start of today when
+    none has. Payments, refunds and expenses are folded in as they are
+    logged; closing freezes the counters into a summary and starts the next
+    shift from zero, with the cash handed over as its opening cash.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.opened_at = f"{date.today().isoformat()} 00:00"
+        self.opening_cash = 0
+        self.counters = _empty_counters()
+
+    # ----- BUILDING -----
+    def rebuild(self, logs):
+        """Find where the open shift began and count the entries logged since
+
+        A closed shift records how long each counted log was, since log times
+        only have minute resolution. Entries appended later but dated before
+        the shift opened, such as imported history, are not counted.
+        """
+        self.clear()
+        positions = {}
+        shifts = logs.get("shifts", [])
+        if shifts:
+            last = shifts[-1]
+            self.opened_at = last.get("closed_at") or entry_moment(last)
+            self.opening_cash = last.get("counted_cash", last.get("expected_cash", 0))
+            positions = last.get("log_positions") or {}
+        for log_type in COUNTED_LOG_TYPES:
+            for entry in logs.get(log_type, [])[positions.get(log_type, 0):]:
+                if entry_moment(entry) >= self.opened_at:
+                    self.add(log_type, entry)
+
+    def add(self, log_type, entry):
+        """Fold one newly logged entry into the open shift's counters"""
+        amount = entry.get("amount", 0)
+        if log_type in ("cash", "online"):
+            self.counters[f"{log_type}_received"] += amount
+        elif log_type == "refunds":
+            self.counters[f"{_mode(entry.get('payment_mode'))}_refunds"] += amount
+        elif log_type == "expenses" and entry.get("expense_type", "transaction") == "transaction":
+            self.counters[f"{_mode(entry.get('payment_method'))}_expenses"] += amount
+        else:
+            return
+        self.counters["entries"] += 1
+
+    # ----- QUERIES -----
+    def current(self):
+        """Summary of the open shift so far"""
+        counters = self.counters
+        net_cash = counters["cash_received"] - counters["cash_refunds"] - counters["cash_expenses"]
+        return dict(counters, opened_at=self.opened_at, opening_cash=self.opening_cash,
+                    net_cash=net_cash, expected_cash=self.opening_cash + net_cash)
+
+    def close(self, logs, closed_at, closed_by, handed_to="", counted_cash=None, note=""):
+        """Freeze the open shift into a summary and open the next one at closed_at"""
+        summary = self.current()
+        summary.update(closed_at=closed_at, closed_by=closed_by, handed_to=handed_to, note=note,
+                       log_positions={log_type: len(logs.get(log_type, [])) for log_type in COUNTED_LOG_TYPES})
+        if counted_cash is not None:
+            summary["counted_cash"] = counted_cash
+            summary["difference"] = counted_cash - summary["expected_cash"]
+        self.opened_at = closed_at
+        self.opening_cash = summary.get("counted_cash", summary["expected_cash"])
+        self.counters = _empty_counters()
+        return summary
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+
+# Results kept per cache; the least recently used beyond this are dropped
+DEFAULT_MAX_ENTRIES = 256
+
+CACHED = "cached"
+SHARED = "shared"
+COMPUTED = "computed"
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Results of identical reads, computed once per state version
+
+    A call finding no result for its key and version computes it; identical
+    calls arriving meanwhile wait for that computation instead of starting
+    their own, and later ones reuse the result until the version changes.
+    Failures are passed to the waiting calls but never kept.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, on_outcome=None):
+        self.max_entries = max_entries
+        self._on_outcome = on_outcome
+        self._results = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, compute):
+        """compute()'s result for key at version, sharing it with identical calls"""
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] == version:
+                self._results.move_to_end(key)
+                self._observe(key, CACHED)
+                return cached[1]
+            flight = self._flights.get((key, version))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(key, version)] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            self._observe(key, SHARED)
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                # A slower computation for an older version doesn't replace a newer result
+                cached = self._results.get(key)
+                if cached is None or cached[0] <= version:
+                    self._results[key] = (version, flight.value)
+                    self._results.move_to_end(key)
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+            self._observe(key, COMPUTED)
+            return flight.value
+        finally:
+            with self._lock:
+                del self._flights[(key, version)]
+            flight.done.set()
+
+    def _observe(self, key, outcome):
+        if self._on_outcome:
+            self._on_outcome(key, outcome)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
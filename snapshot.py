@@ -0,0 +1,53 @@
+import mmap
+import os
+import pickle
+import struct
+import zlib
+
+# File layout: magic, format version, CRC-32 of the payload, payload length, pickled payload
+SNAPSHOT_MAGIC = b"LODGESNP"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<8sHIQ")
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, truncated, corrupt or from another version"""
+
+
+def write_snapshot(path, payload):
+    """Atomically write a payload to a versioned, checksummed snapshot file"""
+    body = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, zlib.crc32(body), len(body))
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(temp_path, path)
+    return _HEADER.size + len(body)
+
+
+def read_snapshot(path):
+    """Memory-map a snapshot file, verify it and return its payload"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        raise SnapshotError(f"No snapshot at {path}")
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER.size:
+            raise SnapshotError("Snapshot is truncated")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, checksum, length = _HEADER.unpack_from(mapped, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError("Not a lodge snapshot file")
+            if version != SNAPSHOT_VERSION:
+                raise SnapshotError(f"Snapshot version {version} is not supported")
+            if _HEADER.size + length != size:
+                raise SnapshotError("Snapshot is truncated")
+            body = memoryview(mapped)[_HEADER.size:]
+            try:
+                if zlib.crc32(body) != checksum:
+                    raise SnapshotError("Snapshot checksum mismatch")
+                return pickle.loads(body)
+            finally:
+                body.release()
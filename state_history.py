@@ -0,0 +1,177 @@
+import os
+import re
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+import fast_json
+
+# A full picture of rooms and totals is written after this many change records,
+# or once this long has passed since the last one, so a lookup replays little
+SNAPSHOT_EVERY_EVENTS = 100
+SNAPSHOT_EVERY_SECONDS = 3600
+
+# Days of history kept by default; records older than the last snapshot before
+# the window are dropped once they make up half the file
+RETENTION_DAYS = 90
+
+# Every line starts with its timestamp and kind, so the file can be indexed without parsing it
+_LINE_PREFIX = re.compile(rb'^\{"ts":"([^"]+)","kind":"(snapshot|event)"')
+
+
+def timestamp(moment=None):
+    """Sortable local time with milliseconds, 'YYYY-MM-DD HH:MM:SS.mmm'"""
+    return (moment or datetime.now()).isoformat(sep=" ", timespec="milliseconds")
+
+
+class StateHistory:
+    """Append-only history of the rooms and totals, for rebuilding them at any past moment
+
+    Each record holds only the rooms and totals that changed since the one
+    before, and every so often a snapshot holds all of them. The offsets of
+    the snapshots are kept in memory, so state_at() reads from the last
+    snapshot before the moment asked for and replays only the short tail
+    after it. Records that fall out of the retention window are cut from
+    the front of the file when a snapshot is written.
+    """
+
+    def __init__(self, path, retention_days=RETENTION_DAYS):
+        self.path = path
+        self.retention = timedelta(days=retention_days)
+        self._snapshots = []
+        self._events_since_snapshot = 0
+        self._last_snapshot_at = None
+        self._rooms = None
+        self._totals = None
+        self._file = None
+        self._scan()
+
+    def _scan(self):
+        """Index the snapshots already on disk, dropping a line cut short by a crash"""
+        if not os.path.exists(self.path):
+            return
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                match = _LINE_PREFIX.match(line)
+                if not line.endswith(b"\n") or not match:
+                    break
+                if match.group(2) == b"snapshot":
+                    self._snapshots.append((match.group(1).decode(), offset))
+                    self._events_since_snapshot = 0
+                else:
+                    self._events_since_snapshot += 1
+                offset += len(line)
+        if offset < os.path.getsize(self.path):
+            os.truncate(self.path, offset)
+
+    def _append(self, ts, kind, body):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        offset = self._file.tell()
+        self._file.write(b'{"ts":' + fast_json.dumps(ts) + b',"kind":"' + kind.encode() + b'","body":' + body + b"}\n")
+        self._file.flush()
+        return offset
+
+    def _compact(self, moment):
+        """Drop the records before the last snapshot that still covers the retention window
+
+        Only done once the dropped part is at least half the file, so each
+        record is copied about once over its life.
+        """
+        keep = bisect_right(self._snapshots, (timestamp(moment - self.retention), float("inf"))) - 1
+        if keep <= 0:
+            return
+        start = self._snapshots[keep][1]
+        if start * 2 < self._file.tell():
+            return
+        self.close()
+        partial = self.path + ".tmp"
+        with open(self.path, "rb") as src, open(partial, "wb") as dst:
+            src.seek(start)
+            while chunk := src.read(1 << 20):
+                dst.write(chunk)
+        os.replace(partial, self.path)
+        self._snapshots = [(ts, offset - start) for ts, offset in self._snapshots[keep:]]
+
+    def _snapshot_due(self, moment):
+        if self._rooms is None or self._events_since_snapshot >= SNAPSHOT_EVERY_EVENTS:
+            return True
+        return (moment - self._last_snapshot_at).total_seconds() >= SNAPSHOT_EVERY_SECONDS
+
+    def record(self, rooms, totals, reason, moment=None):
+        """Append the rooms and totals that changed since the last record; False if none did"""
+        moment = moment or datetime.now()
+        ts = timestamp(moment)
+        encoded = {room: fast_json.dumps(info) for room, info in rooms.items()}
+        totals = dict(totals)
+
+        if self._snapshot_due(moment):
+            body = fast_json.dumps_object({
+                "reason": fast_json.dumps(reason),
+                "rooms": fast_json.dumps_object(encoded),
+                "totals": fast_json.dumps(totals)
+            })
+            self._snapshots.append((ts, self._append(ts, "snapshot", body)))
+            self._events_since_snapshot = 0
+            self._last_snapshot_at = moment
+            self._compact(moment)
+        else:
+            changed = {room: value for room, value in encoded.items() if self._rooms.get(room) != value}
+            removed = [room for room in self._rooms if room not in encoded]
+            if not changed and not removed and totals == self._totals:
+                return False
+            fragments = {"reason": fast_json.dumps(reason), "rooms": fast_json.dumps_object(changed)}
+            if removed:
+                fragments["removed"] = fast_json.dumps(removed)
+            if totals != self._totals:
+                fragments["totals"] = fast_json.dumps(totals)
+            self._append(ts, "event", fast_json.dumps_object(fragments))
+            self._events_since_snapshot += 1
+
+        self._rooms = encoded
+        self._totals = totals
+        return True
+
+    def state_at(self, moment):
+        """Rooms and totals as they stood at a moment, or None if it is before the history begins"""
+        target = timestamp(moment)
+        index = bisect_right(self._snapshots, (target, float("inf"))) - 1
+        if index < 0:
+            return None
+        # Records are flushed as they are written, so the file is complete up to its last newline
+        snapshot_at, offset = self._snapshots[index]
+
+        rooms, totals = {}, {}
+        as_of, reasons = snapshot_at, []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                match = _LINE_PREFIX.match(line)
+                # Stop at the first record after the moment, or one still being written
+                if not match or not line.endswith(b"\n") or match.group(1).decode() > target:
+                    break
+                record = fast_json.loads(line)
+                body = record["body"]
+                if record["kind"] == "snapshot":
+                    rooms, totals, reasons = body["rooms"], body["totals"], []
+                else:
+                    rooms.update(body["rooms"])
+                    for room in body.get("removed", ()):
+                        rooms.pop(room, None)
+                    totals = body.get("totals", totals)
+                    reasons.append(body["reason"])
+                as_of = record["ts"]
+
+        return {
+            "as_of": as_of,
+            "snapshot_at": snapshot_at,
+            "events_replayed": len(reasons),
+            "changes_since_snapshot": reasons,
+            "rooms": rooms,
+            "totals": totals
+        }
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
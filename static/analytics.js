@@ -126,7 +126,9 @@ function updateSummaryCards(data) {
       <div class="analytics-card-value">₹${totalExpense}</div>
       <div class="analytics-card-footer">
         <span>Categories: ${
-          (data.expense_logs || []).length > 0
+          data.expense_categories
+            ? data.expense_categories.length
+            : (data.expense_logs || []).length > 0
             ? Object.keys(
                 (data.expense_logs || []).reduce((acc, log) => {
                   acc[log.category] = true;
@@ -605,6 +607,124 @@ function generateDailyRevenueChart(data) {
   });
 }
 
+// Occupancy rate, ADR and RevPAR from the server-side KPI engine
+async function generateOccupancyKpis(startDate, endDate) {
+  const summaryContainer = document.getElementById("kpi-summary");
+  const chartCanvas = document.getElementById("occupancy-chart");
+  if (!summaryContainer || !chartCanvas) return;
+
+  try {
+    const params = new URLSearchParams({ start_date: startDate, end_date: endDate });
+    const response = await fetch(`/analytics/kpis?${params.toString()}`);
+    if (!response.ok) {
+      throw new Error(`Server responded with status: ${response.status}`);
+    }
+    const kpis = await response.json();
+    if (!kpis.success) {
+      throw new Error(kpis.message || "Error loading occupancy");
+    }
+
+    summaryContainer.innerHTML = `
+      <div class="analytics-card">
+        <div class="analytics-card-header">Occupancy</div>
+        <div class="analytics-card-value">${(kpis.occupancy_rate * 100).toFixed(1)}%</div>
+        <div class="analytics-card-footer">
+          <span>${kpis.sold_room_nights} of ${kpis.available_room_nights} room-nights</span>
+        </div>
+      </div>
+      <div class="analytics-card">
+        <div class="analytics-card-header">ADR</div>
+        <div class="analytics-card-value">₹${Math.round(kpis.adr)}</div>
+        <div class="analytics-card-footer">
+          <span>Average daily rate</span>
+        </div>
+      </div>
+      <div class="analytics-card highlighted">
+        <div class="analytics-card-header">RevPAR</div>
+        <div class="analytics-card-value">₹${Math.round(kpis.revpar)}</div>
+        <div class="analytics-card-footer">
+          <span>Room revenue: ₹${Math.round(kpis.room_revenue)}</span>
+        </div>
+      </div>
+    `;
+
+    if (chartCanvas.chart) {
+      chartCanvas.chart.destroy();
+    }
+    const labels = kpis.series.map((point) => {
+      const [year, month, day] = point.period.split("-");
+      return day ? `${day}/${month}` : `${month}/${year}`;
+    });
+
+    const ctx = chartCanvas.getContext("2d");
+    chartCanvas.chart = new Chart(ctx, {
+      type: "bar",
+      data: {
+        labels: labels,
+        datasets: [
+          {
+            type: "line",
+            label: "Occupancy %",
+            data: kpis.series.map((point) => Math.round(point.occupancy_rate * 1000) / 10),
+            borderColor: "#8e44ad",
+            backgroundColor: "rgba(142, 68, 173, 0.1)",
+            yAxisID: "occupancy",
+          },
+          {
+            label: "ADR",
+            data: kpis.series.map((point) => point.adr),
+            backgroundColor: "rgba(41, 128, 185, 0.5)",
+            yAxisID: "rate",
+          },
+          {
+            label: "RevPAR",
+            data: kpis.series.map((point) => point.revpar),
+            backgroundColor: "rgba(39, 174, 96, 0.7)",
+            yAxisID: "rate",
+          },
+        ],
+      },
+      options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        animation: false,
+        plugins: {
+          legend: {
+            position: "top",
+          },
+        },
+        scales: {
+          occupancy: {
+            position: "right",
+            min: 0,
+            max: 100,
+            ticks: {
+              callback: function (value) {
+                return value + "%";
+              },
+            },
+            grid: {
+              drawOnChartArea: false,
+            },
+          },
+          rate: {
+            position: "left",
+            beginAtZero: true,
+            ticks: {
+              callback: function (value) {
+                return "₹" + value;
+              },
+            },
+          },
+        },
+      },
+    });
+  } catch (error) {
+    console.error("Error loading occupancy KPIs:", error);
+    summaryContainer.innerHTML = `<p class="empty-state">Occupancy data unavailable</p>`;
+  }
+}
+
 // Top Services/Add-ons Chart (Horizontal Bar) - NEW CHART
 function generateTopServicesChart(data) {
   const chartCanvas = document.getElementById("top-services-chart");
@@ -741,6 +861,19 @@ function initializeAnalyticsView() {
       </div>
     </div>
 
+    <div class="analytics-row">
+      <!-- Occupancy, ADR and RevPAR -->
+      <div class="analytics-widget">
+        <div class="widget-header">
+          <h3>Occupancy & Room Rates</h3>
+        </div>
+        <div class="analytics-summary" id="kpi-summary"></div>
+        <div class="widget-content">
+          <canvas id="occupancy-chart"></canvas>
+        </div>
+      </div>
+    </div>
+
     <div class="analytics-row">
       <!-- Daily Revenue Breakdown -->
       <div class="analytics-widget">
@@ -839,7 +972,10 @@ async function generateEnhancedReport() {
   try {
     const response = await fetch("/reports", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "application/x-ndjson",
+      },
       body: JSON.stringify({
         start_date: startDate,
         end_date: endDate,
@@ -850,6 +986,12 @@ async function generateEnhancedReport() {
       throw new Error(`Server responded with status: ${response.status}`);
     }
 
+    const contentType = response.headers.get("Content-Type") || "";
+    if (contentType.includes("application/x-ndjson") && response.body) {
+      await renderStreamedReport(response, startDate, endDate);
+      return;
+    }
+
     const data = await response.json();
 
     if (data.success) {
@@ -862,6 +1004,7 @@ async function generateEnhancedReport() {
       // Generate charts for analytics view
       initializeAnalyticsView(); // Reset charts first
       generateAnalytics(data);
+      generateOccupancyKpis(startDate, endDate);
 
       // Render detailed reports for reports view
       renderCompactReportData(data);
@@ -894,6 +1037,52 @@ async function generateEnhancedReport() {
   }
 }
 
+// Read an NDJSON response, handing each parsed line to onMessage as it arrives
+async function readNdjson(response, onMessage) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split("\n");
+    buffered = lines.pop();
+    lines.forEach((line) => line && onMessage(JSON.parse(line)));
+  }
+  if (buffered.trim()) onMessage(JSON.parse(buffered));
+}
+
+// Render a streamed report: summary cards as soon as the first line arrives,
+// then the log tables as their chunks come in, and the charts at the end
+async function renderStreamedReport(response, startDate, endDate) {
+  let data = null;
+  await readNdjson(response, (message) => {
+    if (message.type === "summary") {
+      data = message;
+      Object.keys(message.counts || {}).forEach((section) => {
+        data[section] = [];
+      });
+
+      updateReportDateRange(startDate, endDate);
+      updateReportSummary(data);
+      initializeAnalyticsView();
+      updateSummaryCards(data);
+      generateOccupancyKpis(startDate, endDate);
+      renderReportSkeleton(data);
+    } else if (message.type === "logs" && data) {
+      data[message.section].push(...message.entries);
+      appendReportRows(message.section, message.entries);
+    } else if (message.type === "end" && data) {
+      finishReportSections();
+      generateAnalytics(data);
+    }
+  });
+  if (!data) {
+    throw new Error("Report stream ended before its summary");
+  }
+}
+
 // Update report date range display
 function updateReportDateRange(startDate, endDate) {
   const dateRangeElement = document.getElementById("report-date-range");
@@ -940,232 +1129,127 @@ function updateReportSummary(data) {
   }`;
 }
 
-// Render compact report data
-function renderCompactReportData(data) {
-  const reportContent = document.getElementById("report-content");
-  if (!reportContent) return;
-
-  // Hide loading indicator
-  const loadingIndicator = reportContent.querySelector(".loading-indicator");
-  if (loadingIndicator) loadingIndicator.classList.add("hidden");
-
-  // Remove empty state if it exists
-  const emptyState = reportContent.querySelector(".empty-state");
-  if (emptyState) emptyState.remove();
-
-  // Start building HTML
-  let html = "";
-
-  // Cash Payments logs
-  let cashTotal = 0;
-  html += `
-    <div class="logs-container transaction-section">
-      <h3>Cash Payments</h3>
-      <div class="transaction-logs">
-  `;
-
-  if (!data.cash_logs || data.cash_logs.length === 0) {
-    html += '<div class="log-item">No cash payments in this period</div>';
-  } else {
-    data.cash_logs.forEach((log) => {
-      cashTotal += log.amount;
-      html += `
-        <div class="log-item">
-          <div class="log-details">
-            <div class="log-title">Room ${log.room} - ${log.name} ${
-        log.item ? `<span class="transaction-item">(${log.item})</span>` : ""
-      }</div>
-            <div class="log-subtitle">${log.date} ${log.time || ""}</div>
-          </div>
-          <div class="log-amount">₹${log.amount}</div>
-        </div>
-      `;
-    });
-
-    // Add section total
-    html += `
-      <div class="log-item section-total">
-        <div class="log-details">
-          <div class="log-title">Total Cash Payments</div>
-        </div>
-        <div class="log-amount">₹${cashTotal}</div>
+function renderTransactionLogRow(log) {
+  return `
+    <div class="log-item">
+      <div class="log-details">
+        <div class="log-title">Room ${log.room} - ${log.name} ${
+    log.item ? `<span class="transaction-item">(${log.item})</span>` : ""
+  }</div>
+        <div class="log-subtitle">${log.date} ${log.time || ""}</div>
       </div>
-    `;
-  }
-
-  html += `</div></div>`;
-
-  // Online Payments logs
-  let onlineTotal = 0;
-  html += `
-    <div class="logs-container transaction-section">
-      <h3>Online Payments</h3>
-      <div class="transaction-logs">
+      <div class="log-amount">₹${log.amount}</div>
+    </div>
   `;
+}
 
-  if (!data.online_logs || data.online_logs.length === 0) {
-    html += '<div class="log-item">No online payments in this period</div>';
-  } else {
-    data.online_logs.forEach((log) => {
-      onlineTotal += log.amount;
-      html += `
-        <div class="log-item">
-          <div class="log-details">
-            <div class="log-title">Room ${log.room} - ${log.name} ${
-        log.item ? `<span class="transaction-item">(${log.item})</span>` : ""
-      }</div>
-            <div class="log-subtitle">${log.date} ${log.time || ""}</div>
-          </div>
-          <div class="log-amount">₹${log.amount}</div>
-        </div>
-      `;
-    });
-
-    // Add section total
-    html += `
-      <div class="log-item section-total">
-        <div class="log-details">
-          <div class="log-title">Total Online Payments</div>
+function renderExpenseLogRow(log) {
+  const categoryDisplay =
+    log.category.charAt(0).toUpperCase() + log.category.slice(1);
+  return `
+    <div class="log-item ${
+      log.expense_type === "transaction" ? "transaction-expense" : "report-expense"
+    }">
+      <div class="log-details">
+        <div class="log-title">
+          ${log.description} 
+          <span class="expense-category-badge">${categoryDisplay}</span>
         </div>
-        <div class="log-amount">₹${onlineTotal}</div>
+        <div class="log-subtitle">${log.date} ${log.time || ""}</div>
       </div>
-    `;
-  }
-
-  html += `</div></div>`;
-
-  // Expenses
-  let expenseTotal = 0;
-  html += `
-    <div class="logs-container transaction-section">
-      <h3>Expenses</h3>
-      <div class="transaction-logs">
+      <div class="log-amount">₹${log.amount}</div>
+    </div>
   `;
+}
 
-  if (!data.expense_logs || data.expense_logs.length === 0) {
-    html += '<div class="log-item">No expenses in this period</div>';
-  } else {
-    data.expense_logs.forEach((log) => {
-      expenseTotal += log.amount;
-      const categoryDisplay =
-        log.category.charAt(0).toUpperCase() + log.category.slice(1);
-
-      html += `
-        <div class="log-item ${
-          log.expense_type === "transaction"
-            ? "transaction-expense"
-            : "report-expense"
-        }">
-          <div class="log-details">
-            <div class="log-title">
-              ${log.description} 
-              <span class="expense-category-badge">${categoryDisplay}</span>
-            </div>
-            <div class="log-subtitle">${log.date} ${log.time || ""}</div>
-          </div>
-          <div class="log-amount">₹${log.amount}</div>
-        </div>
-      `;
-    });
-
-    // Add section total
-    html += `
-      <div class="log-item section-total">
-        <div class="log-details">
-          <div class="log-title">Total Expenses</div>
-        </div>
-        <div class="log-amount">₹${expenseTotal}</div>
+function renderRefundLogRow(log) {
+  return `
+    <div class="log-item">
+      <div class="log-details">
+        <div class="log-title">Room ${log.room} - ${log.name}</div>
+        <div class="log-subtitle">${log.date} ${log.time || ""}</div>
       </div>
-    `;
-  }
-
-  html += `</div></div>`;
-
-  // Refunds
-  let refundTotal = 0;
-  html += `
-    <div class="logs-container transaction-section">
-      <h3>Refunds</h3>
-      <div class="transaction-logs">
+      <div class="log-amount" style="color: var(--danger);">₹${log.amount}</div>
+    </div>
   `;
+}
 
-  if (!data.refund_logs || data.refund_logs.length === 0) {
-    html += '<div class="log-item">No refunds in this period</div>';
-  } else {
-    data.refund_logs.forEach((log) => {
-      refundTotal += log.amount;
-      html += `
-        <div class="log-item">
-          <div class="log-details">
-            <div class="log-title">Room ${log.room} - ${log.name}</div>
-            <div class="log-subtitle">${log.date} ${log.time || ""}</div>
-          </div>
-          <div class="log-amount" style="color: var(--danger);">₹${
-            log.amount
-          }</div>
-        </div>
-      `;
-    });
-
-    // Add section total
-    html += `
-      <div class="log-item section-total">
-        <div class="log-details">
-          <div class="log-title">Total Refunds</div>
-        </div>
-        <div class="log-amount" style="color: var(--danger);">₹${refundTotal}</div>
+function renderAddonLogRow(log) {
+  const paymentMethod = log.payment_method
+    ? `<span class="service-payment-badge ${log.payment_method}">${log.payment_method}</span>`
+    : "";
+  return `
+    <div class="log-item">
+      <div class="log-details">
+        <div class="log-title">Room ${log.room} - ${log.item} ${paymentMethod}</div>
+        <div class="log-subtitle">${log.date} ${log.time || ""}</div>
       </div>
-    `;
-  }
-
-  html += `</div></div>`;
-
-  // Add-ons
-  let addonTotal = 0;
-  html += `
-    <div class="logs-container transaction-section">
-      <h3>Add-on Services</h3>
-      <div class="transaction-logs">
+      <div class="log-amount">₹${log.price}</div>
+    </div>
   `;
+}
 
-  if (!data.addon_logs || data.addon_logs.length === 0) {
-    html += '<div class="log-item">No add-on services in this period</div>';
-  } else {
-    data.addon_logs.forEach((log) => {
-      addonTotal += log.price;
-      const paymentMethod = log.payment_method
-        ? `<span class="service-payment-badge ${log.payment_method}">${log.payment_method}</span>`
-        : "";
-
-      html += `
-        <div class="log-item">
-          <div class="log-details">
-            <div class="log-title">Room ${log.room} - ${
-        log.item
-      } ${paymentMethod}</div>
-            <div class="log-subtitle">${log.date} ${log.time || ""}</div>
-          </div>
-          <div class="log-amount">₹${log.price}</div>
-        </div>
-      `;
-    });
+// Log tables of the detailed report, in the order the server streams them
+const REPORT_SECTION_VIEWS = {
+  cash_logs: {
+    title: "Cash Payments",
+    empty: "No cash payments in this period",
+    totalLabel: "Total Cash Payments",
+    amount: (log) => log.amount,
+    row: renderTransactionLogRow,
+  },
+  online_logs: {
+    title: "Online Payments",
+    empty: "No online payments in this period",
+    totalLabel: "Total Online Payments",
+    amount: (log) => log.amount,
+    row: renderTransactionLogRow,
+  },
+  expense_logs: {
+    title: "Expenses",
+    empty: "No expenses in this period",
+    totalLabel: "Total Expenses",
+    amount: (log) => log.amount,
+    row: renderExpenseLogRow,
+  },
+  refund_logs: {
+    title: "Refunds",
+    empty: "No refunds in this period",
+    totalLabel: "Total Refunds",
+    amount: (log) => log.amount,
+    row: renderRefundLogRow,
+    danger: true,
+  },
+  addon_logs: {
+    title: "Add-on Services",
+    empty: "No add-on services in this period",
+    totalLabel: "Total Add-ons",
+    amount: (log) => log.price,
+    row: renderAddonLogRow,
+  },
+};
+
+// Lay out the detailed report from its summary; the tables fill in as rows arrive
+function renderReportSkeleton(data) {
+  const reportContent = document.getElementById("report-content");
+  if (!reportContent) return;
 
-    // Add section total
+  let html = "";
+  Object.entries(REPORT_SECTION_VIEWS).forEach(([section, view]) => {
     html += `
-      <div class="log-item section-total">
-        <div class="log-details">
-          <div class="log-title">Total Add-ons</div>
+      <div class="logs-container transaction-section">
+        <h3>${view.title}</h3>
+        <div class="transaction-logs" data-report-section="${section}" data-total="0">
+          <div class="log-item report-loading">Loading...</div>
         </div>
-        <div class="log-amount">₹${addonTotal}</div>
       </div>
     `;
-  }
-
-  html += `</div></div>`;
+  });
 
   // Grand total summary
-  const totalIncome = cashTotal + onlineTotal;
-  const totalExpenses = expenseTotal;
+  const totalIncome = (data.cash_total || 0) + (data.online_total || 0);
+  const totalExpenses = data.expense_total || 0;
+  const refundTotal = data.refund_total || 0;
   const netRevenue = totalIncome - totalExpenses - refundTotal;
 
   html += `
@@ -1200,10 +1284,87 @@ function renderCompactReportData(data) {
     </div>
   `;
 
-  // Set the HTML content
+  // Replaces the loading indicator and empty state along with any earlier report
   reportContent.innerHTML = html;
 }
 
+// Add a chunk of rows to one table of the detailed report
+function appendReportRows(section, entries) {
+  const view = REPORT_SECTION_VIEWS[section];
+  const container = document.querySelector(
+    `#report-content [data-report-section="${section}"]`
+  );
+  if (!view || !container || !entries.length) return;
+
+  container.querySelector(".report-loading")?.remove();
+  let total = Number(container.dataset.total);
+  entries.forEach((log) => {
+    total += view.amount(log);
+  });
+  container.dataset.total = total;
+  container.insertAdjacentHTML("beforeend", entries.map(view.row).join(""));
+}
+
+// Close every table: a total under those with rows, a note in the empty ones
+function finishReportSections() {
+  Object.entries(REPORT_SECTION_VIEWS).forEach(([section, view]) => {
+    const container = document.querySelector(
+      `#report-content [data-report-section="${section}"]`
+    );
+    if (!container) return;
+
+    container.querySelector(".report-loading")?.remove();
+    if (!container.children.length) {
+      container.innerHTML = `<div class="log-item">${view.empty}</div>`;
+      return;
+    }
+    const style = view.danger ? ' style="color: var(--danger);"' : "";
+    container.insertAdjacentHTML(
+      "beforeend",
+      `
+      <div class="log-item section-total">
+        <div class="log-details">
+          <div class="log-title">${view.totalLabel}</div>
+        </div>
+        <div class="log-amount"${style}>₹${container.dataset.total}</div>
+      </div>
+    `
+    );
+  });
+}
+
+// Render compact report data from a complete, non-streamed report
+function renderCompactReportData(data) {
+  renderReportSkeleton(data);
+  Object.keys(REPORT_SECTION_VIEWS).forEach((section) => {
+    appendReportRows(section, data[section] || []);
+  });
+  finishReportSections();
+}
+
+// Download the selected date range as a streamed CSV or Excel file
+function exportTransactions(format) {
+  const startDate = document.getElementById("start-date")?.value;
+  const endDate = document.getElementById("end-date")?.value;
+
+  if (!startDate || !endDate) {
+    showNotification("Please select both start and end dates", "error");
+    return;
+  }
+  if (new Date(startDate) > new Date(endDate)) {
+    showNotification("Start date must be before end date", "error");
+    return;
+  }
+
+  const params = new URLSearchParams({
+    start_date: startDate,
+    end_date: endDate,
+    format: format,
+  });
+  // Navigating to the attachment lets the browser save it as it streams
+  window.location.href = `/export?${params.toString()}`;
+}
+
 // Initialize Analytics on document load
 document.addEventListener("DOMContentLoaded", function () {
   // Set up chart defaults to prevent resizing
@@ -1227,4 +1388,11 @@ document.addEventListener("DOMContentLoaded", function () {
       }
     });
   }
+
+  document
+    .getElementById("export-csv")
+    ?.addEventListener("click", () => exportTransactions("csv"));
+  document
+    .getElementById("export-xlsx")
+    ?.addEventListener("click", () => exportTransactions("xlsx"));
 });
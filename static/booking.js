@@ -5,6 +5,11 @@ let currentBookingFilter = "upcoming";
 
 // DOM Elements
 document.addEventListener("DOMContentLoaded", function () {
+  // Today's bookings come embedded in the page; the full list loads with the tab
+  if (initialState && bookings.length === 0) {
+    bookings = initialState.bookings;
+  }
+
   // Initialize booking tab
   const bookingNavItem = document.querySelector(
     '.nav-item[data-tab="bookings"]'
@@ -1748,7 +1753,88 @@ function switchBookingView(view) {
   }
 }
 
-function renderCalendar() {
+// Decoded /calendar response for the range on screen
+let calendarGrid = null;
+let calendarRequest = 0;
+
+// Fetch every room's per-day state for a date range and expand its runs
+async function fetchCalendarGrid(startDateStr, endDateStr) {
+  const response = await fetch(
+    `/calendar?from=${startDateStr}&to=${endDateStr}`
+  );
+  if (!response.ok) {
+    throw new Error(`Server responded with status: ${response.status}`);
+  }
+
+  const result = await response.json();
+  if (!result.success) {
+    throw new Error(result.message || "Error loading calendar");
+  }
+
+  // Runs arrive as flat [state, length, state, length, ...] lists per room
+  const states = {};
+  result.rooms.forEach((room) => {
+    const roomStates = new Uint8Array(result.days);
+    const runs = result.runs[room] || [];
+    let offset = 0;
+    for (let i = 0; i < runs.length; i += 2) {
+      roomStates.fill(runs[i], offset, offset + runs[i + 1]);
+      offset += runs[i + 1];
+    }
+    states[room] = roomStates;
+  });
+
+  return {
+    startDate: result.start_date,
+    endDate: result.end_date,
+    days: result.days,
+    codes: result.states,
+    rooms: result.rooms,
+    states,
+  };
+}
+
+// Position of a date within the loaded grid, or -1 if outside it
+function calendarDayIndex(grid, dateStr) {
+  if (!grid || dateStr < grid.startDate || dateStr > grid.endDate) return -1;
+  const start = new Date(`${grid.startDate}T00:00:00`);
+  const date = new Date(`${dateStr}T00:00:00`);
+  return Math.round((date - start) / 86400000);
+}
+
+// Booked, in-house and free rooms on one day of the grid
+function summarizeCalendarDay(grid, index) {
+  const summary = { booked: [], inHouse: [], free: [] };
+  if (index < 0) return summary;
+  grid.rooms.forEach((room) => {
+    const state = grid.states[room][index];
+    if (state === grid.codes.booked) summary.booked.push(room);
+    else if (state === grid.codes.in_house) summary.inHouse.push(room);
+    else summary.free.push(room);
+  });
+  return summary;
+}
+
+// First and last dates shown, including adjacent months' days
+function getCalendarRange() {
+  const startDate = new Date(
+    currentCalendarDate.getFullYear(),
+    currentCalendarDate.getMonth(),
+    1
+  );
+  startDate.setDate(1 - startDate.getDay());
+
+  const endDate = new Date(
+    currentCalendarDate.getFullYear(),
+    currentCalendarDate.getMonth() + 1,
+    0
+  );
+  endDate.setDate(endDate.getDate() + (6 - endDate.getDay()));
+
+  return { startDate, endDate };
+}
+
+async function renderCalendar() {
   const calendarTitle = document.getElementById("calendar-title");
   const calendarDaysGrid = document.getElementById("calendar-days-grid");
 
@@ -1773,148 +1859,66 @@ function renderCalendar() {
     monthNames[currentCalendarDate.getMonth()]
   } ${currentCalendarDate.getFullYear()}`;
 
-  // Clear the calendar grid
-  calendarDaysGrid.innerHTML = "";
-
-  // Calculate the first day of the month
-  const firstDay = new Date(
-    currentCalendarDate.getFullYear(),
-    currentCalendarDate.getMonth(),
-    1
-  );
-  const lastDay = new Date(
-    currentCalendarDate.getFullYear(),
-    currentCalendarDate.getMonth() + 1,
-    0
-  );
-
-  // Get the day of the week for the first day (0 = Sunday, 1 = Monday, etc.)
-  const startingDay = firstDay.getDay();
-
-  // Get the number of days in the previous month
-  const prevMonthLastDay = new Date(
-    currentCalendarDate.getFullYear(),
-    currentCalendarDate.getMonth(),
-    0
-  ).getDate();
-
-  // Filter bookings for the current month and adjacent days
-  const currentMonthBookings = getCurrentMonthBookings();
-
-  // Get today's date for highlighting
-  const today = new Date();
-  const todayDate = today.getDate();
-  const todayMonth = today.getMonth();
-  const todayYear = today.getFullYear();
-
-  // Create days from previous month to fill the first row
-  for (let i = 0; i < startingDay; i++) {
-    const day = prevMonthLastDay - startingDay + i + 1;
-    const date = new Date(
-      currentCalendarDate.getFullYear(),
-      currentCalendarDate.getMonth() - 1,
-      day
-    );
-    const dateStr = formatDateForAPI(date);
-
-    // Get bookings for this day
-    const dayBookings = currentMonthBookings.filter((booking) =>
-      isDateInBookingRange(
-        dateStr,
-        booking.check_in_date,
-        booking.check_out_date
-      )
-    );
+  const { startDate, endDate } = getCalendarRange();
+  const viewMonth = currentCalendarDate.getMonth();
 
-    calendarDaysGrid.appendChild(
-      createDayElement(day, dayBookings, "different-month", dateStr)
+  // Only the latest request may draw, in case the month changed meanwhile
+  const request = ++calendarRequest;
+  try {
+    const grid = await fetchCalendarGrid(
+      formatDateForAPI(startDate),
+      formatDateForAPI(endDate)
     );
+    if (request !== calendarRequest) return;
+    calendarGrid = grid;
+  } catch (error) {
+    console.error("Error loading calendar:", error);
+    if (request !== calendarRequest) return;
+    calendarGrid = null;
   }
 
-  // Create days for current month
-  for (let day = 1; day <= lastDay.getDate(); day++) {
-    const date = new Date(
-      currentCalendarDate.getFullYear(),
-      currentCalendarDate.getMonth(),
-      day
-    );
-    const dateStr = formatDateForAPI(date);
+  // Clear the calendar grid
+  calendarDaysGrid.innerHTML = "";
 
-    // Get bookings for this day
-    const dayBookings = currentMonthBookings.filter((booking) =>
-      isDateInBookingRange(
-        dateStr,
-        booking.check_in_date,
-        booking.check_out_date
-      )
+  const todayStr = formatDateForAPI(new Date());
+  for (
+    let date = new Date(startDate);
+    date <= endDate;
+    date.setDate(date.getDate() + 1)
+  ) {
+    const dateStr = formatDateForAPI(date);
+    const summary = summarizeCalendarDay(
+      calendarGrid,
+      calendarDayIndex(calendarGrid, dateStr)
     );
 
-    // Check if this is today
-    const isToday =
-      day === todayDate &&
-      currentCalendarDate.getMonth() === todayMonth &&
-      currentCalendarDate.getFullYear() === todayYear;
+    let extraClass = "";
+    if (date.getMonth() !== viewMonth) {
+      extraClass = "different-month";
+    } else if (dateStr === todayStr) {
+      extraClass = "today";
+    }
 
     calendarDaysGrid.appendChild(
-      createDayElement(day, dayBookings, isToday ? "today" : "", dateStr)
+      createDayElement(date.getDate(), summary, extraClass, dateStr)
     );
   }
 
-  // Calculate how many days from the next month to show to complete the grid
-  // We want to have complete weeks, so the total should be a multiple of 7
-  const totalDaysShown = startingDay + lastDay.getDate();
-  const remainingCells = 7 - (totalDaysShown % 7);
-
-  // Only add next month days if needed (if we're not already at the end of a week)
-  if (remainingCells < 7) {
-    // Create days from next month
-    for (let day = 1; day <= remainingCells; day++) {
-      const date = new Date(
-        currentCalendarDate.getFullYear(),
-        currentCalendarDate.getMonth() + 1,
-        day
-      );
-      const dateStr = formatDateForAPI(date);
-
-      // Get bookings for this day
-      const dayBookings = currentMonthBookings.filter((booking) =>
-        isDateInBookingRange(
-          dateStr,
-          booking.check_in_date,
-          booking.check_out_date
-        )
-      );
-
-      calendarDaysGrid.appendChild(
-        createDayElement(day, dayBookings, "different-month", dateStr)
-      );
-    }
-  }
-
   // Optimize display based on screen size
   optimizeCalendarForScreenSize();
 }
 
-function createDayElement(dayNumber, bookings, extraClass, dateStr) {
+function createDayElement(dayNumber, summary, extraClass, dateStr) {
   const dayElement = document.createElement("div");
   dayElement.className = `calendar-day ${extraClass || ""}`;
   dayElement.dataset.date = dateStr;
 
-  // Filter active bookings (not cancelled)
-  const activeBookings = bookings.filter((b) => b.status !== "cancelled");
-  const confirmedBookings = activeBookings.filter(
-    (b) => b.status === "confirmed"
-  );
-  const checkedInBookings = activeBookings.filter(
-    (b) => b.status === "checked_in"
-  );
-
-  // Add classes for styling based on bookings
-  if (confirmedBookings.length > 0) {
+  // Add classes for styling based on room states
+  if (summary.booked.length > 0) {
     dayElement.classList.add("has-bookings");
   }
 
-  if (checkedInBookings.length > 0) {
+  if (summary.inHouse.length > 0) {
     dayElement.classList.add("has-checkins");
   }
 
@@ -1924,45 +1928,50 @@ function createDayElement(dayNumber, bookings, extraClass, dateStr) {
   dayNumberEl.textContent = dayNumber;
   dayElement.appendChild(dayNumberEl);
 
-  // Add booking count if there are any active bookings
-  if (activeBookings.length > 0) {
+  const heldRooms = [
+    ...summary.inHouse.map((room) => ({ room, inHouse: true })),
+    ...summary.booked.map((room) => ({ room, inHouse: false })),
+  ];
+
+  // Add booking count if any rooms are held
+  if (summary.booked.length > 0) {
     const bookingCount = document.createElement("div");
     bookingCount.className = `booking-count ${
-      activeBookings.length > 1 ? "has-multiple" : ""
+      summary.booked.length > 1 ? "has-multiple" : ""
     }`;
-    bookingCount.textContent = `${activeBookings.length} booking${
-      activeBookings.length !== 1 ? "s" : ""
+    bookingCount.textContent = `${summary.booked.length} booking${
+      summary.booked.length !== 1 ? "s" : ""
     }`;
     dayElement.appendChild(bookingCount);
+  }
 
-    // Show preview of first bookings (limit based on screen size)
-    // Initially show up to 2, this will be adjusted by optimizeCalendarForScreenSize
-    const maxPreviewsToShow = Math.min(2, activeBookings.length);
-
-    for (let i = 0; i < maxPreviewsToShow; i++) {
-      const booking = activeBookings[i];
+  if (heldRooms.length > 0) {
+    // One preview per held room; optimizeCalendarForScreenSize trims them to fit
+    heldRooms.forEach(({ room, inHouse }) => {
       const bookingPreview = document.createElement("div");
       bookingPreview.className = `day-booking-preview ${
-        booking.status === "checked_in" ? "checked-in" : ""
+        inHouse ? "checked-in" : ""
       }`;
-      bookingPreview.textContent = `${booking.room}: ${booking.guest_name}`;
+      bookingPreview.textContent = `Room ${room}`;
       dayElement.appendChild(bookingPreview);
-    }
+    });
 
-    // If there are more bookings than we're showing, add indicator
-    if (activeBookings.length > maxPreviewsToShow) {
-      const moreBookings = document.createElement("div");
-      moreBookings.className = "day-booking-preview more-indicator";
-      moreBookings.textContent = `+${
-        activeBookings.length - maxPreviewsToShow
-      } more`;
-      dayElement.appendChild(moreBookings);
-    }
+    const moreBookings = document.createElement("div");
+    moreBookings.className = "day-booking-preview more-indicator";
+    dayElement.appendChild(moreBookings);
   }
 
-  // Add click event to show day details
+  // Bookings are only looked up for the day that was clicked
   dayElement.addEventListener("click", function () {
-    showDayDetails(dateStr, bookings);
+    const dayBookings = bookings.filter(
+      (booking) =>
+        isDateInBookingRange(
+          dateStr,
+          booking.check_in_date,
+          booking.check_out_date
+        )
+    );
+    showDayDetails(dateStr, dayBookings);
   });
 
   return dayElement;
@@ -2110,40 +2119,6 @@ function showNewBookingModalForDate(dateStr) {
   modal.classList.add("show");
 }
 
-// Get bookings for the current month view
-function getCurrentMonthBookings() {
-  // Get the start and end dates for the calendar view (including adjacent months' days)
-  const startDate = new Date(
-    currentCalendarDate.getFullYear(),
-    currentCalendarDate.getMonth(),
-    1
-  );
-  startDate.setDate(1 - startDate.getDay()); // Go back to the first day shown on the calendar
-
-  const endDate = new Date(
-    currentCalendarDate.getFullYear(),
-    currentCalendarDate.getMonth() + 1,
-    0
-  );
-  const daysAfter = 6 - endDate.getDay();
-  endDate.setDate(endDate.getDate() + daysAfter); // Go forward to the last day shown on the calendar
-
-  // Format dates for comparison
-  const startDateStr = formatDateForAPI(startDate);
-  const endDateStr = formatDateForAPI(endDate);
-
-  // Filter bookings that fall within our calendar view
-  return bookings.filter((booking) => {
-    const bookingCheckIn = booking.check_in_date;
-    const bookingCheckOut = booking.check_out_date;
-
-    // A booking is in our view if:
-    // 1. Check-in date is before or equal to the end date of our calendar, AND
-    // 2. Check-out date is after or equal to the start date of our calendar
-    return bookingCheckIn <= endDateStr && bookingCheckOut >= startDateStr;
-  });
-}
-
 // Check if a date falls within a booking's date range
 function isDateInBookingRange(dateStr, checkInDate, checkOutDate) {
   // Convert to comparable format
@@ -2183,6 +2158,12 @@ function formatDateForDisplay(date) {
 
 // Check availability for a specific date
 async function checkAvailabilityForDate(dateStr) {
+  // Dates on the calendar on screen are answered from its grid
+  const index = calendarDayIndex(calendarGrid, dateStr);
+  if (index >= 0) {
+    return summarizeCalendarDay(calendarGrid, index).free;
+  }
+
   try {
     // Create a next day date for check_out_date
     const checkInDate = new Date(dateStr);
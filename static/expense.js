@@ -248,51 +248,6 @@ function updateRenderLogs(originalRenderLogs) {
       return;
     }
 
-    // Get today's date and previous dates
-    const today = new Date();
-    const yesterday = new Date(today);
-    yesterday.setDate(yesterday.getDate() - 1);
-    const dayBeforeYesterday = new Date(today);
-    dayBeforeYesterday.setDate(dayBeforeYesterday.getDate() - 2);
-
-    const todayStr = today.toISOString().split("T")[0];
-    const yesterdayStr = yesterday.toISOString().split("T")[0];
-    const dayBeforeYesterdayStr = dayBeforeYesterday
-      .toISOString()
-      .split("T")[0];
-
-    // Filter logs for the past 2 days + today
-    const recentDates = [todayStr, yesterdayStr, dayBeforeYesterdayStr];
-
-    // Filter logs for the recent dates
-    const recentCashLogs = logs.cash.filter((log) =>
-      recentDates.includes(log.date)
-    );
-    const recentOnlineLogs = logs.online.filter((log) =>
-      recentDates.includes(log.date)
-    );
-    const recentRefundLogs = (logs.refunds || []).filter((log) =>
-      recentDates.includes(log.date)
-    );
-
-    // Add expenses to the logs
-    const recentExpenseLogs = (logs.expenses || []).filter(
-      (log) =>
-        recentDates.includes(log.date) && log.expense_type === "transaction" // Only include transaction expenses in daily logs
-    );
-
-    // Combine and sort by date and time (most recent first)
-    const allRecentLogs = [
-      ...recentCashLogs,
-      ...recentOnlineLogs,
-      ...recentRefundLogs,
-      ...recentExpenseLogs,
-    ].sort((a, b) => {
-      const dateA = new Date(`${a.date} ${a.time || "00:00"}`);
-      const dateB = new Date(`${b.date} ${b.time || "00:00"}`);
-      return dateB - dateA;
-    });
-
     // Update totals
     if (cashTotal) cashTotal.textContent = "₹" + totals.cash;
     if (onlineTotal) onlineTotal.textContent = "₹" + totals.online;
@@ -308,106 +263,8 @@ function updateRenderLogs(originalRenderLogs) {
       totalRevenue.textContent =
         "₹" + (totals.cash + totals.online - (totals.refunds || 0));
 
-    // Render logs
-    if (allRecentLogs.length === 0) {
-      transactionLog.innerHTML = `<div class="empty-state" style="padding: 2rem;">
-        <i class="fas fa-receipt fa-3x"></i>
-        <p>No transactions in the past 3 days</p>
-      </div>`;
-      return;
-    }
-
-    // Group logs by date
-    const logsByDate = {};
-    allRecentLogs.forEach((log) => {
-      if (!logsByDate[log.date]) {
-        logsByDate[log.date] = [];
-      }
-      logsByDate[log.date].push(log);
-    });
-
-    let logsHTML = "";
-
-    // Format date for display
-    function formatDate(dateStr) {
-      const date = new Date(dateStr);
-      const options = { weekday: "long", month: "short", day: "numeric" };
-      return date.toLocaleDateString("en-US", options);
-    }
-
-    // Add section for each date
-    Object.keys(logsByDate)
-      .sort((a, b) => new Date(b) - new Date(a)) // Sort dates in descending order
-      .forEach((date) => {
-        // Add date header
-        let dateDisplay = formatDate(date);
-
-        // Mark today, yesterday
-        if (date === todayStr) {
-          dateDisplay = "Today (" + dateDisplay + ")";
-        } else if (date === yesterdayStr) {
-          dateDisplay = "Yesterday (" + dateDisplay + ")";
-        }
-
-        logsHTML += `<div class="log-date-header">${dateDisplay}</div>`;
-
-        // Add logs for this date
-        logsByDate[date].forEach((log) => {
-          let type = "Unknown";
-          let color = "";
-
-          if (recentCashLogs.includes(log)) {
-            type = "Cash Payment";
-          } else if (recentOnlineLogs.includes(log)) {
-            type = "Online Payment";
-          } else if (recentRefundLogs.includes(log)) {
-            type = "Refund";
-            color = 'style="color: var(--danger)"';
-          } else if (recentExpenseLogs.includes(log)) {
-            type = `Expense: ${log.category}`;
-            color = 'style="color: var(--danger)"';
-          }
-
-          // Add room shift indicator if applicable
-          const shiftInfo = log.room_shifted
-            ? `<span class="room-shifted-badge">Shifted: ${log.old_room} → ${log.room}</span>`
-            : "";
-
-          // Format differently for expenses vs other logs
-          if (recentExpenseLogs.includes(log)) {
-            logsHTML += `
-              <div class="log-item transaction-expense">
-                <div class="log-details">
-                  <div class="log-title">
-                    ${log.description}
-                    <span class="expense-category-badge">${log.category}</span>
-                  </div>
-                  <div class="log-subtitle">${type} (${
-              log.payment_method
-            }) at ${log.time || "N/A"}</div>
-                </div>
-                <div class="log-amount" ${color}>₹${log.amount}</div>
-              </div>
-            `;
-          } else {
-            logsHTML += `
-              <div class="log-item">
-                <div class="log-details">
-                  <div class="log-title">Room ${log.room} - ${
-              log.name
-            }${shiftInfo}</div>
-                  <div class="log-subtitle">${type} at ${
-              log.time || "N/A"
-            }</div>
-                </div>
-                <div class="log-amount" ${color}>₹${log.amount}</div>
-              </div>
-            `;
-          }
-        });
-      });
-
-    transactionLog.innerHTML = logsHTML;
+    // Expenses are listed with the payments by log_list.js
+    refreshLogList();
   };
 }
 
@@ -552,6 +409,7 @@ function updateReportGeneration(originalGenerateReport) {
 
         // Call modified render function with expense data
         renderReportDataWithExpenses(data);
+        renderExpenseBudgets(endDate.slice(0, 7));
       } else {
         showNotification(data.message || "Error generating report", "error");
         if (emptyState) {
@@ -578,6 +436,44 @@ function updateReportGeneration(originalGenerateReport) {
   };
 }
 
+// Show the month's spend per category against its budget
+async function renderExpenseBudgets(month) {
+  const container = document.getElementById("expense-budgets");
+  if (!container) return;
+
+  try {
+    const response = await fetch(
+      `/expenses/summary?month=${encodeURIComponent(month)}`
+    );
+    const summary = await response.json();
+    const budgeted = (summary.categories || []).filter((item) => item.budget);
+    if (!summary.success || budgeted.length === 0) return;
+
+    let html = `
+      <div class="summary-card">
+        <div class="summary-title">Budgets (${summary.month})</div>
+    `;
+    budgeted.forEach((item) => {
+      const color =
+        item.status === "over"
+          ? 'style="color: var(--danger);"'
+          : item.status === "warning"
+          ? 'style="color: var(--warning);"'
+          : "";
+      html += `
+        <div class="summary-row">
+          <div class="summary-label">${item.category}</div>
+          <div class="summary-value" ${color}>₹${item.total} / ₹${item.budget}</div>
+        </div>
+      `;
+    });
+    html += `</div>`;
+    container.innerHTML = html;
+  } catch (error) {
+    console.error("Error loading expense budgets:", error);
+  }
+}
+
 // Render report data with expenses
 function renderReportDataWithExpenses(data) {
   const reportContent = document.getElementById("report-content");
@@ -659,6 +555,8 @@ function renderReportDataWithExpenses(data) {
       </div>
     </div>
 
+    <div id="expense-budgets"></div>
+
     <div class="summary-card">
       <div class="summary-title">Occupancy Statistics</div>
       <div class="summary-row">
@@ -686,31 +584,13 @@ function renderReportDataWithExpenses(data) {
         <div>
     `;
 
-    // Group expenses by category for summary
-    const expensesByCategory = {};
-    data.expense_logs.forEach((expense) => {
-      const category = expense.category || "others";
-      if (!expensesByCategory[category]) {
-        expensesByCategory[category] = {
-          count: 0,
-          total: 0,
-          items: [],
-        };
-      }
-
-      expensesByCategory[category].count++;
-      expensesByCategory[category].total += expense.amount;
-      expensesByCategory[category].items.push(expense);
-    });
-
-    // Render category summary
+    // Category rollups come precomputed from the server
     html += `<div class="expense-categories-summary">`;
 
-    Object.keys(expensesByCategory).forEach((category) => {
-      const categoryData = expensesByCategory[category];
+    (data.expense_categories || []).forEach((categoryData) => {
       html += `
         <div class="expense-category-item">
-          <div class="expense-category-name">${category} (${categoryData.count})</div>
+          <div class="expense-category-name">${categoryData.category} (${categoryData.count})</div>
           <div class="expense-category-amount">₹${categoryData.total}</div>
         </div>
       `;
@@ -0,0 +1,298 @@
+// Transaction log: pages from /logs as the list is scrolled, and keeps only
+// the rows in view in the DOM, so a long history is never loaded or drawn in full.
+
+const LOG_PAGE_SIZE = 100;
+const LOG_MAX_PAGE_SIZE = 500;
+// Every row, date headers included, is drawn at this height (see .log-row)
+const LOG_ROW_HEIGHT = 64;
+// Rows drawn above and below the visible ones, and how close to the end the next page is fetched
+const LOG_OVERSCAN_ROWS = 10;
+// What the list shows when no type is picked
+const LOG_DEFAULT_TYPES = "cash,online,refunds,expenses";
+
+const LOG_TYPE_LABELS = {
+  cash: "Cash Payment",
+  online: "Online Payment",
+  refunds: "Refund",
+  add_ons: "Add-on",
+  balance: "Balance",
+  renewals: "Rent Renewal",
+  booking_payments: "Booking Payment",
+  checkins: "Check-in",
+  expenses: "Expense",
+  shifts: "Shift Closed",
+};
+
+const logList = {
+  query: null,
+  rows: [],
+  entryCount: 0,
+  cursor: null,
+  done: false,
+  loading: false,
+  version: null,
+  // Bumped on every reset, so a page fetched for older filters is dropped
+  generation: 0,
+  stale: true,
+  spacer: null,
+};
+
+function logListQuery() {
+  const value = (id) => {
+    const element = document.getElementById(id);
+    return element ? element.value.trim() : "";
+  };
+  const params = new URLSearchParams({ type: value("log-filter-type") || LOG_DEFAULT_TYPES });
+  const filters = {
+    room: value("log-filter-room"),
+    mode: value("log-filter-mode"),
+    from: value("log-filter-from"),
+    to: value("log-filter-to"),
+  };
+  Object.entries(filters).forEach(([name, filter]) => {
+    if (filter) params.set(name, filter);
+  });
+  params.set("order", value("log-filter-order") || "desc");
+  return params;
+}
+
+function logListVisible() {
+  return transactionLog && transactionLog.offsetParent !== null;
+}
+
+// Rows for a run of entries, with a date header wherever the date changes
+function appendLogRows(entries) {
+  entries.forEach((entry) => {
+    const last = logList.rows[logList.rows.length - 1];
+    const lastDate = last ? (last.entry ? last.entry.date : last.date) : null;
+    if (entry.date !== lastDate) logList.rows.push({ date: entry.date });
+    logList.rows.push({ entry });
+  });
+  logList.entryCount += entries.length;
+}
+
+function resetLogList(query) {
+  logList.query = query;
+  logList.rows = [];
+  logList.entryCount = 0;
+  logList.cursor = null;
+  logList.done = false;
+  logList.generation += 1;
+}
+
+// Reload the first page for the current filters; called whenever the data may have changed
+async function refreshLogList() {
+  if (!transactionLog) return;
+  if (!logListVisible()) {
+    logList.stale = true;
+    return;
+  }
+  logList.stale = false;
+
+  const query = logListQuery();
+  const sameQuery = logList.query && logList.query.toString() === query.toString();
+  // Reload as many entries as are showing, so the scroll position holds
+  const limit = sameQuery
+    ? Math.min(Math.max(logList.entryCount, LOG_PAGE_SIZE), LOG_MAX_PAGE_SIZE)
+    : LOG_PAGE_SIZE;
+  if (!sameQuery) {
+    resetLogList(query);
+    transactionLog.scrollTop = 0;
+    drawLogWindow();
+  }
+  const generation = logList.generation;
+  const page = await fetchLogPage(query, null, limit);
+  if (!page || generation !== logList.generation) return;
+  if (sameQuery && page.version === logList.version && logList.rows.length) return;
+
+  resetLogList(query);
+  acceptLogPage(page);
+}
+
+async function loadMoreLogs() {
+  if (logList.loading || logList.done || !logList.query) return;
+  const generation = logList.generation;
+  logList.loading = true;
+  try {
+    const page = await fetchLogPage(logList.query, logList.cursor, LOG_PAGE_SIZE);
+    if (page && generation === logList.generation) acceptLogPage(page);
+  } finally {
+    logList.loading = false;
+  }
+}
+
+async function fetchLogPage(query, cursor, limit) {
+  const params = new URLSearchParams(query);
+  params.set("limit", limit);
+  if (cursor) params.set("cursor", cursor);
+  try {
+    const response = await fetch(`/logs?${params}`);
+    const page = await response.json();
+    if (!page.success) throw new Error(page.message);
+    return page;
+  } catch (error) {
+    // Offline: page through the recent logs mirrored in IndexedDB instead
+    debugLog(`Log page unavailable (${error.message}); using the offline mirror`);
+    return cursor ? null : localLogPage(query, await mirroredLogs());
+  }
+}
+
+function acceptLogPage(page) {
+  appendLogRows(page.entries);
+  logList.cursor = page.next_cursor;
+  logList.done = !page.next_cursor;
+  logList.version = page.version;
+  drawLogWindow();
+}
+
+// Logs of the last /get_data state kept for offline use, with queued changes applied
+async function mirroredLogs() {
+  const mirrored = window.lodgeOffline ? await window.lodgeOffline.logs().catch(() => null) : null;
+  return mirrored || logs;
+}
+
+// Every matching entry of the given logs, as one last page
+function localLogPage(query, logs) {
+  const types = query.get("type").split(",");
+  const room = query.get("room");
+  const mode = query.get("mode");
+  const from = query.get("from");
+  const to = query.get("to");
+  const entries = [];
+  types.forEach((type) => {
+    (logs[type] || []).forEach((entry) => {
+      const entryMode =
+        type === "cash" || type === "online" ? type : entry.payment_mode || entry.payment_method;
+      if (room && String(entry.room) !== room) return;
+      if (mode && entryMode !== mode) return;
+      if (from && entry.date < from) return;
+      if (to && entry.date > to) return;
+      entries.push({ ...entry, log_type: type });
+    });
+  });
+  const moment = (entry) => `${entry.date} ${entry.time || "00:00"}`;
+  entries.sort((a, b) => (moment(a) < moment(b) ? -1 : moment(a) > moment(b) ? 1 : 0));
+  if (query.get("order") !== "asc") entries.reverse();
+  return { entries, next_cursor: null, version: null };
+}
+
+function formatLogDate(dateStr) {
+  const todayStr = new Date().toISOString().split("T")[0];
+  const yesterday = new Date();
+  yesterday.setDate(yesterday.getDate() - 1);
+  const display = new Date(dateStr).toLocaleDateString("en-US", {
+    weekday: "long",
+    month: "short",
+    day: "numeric",
+  });
+  if (dateStr === todayStr) return `Today (${display})`;
+  if (dateStr === yesterday.toISOString().split("T")[0]) return `Yesterday (${display})`;
+  return display;
+}
+
+function logRowHTML(row, index) {
+  const position = `style="top: ${index * LOG_ROW_HEIGHT}px"`;
+  if (!row.entry) {
+    return `<div class="log-row log-date-header" ${position}>${formatLogDate(row.date)}</div>`;
+  }
+
+  const log = row.entry;
+  let type = LOG_TYPE_LABELS[log.log_type] || log.log_type;
+  const outgoing = log.log_type === "refunds" || log.log_type === "expenses";
+  const color = outgoing ? 'style="color: var(--danger)"' : "";
+
+  if (log.log_type === "expenses") {
+    type = `Expense: ${log.category}`;
+    const reportClass = log.expense_type === "report" ? "report-expense" : "transaction-expense";
+    return `
+      <div class="log-row log-item ${reportClass}" ${position}>
+        <div class="log-details">
+          <div class="log-title">
+            ${log.description}
+            <span class="expense-category-badge">${log.category}</span>
+          </div>
+          <div class="log-subtitle">${type} (${log.payment_method}) at ${log.time || "N/A"}</div>
+        </div>
+        <div class="log-amount" ${color}>₹${log.amount}</div>
+      </div>
+    `;
+  }
+
+  // Add room shift indicator if applicable
+  const shiftInfo = log.room_shifted
+    ? `<span class="room-shifted-badge">Shifted: ${log.old_room} → ${log.room}</span>`
+    : "";
+  return `
+    <div class="log-row log-item" ${position}>
+      <div class="log-details">
+        <div class="log-title">Room ${log.room} - ${log.name}${shiftInfo}</div>
+        <div class="log-subtitle">${type} at ${log.time || "N/A"}</div>
+      </div>
+      <div class="log-amount" ${color}>₹${log.amount ?? log.price}</div>
+    </div>
+  `;
+}
+
+// Draw the rows in and near the viewport, and fetch the next page when the end is close
+function drawLogWindow() {
+  if (!transactionLog) return;
+  if (!logList.rows.length) {
+    logList.spacer = null;
+    transactionLog.innerHTML = logList.done
+      ? `<div class="empty-state" style="padding: 2rem;">
+          <i class="fas fa-receipt fa-3x"></i>
+          <p>No transactions match these filters</p>
+        </div>`
+      : `<div class="loading-indicator">
+          <span class="loader"></span>
+          <p>Loading transactions...</p>
+        </div>`;
+    return;
+  }
+  if (!logList.spacer || !transactionLog.contains(logList.spacer)) {
+    transactionLog.innerHTML = "";
+    logList.spacer = document.createElement("div");
+    logList.spacer.className = "log-spacer";
+    transactionLog.appendChild(logList.spacer);
+  }
+
+  const first = Math.max(Math.floor(transactionLog.scrollTop / LOG_ROW_HEIGHT) - LOG_OVERSCAN_ROWS, 0);
+  const visibleRows = Math.ceil(transactionLog.clientHeight / LOG_ROW_HEIGHT);
+  const last = Math.min(first + visibleRows + 2 * LOG_OVERSCAN_ROWS, logList.rows.length);
+  logList.spacer.style.height = `${logList.rows.length * LOG_ROW_HEIGHT}px`;
+  let html = "";
+  for (let index = first; index < last; index++) {
+    html += logRowHTML(logList.rows[index], index);
+  }
+  logList.spacer.innerHTML = html;
+
+  if (!logList.done && last >= logList.rows.length - LOG_OVERSCAN_ROWS) {
+    loadMoreLogs();
+  }
+}
+
+document.addEventListener("DOMContentLoaded", function () {
+  if (!transactionLog) return;
+
+  let frame = null;
+  transactionLog.addEventListener("scroll", () => {
+    if (frame) return;
+    frame = requestAnimationFrame(() => {
+      frame = null;
+      drawLogWindow();
+    });
+  });
+
+  // The list has no size while its tab is hidden; load or redraw once it is shown
+  if (typeof ResizeObserver === "function") {
+    new ResizeObserver(() => {
+      if (!logListVisible()) return;
+      if (logList.stale) refreshLogList();
+      else drawLogWindow();
+    }).observe(transactionLog);
+  }
+
+  document.querySelectorAll(".log-filters select, .log-filters input").forEach((filter) => {
+    filter.addEventListener("change", refreshLogList);
+  });
+});
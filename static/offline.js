@@ -0,0 +1,497 @@
+// Offline support for the front desk: registers the service worker that caches
+// the app shell, mirrors the last /get_data state (rooms, totals and the recent
+// logs) in IndexedDB and queues check-ins, payments, add-ons and expenses while
+// the server is unreachable.
+// A /batch of such changes is queued whole or not at all. The queue is
+// replayed in order through /replay once the connection returns.
+(function () {
+  // Each property served by the deployment keeps its own mirror and queue
+  const PROPERTY = (document.cookie.match(/(?:^|;\s*)lodge_property=([^;]*)/) || [])[1];
+  const DB_NAME = PROPERTY
+    ? `lodge-offline-${decodeURIComponent(PROPERTY)}`
+    : "lodge-offline";
+  const DB_VERSION = 1;
+  const QUEUEABLE_ENDPOINTS = ["/checkin", "/checkout", "/add_on", "/add_expense"];
+  const REPLAY_BATCH_SIZE = 50;
+  const REPLAY_INTERVAL_MS = 30000;
+
+  const nativeFetch = window.fetch.bind(window);
+  let dbPromise = null;
+  let replayInProgress = false;
+
+  // ----- IndexedDB -----
+  function openDb() {
+    if (!dbPromise) {
+      dbPromise = new Promise((resolve, reject) => {
+        const request = indexedDB.open(DB_NAME, DB_VERSION);
+        request.onupgradeneeded = () => {
+          const db = request.result;
+          db.createObjectStore("state");
+          db.createObjectStore("queue", { keyPath: "seq", autoIncrement: true });
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+      });
+    }
+    return dbPromise;
+  }
+
+  async function withStore(storeName, mode, action) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+      const transaction = db.transaction(storeName, mode);
+      const request = action(transaction.objectStore(storeName));
+      transaction.oncomplete = () => resolve(request ? request.result : undefined);
+      transaction.onerror = () => reject(transaction.error);
+      transaction.onabort = () => reject(transaction.error);
+    });
+  }
+
+  const readMirror = () =>
+    withStore("state", "readonly", (store) => store.get("get_data"));
+  const writeMirror = (state) =>
+    withStore("state", "readwrite", (store) => store.put(state, "get_data"));
+  const readQueue = () =>
+    withStore("queue", "readonly", (store) => store.getAll());
+  const enqueueAll = (mutations) =>
+    withStore("queue", "readwrite", (store) => {
+      mutations.forEach((mutation) => store.add(mutation));
+      return null;
+    });
+  const dequeue = (seqs) =>
+    withStore("queue", "readwrite", (store) => {
+      seqs.forEach((seq) => store.delete(seq));
+      return null;
+    });
+
+  // ----- Helpers -----
+  function jsonResponse(body, status = 200) {
+    return new Response(JSON.stringify(body), {
+      status: status,
+      headers: { "Content-Type": "application/json", "X-Lodge-Offline": "1" },
+    });
+  }
+
+  function pad(value) {
+    return String(value).padStart(2, "0");
+  }
+
+  function localDate(now) {
+    return `${now.getFullYear()}-${pad(now.getMonth() + 1)}-${pad(now.getDate())}`;
+  }
+
+  function localTime(now) {
+    return `${pad(now.getHours())}:${pad(now.getMinutes())}`;
+  }
+
+  function newMutationId() {
+    if (window.crypto && crypto.randomUUID) {
+      return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+  }
+
+  function notify(message, type, duration) {
+    if (typeof showNotification === "function") {
+      showNotification(message, type, duration);
+    } else {
+      console.warn(message);
+    }
+  }
+
+  // ----- Local state changes, mirroring the server routes -----
+  function applyCheckin(state, body, mutation, now) {
+    const room = state.rooms[body.room];
+    if (!room) return `Room ${body.room} does not exist`;
+    if (room.status !== "vacant") return `Room ${body.room} is already occupied`;
+
+    const amountPaid = parseInt(body.amountPaid || 0, 10);
+    const price = parseInt(body.price, 10);
+    const balance = price - amountPaid;
+    if (amountPaid > 0 && body.payment === "balance") {
+      return "Cannot use 'Pay Later' with an amount paid. Please select Cash or Online.";
+    }
+
+    state.rooms[body.room] = {
+      status: "occupied",
+      guest: {
+        name: body.name,
+        mobile: body.mobile,
+        price: price,
+        guests: parseInt(body.guests, 10),
+        payment: body.payment,
+        balance: balance,
+        photo: body.photoPath || null,
+      },
+      checkin_time: `${localDate(now)} ${localTime(now)}`,
+      balance: balance,
+      add_ons: [],
+      renewal_count: 0,
+      queued_checkin: mutation.id,
+    };
+    if (amountPaid > 0) {
+      state.logs[body.payment].push({
+        room: body.room,
+        name: body.name,
+        amount: amountPaid,
+        time: localTime(now),
+        date: localDate(now),
+      });
+      state.totals[body.payment] += amountPaid;
+    }
+    if (balance > 0) {
+      state.logs.balance.push({
+        room: body.room,
+        name: body.name,
+        amount: balance,
+        date: localDate(now),
+      });
+      state.totals.balance += balance;
+    }
+    return null;
+  }
+
+  function addRefund(state, roomNumber, name, amount, method, note, now) {
+    state.logs.refunds = state.logs.refunds || [];
+    state.logs.refunds.push({
+      room: roomNumber,
+      name: name,
+      amount: amount,
+      payment_mode: method,
+      time: localTime(now),
+      date: localDate(now),
+      note: note,
+    });
+    state.totals.refunds = (state.totals.refunds || 0) + amount;
+  }
+
+  function applyCheckout(state, body, now) {
+    const room = state.rooms[body.room];
+    if (!room || !room.guest) return `Room ${body.room} is not occupied`;
+    const amount = parseInt(body.amount || 0, 10);
+    const mode = body.payment_mode;
+
+    if (amount > 0 && mode && !body.is_refund && !body.process_refund) {
+      state.logs[mode].push({
+        room: body.room,
+        name: room.guest.name,
+        amount: amount,
+        time: localTime(now),
+        date: localDate(now),
+      });
+      state.totals[mode] += amount;
+      if (room.balance > 0) {
+        state.totals.balance -= Math.min(amount, room.balance);
+      }
+      room.balance -= amount;
+      return null;
+    }
+
+    if (body.process_refund && body.is_refund && amount > 0) {
+      if (Math.abs(room.balance) < amount) {
+        return `Refund amount (₹${amount}) exceeds available balance (₹${Math.abs(room.balance)})`;
+      }
+      const note = Math.abs(room.balance) > amount ? "Partial refund" : "Full refund";
+      addRefund(state, body.room, room.guest.name, amount, mode || "cash", note, now);
+      room.balance += amount;
+      return null;
+    }
+
+    if (body.final_checkout) {
+      if (room.balance > 0) return "Please clear the balance before checkout";
+      if (room.balance < 0 && "refund_method" in body) {
+        addRefund(state, body.room, room.guest.name, Math.abs(room.balance),
+          body.refund_method || "cash", "Checkout refund", now);
+      }
+      state.rooms[body.room] = {
+        status: "vacant",
+        guest: null,
+        checkin_time: null,
+        balance: 0,
+        add_ons: [],
+      };
+      return null;
+    }
+    return "Invalid request parameters";
+  }
+
+  function applyAddOn(state, body, now) {
+    const room = state.rooms[body.room];
+    if (!room || !room.guest) return `Room ${body.room} is not occupied`;
+    const price = parseInt(body.price, 10);
+    const method = body.payment_method || "balance";
+    const entry = {
+      room: body.room,
+      item: body.item,
+      price: price,
+      time: localTime(now),
+      date: localDate(now),
+      payment_method: method,
+    };
+
+    if (method === "cash" || method === "online") {
+      state.logs[method].push({
+        room: body.room,
+        name: room.guest.name,
+        amount: price,
+        time: entry.time,
+        date: entry.date,
+        item: body.item,
+        payment_method: method,
+      });
+      state.totals[method] += price;
+    } else {
+      room.balance += price;
+      state.totals.balance += price;
+      state.logs.balance.push({
+        room: body.room,
+        name: room.guest.name,
+        amount: price,
+        time: entry.time,
+        date: entry.date,
+        item: body.item,
+        note: `Added ${body.item} to balance`,
+      });
+    }
+    room.add_ons.push(entry);
+    state.logs.add_ons.push(entry);
+    return null;
+  }
+
+  function applyExpense(state, body, now) {
+    const amount = parseInt(body.amount || 0, 10);
+    if (!body.date || !body.category || !body.description || amount <= 0) {
+      return "All fields are required";
+    }
+    const expenseType = body.type || "transaction";
+    state.logs.expenses = state.logs.expenses || [];
+    state.logs.expenses.push({
+      date: body.date,
+      category: body.category,
+      description: body.description,
+      amount: amount,
+      payment_method: body.payment_method || "cash",
+      expense_type: expenseType,
+      time: localTime(now),
+    });
+    if (expenseType === "transaction") {
+      state.totals.expenses = (state.totals.expenses || 0) + amount;
+    }
+    return null;
+  }
+
+  // Returns an error message, or null once the change is applied to state
+  function applyMutation(state, mutation) {
+    const now = new Date(mutation.queued_at);
+    const body = mutation.body;
+    switch (mutation.endpoint) {
+      case "/checkin":
+        return applyCheckin(state, body, mutation, now);
+      case "/checkout":
+        return applyCheckout(state, body, now);
+      case "/add_on":
+        return applyAddOn(state, body, now);
+      case "/add_expense":
+        return applyExpense(state, body, now);
+      default:
+        return "Unsupported offline change";
+    }
+  }
+
+  // The stay a room change was made against, so the server can spot a different guest
+  function stayOf(state, mutation) {
+    const room = state && mutation.body.room ? state.rooms[mutation.body.room] : null;
+    if (!room || mutation.endpoint === "/checkin" || mutation.endpoint === "/add_expense") {
+      return null;
+    }
+    return room.queued_checkin ? `queued:${room.queued_checkin}` : room.checkin_time;
+  }
+
+  // ----- Fetch interception -----
+  async function fetchState(input, init) {
+    let response;
+    try {
+      response = await nativeFetch(input, init);
+    } catch (error) {
+      const state = await readMirror().catch(() => null);
+      if (!state) throw error;
+      updateStatus(true);
+      return jsonResponse(state);
+    }
+    if (!response.ok) return response;
+
+    try {
+      const state = await response.clone().json();
+      // Changes still waiting to replay aren't in the server's state yet
+      const queue = await readQueue();
+      queue.forEach((mutation) => applyMutation(state, mutation));
+      await writeMirror(state);
+      return queue.length ? jsonResponse(state) : response;
+    } catch (error) {
+      // Without IndexedDB (private browsing) the app simply runs online-only
+      console.warn("Offline mirror unavailable:", error);
+      return response;
+    }
+  }
+
+  async function sendOrQueue(endpoint, input, init) {
+    const pending = await readQueue().catch(() => []);
+    if (!pending.length && navigator.onLine !== false) {
+      try {
+        return await nativeFetch(input, init);
+      } catch (error) {
+        // Only network failures are queued
+        if (!(error instanceof TypeError)) throw error;
+      }
+    }
+
+    const body = JSON.parse(init.body);
+    const operations = endpoint === "/batch" ? body.operations || [] : [{ endpoint, body }];
+    if (operations.some((operation) => !QUEUEABLE_ENDPOINTS.includes(operation.endpoint))) {
+      return jsonResponse({
+        success: false,
+        message: "This change needs a connection; please try again once back online.",
+      });
+    }
+    const state = await readMirror().catch(() => null);
+    if (!state) {
+      return jsonResponse({
+        success: false,
+        message: "Offline and no saved data yet; please reconnect once to enable offline mode.",
+      });
+    }
+
+    // Every operation must apply before any of them is kept
+    const queuedAt = new Date().toISOString();
+    const mutations = [];
+    for (const operation of operations) {
+      const mutation = {
+        id: newMutationId(),
+        endpoint: operation.endpoint,
+        body: operation.body,
+        queued_at: queuedAt,
+      };
+      mutation.stay = stayOf(state, mutation);
+      const problem = applyMutation(state, mutation);
+      if (problem) {
+        return jsonResponse({ success: false, failed_index: mutations.length, message: problem });
+      }
+      mutations.push(mutation);
+    }
+    await enqueueAll(mutations);
+    await writeMirror(state);
+    updateStatus(true);
+    const result = {
+      success: true,
+      queued: true,
+      message: "Saved offline; it will sync when the connection returns.",
+    };
+    if (endpoint === "/batch") {
+      result.results = mutations.map((mutation) => ({
+        endpoint: mutation.endpoint,
+        success: true,
+        queued: true,
+      }));
+    }
+    return jsonResponse(result);
+  }
+
+  window.fetch = function (input, init = {}) {
+    const url = new URL(typeof input === "string" ? input : input.url, window.location.href);
+    const method = (init.method || (typeof input === "string" ? "GET" : input.method)).toUpperCase();
+    if (url.origin !== window.location.origin) {
+      return nativeFetch(input, init);
+    }
+    if (url.pathname === "/get_data" && method === "GET") {
+      return fetchState(input, init);
+    }
+    const queueable = QUEUEABLE_ENDPOINTS.includes(url.pathname) || url.pathname === "/batch";
+    if (method === "POST" && queueable && typeof init.body === "string") {
+      return sendOrQueue(url.pathname, input, init);
+    }
+    return nativeFetch(input, init);
+  };
+
+  // ----- Replay -----
+  async function replayQueue() {
+    if (replayInProgress || navigator.onLine === false) return;
+    replayInProgress = true;
+    let replayed = 0;
+    try {
+      let queue = await readQueue();
+      while (queue.length) {
+        const batch = queue.slice(0, REPLAY_BATCH_SIZE);
+        const response = await nativeFetch("/replay", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({
+            mutations: batch.map(({ seq, ...mutation }) => mutation),
+          }),
+        });
+        if (!response.ok) break;
+        const result = await response.json();
+        if (!result.success) break;
+
+        await dequeue(batch.slice(0, result.results.length).map((mutation) => mutation.seq));
+        replayed += result.results.length;
+        result.results
+          .filter((outcome) => !["applied", "duplicate"].includes(outcome.status))
+          .forEach((outcome) =>
+            notify(`Offline change not applied: ${outcome.message}`, "warning", 10000)
+          );
+        queue = await readQueue();
+      }
+    } catch (error) {
+      // Still offline; the next attempt picks up where this one stopped
+      console.warn("Offline replay paused:", error);
+    } finally {
+      replayInProgress = false;
+    }
+
+    const remaining = (await readQueue()).length;
+    updateStatus(remaining > 0);
+    if (replayed > 0) {
+      notify(`Synced ${replayed} offline change${replayed === 1 ? "" : "s"}`, "success");
+      if (typeof fetchData === "function") {
+        await fetchData();
+      }
+    }
+  }
+
+  async function updateStatus(offline) {
+    const banner = document.getElementById("offline-status");
+    if (!banner) return;
+    const pending = (await readQueue().catch(() => [])).length;
+    if (!offline && !pending && navigator.onLine !== false) {
+      banner.hidden = true;
+      return;
+    }
+    banner.hidden = false;
+    banner.textContent = navigator.onLine === false || offline
+      ? `Offline — ${pending} change${pending === 1 ? "" : "s"} waiting to sync`
+      : `Syncing ${pending} offline change${pending === 1 ? "" : "s"}…`;
+  }
+
+  window.addEventListener("online", () => {
+    updateStatus(false);
+    replayQueue();
+  });
+  window.addEventListener("offline", () => updateStatus(true));
+  document.addEventListener("DOMContentLoaded", () => {
+    updateStatus(false);
+    replayQueue();
+  });
+  setInterval(replayQueue, REPLAY_INTERVAL_MS);
+
+  if ("serviceWorker" in navigator) {
+    navigator.serviceWorker.register("/sw.js").catch((error) => {
+      console.warn("Service worker registration failed:", error);
+    });
+  }
+
+  window.lodgeOffline = {
+    replay: replayQueue,
+    // The mirrored logs only hold the recent days /get_data sends
+    logs: async () => ((await readMirror()) || {}).logs || null,
+  };
+})();
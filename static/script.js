@@ -164,10 +164,14 @@ document.addEventListener("DOMContentLoaded", function () {
   // Initialize camera functionality
   initCamera();
 
+  // Initialize returning guest lookup
+  initGuestLookup();
+
   // Initialize service buttons
   initServiceButtons();
 
-  // Fetch initial data
+  // Paint from the state embedded in the page, then fetch the recent logs
+  applyInitialState();
   fetchData();
 
   // Bottom navigation
@@ -539,6 +543,34 @@ document.addEventListener("DOMContentLoaded", function () {
   debugLog("Initialization complete");
 });
 
+// Send several operations to /batch; the server applies all of them with
+// one save, or none of them if any fails
+async function postBatch(operations) {
+  const response = await fetch("/batch", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ operations }),
+  });
+  if (!response.ok) {
+    throw new Error(`Server responded with status: ${response.status}`);
+  }
+  return response.json();
+}
+
+// Payment that settles the balance when the amount typed into the checkout
+// modal covers it; only the balance is taken, so no refund is left to settle
+function getCheckoutSettlement(balance) {
+  const amountInput = document.getElementById("checkout-payment-amount");
+  const amount = amountInput ? parseInt(amountInput.value) : 0;
+  if (!amount || amount < balance) return null;
+  const mode = document
+    .querySelector("#checkout-cash-btn")
+    ?.classList.contains("active")
+    ? "cash"
+    : "online";
+  return { amount: balance, mode };
+}
+
 // This function will be called when the DOM is fully loaded
 function setupCheckoutConfirmation() {
   const confirmCheckoutBtn = document.getElementById("confirm-checkout-btn");
@@ -568,8 +600,9 @@ function setupCheckoutConfirmation() {
       : "Unknown";
     const balance = rooms[roomNumber].balance;
 
-    // If balance is positive, show warning and don't proceed
-    if (balance > 0) {
+    // A positive balance blocks checkout unless the amount typed in settles
+    // it, in which case payment and checkout go to the server together
+    if (balance > 0 && !getCheckoutSettlement(balance)) {
       showNotification("Please clear the balance before checkout", "error");
       console.log("Checkout blocked - positive balance");
       return;
@@ -660,22 +693,29 @@ function setupCheckoutConfirmation() {
           : null;
 
       try {
-        console.log("Sending checkout request to server");
-        const response = await fetch("/checkout", {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({
+        const operations = [];
+        const settlement = balance > 0 ? getCheckoutSettlement(balance) : null;
+        if (settlement) {
+          operations.push({
+            endpoint: "/checkout",
+            body: {
+              room: roomNumber,
+              payment_mode: settlement.mode,
+              amount: settlement.amount,
+              is_refund: false,
+            },
+          });
+        }
+        operations.push({
+          endpoint: "/checkout",
+          body: {
             room: roomNumber,
             final_checkout: true,
             refund_method: refundMethod,
-          }),
+          },
         });
 
-        if (!response.ok) {
-          throw new Error(`Server responded with status: ${response.status}`);
-        }
-
-        const result = await response.json();
+        const result = await postBatch(operations);
         if (result.success) {
           console.log("Checkout successful");
           // Close both modals
@@ -833,6 +873,131 @@ async function uploadPhoto(file) {
     showNotification(`Error uploading photo: ${error.message}`, "error");
   }
 }
+// Returning guest lookup for the check-in form
+function initGuestLookup() {
+  const nameInput = document.getElementById("guest-name");
+  const mobileInput = document.getElementById("guest-mobile");
+  const suggestions = document.getElementById("guest-suggestions");
+
+  if (!nameInput || !mobileInput || !suggestions) {
+    debugLog("Guest lookup elements not found");
+    return;
+  }
+
+  let lookupTimer = null;
+  let lookupSeq = 0;
+
+  const hideSuggestions = () => {
+    suggestions.innerHTML = "";
+    suggestions.style.display = "none";
+  };
+
+  const lookup = (query) => {
+    clearTimeout(lookupTimer);
+    if (query.trim().length < 2) {
+      hideSuggestions();
+      return;
+    }
+
+    lookupTimer = setTimeout(async () => {
+      const seq = ++lookupSeq;
+      try {
+        const response = await fetch(
+          `/guests/search?q=${encodeURIComponent(query.trim())}&limit=5`
+        );
+        const result = await response.json();
+        // Ignore responses that arrive after a newer keystroke
+        if (seq !== lookupSeq) return;
+        if (result.success && result.guests.length > 0) {
+          showGuestSuggestions(result.guests);
+        } else {
+          hideSuggestions();
+        }
+      } catch (error) {
+        console.error("Error searching guests:", error);
+        hideSuggestions();
+      }
+    }, 200);
+  };
+
+  const showGuestSuggestions = (guests) => {
+    suggestions.innerHTML = guests
+      .map((guest, index) => {
+        const lastStay = guest.stays[0];
+        const stayText = lastStay
+          ? `Room ${lastStay.room} · ${lastStay.date}`
+          : "No previous stays";
+        const balanceText =
+          guest.balance > 0
+            ? `<span class="guest-suggestion-balance">Due ₹${guest.balance}</span>`
+            : "";
+        return `
+          <div class="guest-suggestion" data-index="${index}">
+            <div class="guest-suggestion-name">${guest.name}</div>
+            <div class="guest-suggestion-meta">
+              ${guest.mobile || ""} · ${stayText} ${balanceText}
+            </div>
+          </div>`;
+      })
+      .join("");
+    suggestions.style.display = "block";
+
+    suggestions.querySelectorAll(".guest-suggestion").forEach((el) => {
+      el.addEventListener("mousedown", (e) => {
+        e.preventDefault();
+        prefillGuest(guests[parseInt(el.dataset.index)]);
+        hideSuggestions();
+      });
+    });
+  };
+
+  const prefillGuest = (guest) => {
+    nameInput.value = guest.name;
+    if (guest.mobile) mobileInput.value = guest.mobile;
+
+    const lastStay = guest.stays.find((stay) => stay.price);
+    const priceInput = document.getElementById("room-price");
+    if (lastStay && priceInput && !priceInput.value) {
+      priceInput.value = lastStay.price;
+    }
+    const countInput = document.getElementById("guest-count");
+    if (lastStay && countInput && !countInput.value && lastStay.guests) {
+      countInput.value = lastStay.guests;
+    }
+
+    if (guest.photo) {
+      uploadedPhotoUrl = guest.photo;
+      const photoPreview = document.getElementById("photo-preview");
+      const photoPreviewContainer = document.getElementById(
+        "photo-preview-container"
+      );
+      if (photoPreview && photoPreviewContainer) {
+        photoPreview.src = guest.photo;
+        photoPreviewContainer.style.display = "block";
+      }
+    }
+
+    if (guest.current_room) {
+      showNotification(
+        `${guest.name} is currently checked in to Room ${guest.current_room}`,
+        "warning"
+      );
+    }
+  };
+
+  nameInput.addEventListener("input", () => lookup(nameInput.value));
+  mobileInput.addEventListener("input", () => {
+    const digits = mobileInput.value.replace(/\D/g, "");
+    if (digits.length === 10) {
+      lookup(digits);
+    } else {
+      hideSuggestions();
+    }
+  });
+  nameInput.addEventListener("blur", hideSuggestions);
+  mobileInput.addEventListener("blur", hideSuggestions);
+}
+
 let logs = {
   cash: [],
   online: [],
@@ -1148,60 +1313,13 @@ function renderRooms() {
   }
 }
 
-// Render transaction logs
+// Render the totals and reload the transaction log list (log_list.js)
 function renderLogs() {
   if (!transactionLog) {
     debugLog("Transaction log element not found");
     return;
   }
 
-  // Get today's date and previous dates
-  const today = new Date();
-  const yesterday = new Date(today);
-  yesterday.setDate(yesterday.getDate() - 1);
-  const dayBeforeYesterday = new Date(today);
-  dayBeforeYesterday.setDate(dayBeforeYesterday.getDate() - 2);
-
-  const todayStr = today.toISOString().split("T")[0];
-  const yesterdayStr = yesterday.toISOString().split("T")[0];
-  const dayBeforeYesterdayStr = dayBeforeYesterday.toISOString().split("T")[0];
-
-  // Filter logs for the past 2 days + today
-  const recentDates = [todayStr, yesterdayStr, dayBeforeYesterdayStr];
-
-  // Filter logs for the recent dates with null checks
-  const recentCashLogs = (logs.cash || []).filter((log) =>
-    recentDates.includes(log.date)
-  );
-  const recentOnlineLogs = (logs.online || []).filter((log) =>
-    recentDates.includes(log.date)
-  );
-  const recentRefundLogs = (logs.refunds || []).filter((log) =>
-    recentDates.includes(log.date)
-  );
-
-  // Make sure discounts array exists and is filtered properly
-  const discountLogs = logs.discounts || [];
-  console.log("Discount logs:", discountLogs); // Debug log to see if discounts exist
-
-  const recentDiscountLogs = discountLogs.filter((log) =>
-    recentDates.includes(log.date)
-  );
-
-  console.log("Recent discount logs:", recentDiscountLogs); // Debug to see filtered discounts
-
-  // Combine and sort by date and time (most recent first)
-  const allRecentLogs = [
-    ...recentCashLogs,
-    ...recentOnlineLogs,
-    ...recentRefundLogs,
-    ...recentDiscountLogs,
-  ].sort((a, b) => {
-    const dateA = new Date(`${a.date} ${a.time || "00:00"}`);
-    const dateB = new Date(`${b.date} ${b.time || "00:00"}`);
-    return dateB - dateA;
-  });
-
   // Update totals
   if (cashTotal) cashTotal.textContent = "₹" + totals.cash;
   if (onlineTotal) onlineTotal.textContent = "₹" + totals.online;
@@ -1210,92 +1328,7 @@ function renderLogs() {
     totalRevenue.textContent =
       "₹" + (totals.cash + totals.online - (totals.refunds || 0));
 
-  // Render logs
-  if (allRecentLogs.length === 0) {
-    transactionLog.innerHTML = `<div class="empty-state" style="padding: 2rem;">
-      <i class="fas fa-receipt fa-3x"></i>
-      <p>No transactions in the past 3 days</p>
-    </div>`;
-    return;
-  }
-
-  // Group logs by date
-  const logsByDate = {};
-  allRecentLogs.forEach((log) => {
-    if (!logsByDate[log.date]) {
-      logsByDate[log.date] = [];
-    }
-    logsByDate[log.date].push(log);
-  });
-
-  let logsHTML = "";
-
-  // Format date for display
-  function formatDate(dateStr) {
-    const date = new Date(dateStr);
-    const options = { weekday: "long", month: "short", day: "numeric" };
-    return date.toLocaleDateString("en-US", options);
-  }
-
-  // Add section for each date
-  Object.keys(logsByDate)
-    .sort((a, b) => new Date(b) - new Date(a)) // Sort dates in descending order
-    .forEach((date) => {
-      // Add date header
-      let dateDisplay = formatDate(date);
-
-      // Mark today, yesterday
-      if (date === todayStr) {
-        dateDisplay = "Today (" + dateDisplay + ")";
-      } else if (date === yesterdayStr) {
-        dateDisplay = "Yesterday (" + dateDisplay + ")";
-      }
-
-      logsHTML += `<div class="log-date-header">${dateDisplay}</div>`;
-
-      // Add logs for this date
-      logsByDate[date].forEach((log) => {
-        let type = "Unknown";
-        let color = "";
-        let additionalInfo = "";
-
-        // Determine log type and styling
-        if (recentCashLogs.includes(log)) {
-          type = "Cash Payment";
-        } else if (recentOnlineLogs.includes(log)) {
-          type = "Online Payment";
-        } else if (recentRefundLogs.includes(log)) {
-          type = "Refund";
-          color = 'style="color: var(--danger)"';
-        } else if (recentDiscountLogs.includes(log)) {
-          // Special handling for discount logs
-          type = "Discount";
-          color = 'style="color: var(--success)"';
-          additionalInfo = log.reason ? ` (${log.reason})` : "";
-        }
-
-        // Add room shift indicator if applicable
-        const shiftInfo = log.room_shifted
-          ? `<span class="room-shifted-badge">Shifted: ${log.old_room} → ${log.room}</span>`
-          : "";
-
-        logsHTML += `
-          <div class="log-item">
-            <div class="log-details">
-              <div class="log-title">Room ${log.room} - ${
-          log.name
-        }${shiftInfo}</div>
-              <div class="log-subtitle">${type}${additionalInfo} at ${
-          log.time || "N/A"
-        }</div>
-            </div>
-            <div class="log-amount" ${color}>₹${log.amount}</div>
-          </div>
-        `;
-      });
-    });
-
-  transactionLog.innerHTML = logsHTML;
+  refreshLogList();
 }
 
 // Fetch data from the server
@@ -1313,39 +1346,7 @@ async function fetchData() {
     rooms = data.rooms;
     logs = data.logs;
     totals = data.totals;
-
-    // Process rooms to ensure they have renewal data
-    Object.entries(rooms).forEach(([roomNumber, roomInfo]) => {
-      if (roomInfo.status === "occupied") {
-        // Ensure renewal count exists
-        if (roomInfo.renewal_count === undefined) {
-          roomInfo.renewal_count = 0;
-        }
-
-        // Make sure last_renewal_time is defined if it should be
-        if (roomInfo.renewal_count > 0 && !roomInfo.last_renewal_time) {
-          // Estimate a last renewal time if missing
-          const checkinDate = new Date(roomInfo.checkin_time);
-          const estimatedLastRenewal = new Date(
-            checkinDate.getTime() + roomInfo.renewal_count * 24 * 60 * 60 * 1000
-          );
-          roomInfo.last_renewal_time = formatDateTime(estimatedLastRenewal);
-        }
-      }
-    });
-
-    // Make sure all log types exist
-    const requiredLogTypes = [
-      "cash",
-      "online",
-      "balance",
-      "add_ons",
-      "refunds",
-      "renewals",
-    ];
-    requiredLogTypes.forEach((type) => {
-      if (!logs[type]) logs[type] = [];
-    });
+    prepareRoomsAndLogs();
 
     renderRooms();
     renderLogs();
@@ -1359,6 +1360,76 @@ async function fetchData() {
   }
 }
 
+// State embedded in the page by the server, for the first paint
+let initialState = null;
+
+function readInitialState() {
+  const element = document.getElementById("initial-state");
+  if (!element || !element.textContent.trim()) return null;
+  try {
+    const state = JSON.parse(element.textContent);
+    // A page kept by the service worker may belong to another property
+    const cookie = document.cookie.match(/(?:^|;\s*)lodge_property=([^;]*)/);
+    if (cookie && decodeURIComponent(cookie[1]) !== state.property) return null;
+    return state;
+  } catch (error) {
+    console.warn("Embedded state unreadable:", error);
+    return null;
+  }
+}
+
+// Render rooms, today's logs and the stats without waiting for /get_data
+function applyInitialState() {
+  initialState = readInitialState();
+  if (!initialState) return false;
+
+  rooms = initialState.rooms;
+  totals = initialState.totals;
+  logs = initialState.logs;
+  prepareRoomsAndLogs();
+
+  renderRooms();
+  renderLogs();
+  updateStats();
+  debugLog(`Painted from embedded state version ${initialState.version}`);
+  return true;
+}
+
+function prepareRoomsAndLogs() {
+  // Process rooms to ensure they have renewal data
+  Object.entries(rooms).forEach(([roomNumber, roomInfo]) => {
+    if (roomInfo.status === "occupied") {
+      // Ensure renewal count exists
+      if (roomInfo.renewal_count === undefined) {
+        roomInfo.renewal_count = 0;
+      }
+
+      // Make sure last_renewal_time is defined if it should be
+      if (roomInfo.renewal_count > 0 && !roomInfo.last_renewal_time) {
+        // Estimate a last renewal time if missing
+        const checkinDate = new Date(roomInfo.checkin_time);
+        const estimatedLastRenewal = new Date(
+          checkinDate.getTime() + roomInfo.renewal_count * 24 * 60 * 60 * 1000
+        );
+        roomInfo.last_renewal_time = formatDateTime(estimatedLastRenewal);
+      }
+    }
+  });
+
+  // Make sure all log types exist
+  const requiredLogTypes = [
+    "cash",
+    "online",
+    "balance",
+    "add_ons",
+    "refunds",
+    "renewals",
+  ];
+  requiredLogTypes.forEach((type) => {
+    if (!logs[type]) logs[type] = [];
+  });
+}
+
 function updateStats() {
   let vacant = 0;
   let occupied = 0;
@@ -0,0 +1,74 @@
+// Service worker: keeps the app shell available when the lodge Wi-Fi drops.
+// Data is not cached here; offline.js mirrors /get_data in IndexedDB. The state
+// embedded in a cached "/" only paints the first frame until /get_data answers.
+const SHELL_CACHE = "lodge-shell-v1";
+const SHELL_URLS = [
+  "/",
+  "/static/style.css",
+  "/static/booking.css",
+  "/static/offline.js",
+  "/static/script.js",
+  "/static/shift.js",
+  "/static/analytics.js",
+  "/static/expense.js",
+  "/static/booking.js",
+  "/static/log_list.js",
+];
+const CDN_HOSTS = ["cdn.jsdelivr.net", "cdnjs.cloudflare.com"];
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches
+      .open(SHELL_CACHE)
+      .then((cache) => cache.addAll(SHELL_URLS))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches
+      .keys()
+      .then((keys) =>
+        Promise.all(keys.filter((key) => key !== SHELL_CACHE).map((key) => caches.delete(key)))
+      )
+      .then(() => self.clients.claim())
+  );
+});
+
+function isShellRequest(request, url) {
+  if (url.origin === self.location.origin) {
+    // Other navigations (such as /export downloads) go straight to the network
+    if (request.mode === "navigate") return url.pathname === "/";
+    return url.pathname.startsWith("/static/") || url.pathname.startsWith("/uploads/");
+  }
+  return CDN_HOSTS.includes(url.hostname);
+}
+
+// Stale-while-revalidate: answer from the cache at once and refresh it in the background
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  if (request.method !== "GET") return;
+  const url = new URL(request.url);
+  if (!isShellRequest(request, url)) return;
+
+  const cacheKey = request.mode === "navigate" ? "/" : request;
+  event.respondWith(
+    caches.open(SHELL_CACHE).then(async (cache) => {
+      const cached = await cache.match(cacheKey);
+      const network = fetch(request)
+        .then((response) => {
+          if (response.ok || response.type === "opaque") {
+            cache.put(cacheKey, response.clone());
+          }
+          return response;
+        })
+        .catch(() => cached);
+      if (cached) {
+        event.waitUntil(network);
+        return cached;
+      }
+      return network;
+    })
+  );
+});
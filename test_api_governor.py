@@ -0,0 +1,141 @@
+import pytest
+
+from api_governor import ApiGovernor, CircuitBreaker, QuotaExhausted, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Response", (), {"status": status})()
+
+
+def opened_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60, clock=clock)
+    breaker.record_failure()
+    assert breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_the_threshold_and_rejects_until_the_cool_down():
+    clock = Clock()
+    breaker = opened_breaker(clock)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock.now = 59
+    assert not breaker.allow()
+
+
+def test_half_open_admits_a_single_probe():
+    clock = Clock()
+    breaker = opened_breaker(clock)
+    clock.now = 60
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+
+def test_a_successful_probe_closes_the_circuit():
+    clock = Clock()
+    breaker = opened_breaker(clock)
+    clock.now = 60
+    assert breaker.allow()
+    assert breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_a_failed_probe_reopens_and_a_new_probe_follows_the_next_cool_down():
+    clock = Clock()
+    breaker = opened_breaker(clock)
+    clock.now = 60
+    assert breaker.allow()
+    assert breaker.record_failure()
+    assert not breaker.allow()
+    clock.now = 120
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_a_probe_that_never_reports_is_replaced_after_a_cool_down():
+    clock = Clock()
+    breaker = opened_breaker(clock)
+    clock.now = 60
+    assert breaker.allow()
+    clock.now = 119
+    assert not breaker.allow()
+    clock.now = 120
+    assert breaker.allow()
+
+
+def test_a_refused_request_still_ends_the_probe():
+    clock = Clock()
+    governor = ApiGovernor({}, opened_breaker(clock), sleep=lambda seconds: None)
+    clock.now = 60
+
+    def refused():
+        raise HttpError(400)
+
+    with pytest.raises(HttpError):
+        governor.call("sheets.values.get", refused)
+    assert governor.breaker.state == CircuitBreaker.CLOSED
+    assert governor.call("sheets.values.get", lambda: "ok") == "ok"
+
+
+def governor_on(clock, buckets=None):
+    """A governor whose sleeps move the clock forward"""
+    def sleep(seconds):
+        clock.now += seconds
+    return ApiGovernor(buckets or {}, CircuitBreaker(clock=clock), max_retries=20, sleep=sleep, clock=clock)
+
+
+def test_a_shorter_budget_stops_retrying_sooner():
+    clock = Clock()
+    governor = governor_on(clock)
+
+    def unavailable():
+        raise HttpError(503)
+
+    with pytest.raises(HttpError):
+        governor.call("sheets.values.batchUpdate", unavailable, max_elapsed=2)
+    assert clock.now <= 2
+
+
+def test_a_shorter_budget_caps_the_quota_wait():
+    clock = Clock()
+    bucket = TokenBucket(rate=0.5, capacity=1, clock=clock)
+    governor = governor_on(clock, {"sheets.write": bucket})
+    assert governor.call("sheets.values.batchUpdate", lambda: "ok") == "ok"
+
+    # The next token is two seconds away: too long for a one-second budget, fine for the default
+    with pytest.raises(QuotaExhausted):
+        governor.call("sheets.values.batchUpdate", lambda: "ok", max_elapsed=1)
+    assert governor.call("sheets.values.batchUpdate", lambda: "ok") == "ok"
+
+
+def test_saves_under_the_state_lock_use_the_short_budget(lodge, client, monkeypatch):
+    budgets = []
+    call = lodge.google_governor.call
+
+    def recording_call(operation, func, max_elapsed=None):
+        budgets.append((operation, max_elapsed))
+        return call(operation, func, max_elapsed)
+
+    monkeypatch.setattr(lodge.google_governor, "call", recording_call)
+    client.post("/add_expense", json={"date": "2099-01-05", "category": "Supplies", "description": "Soap",
+                                      "amount": 80})
+    assert budgets == [("sheets.values.batchUpdate", lodge.LOCKED_SAVE_SECONDS),
+                       ("sheets.values.batchClear", lodge.LOCKED_SAVE_SECONDS)]
+
+    # Outside the lock, as at startup, a save keeps the governor's own budget
+    budgets.clear()
+    lodge.save_data(lodge.full_state())
+    assert [budget for _, budget in budgets] == [None, None]
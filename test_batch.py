@@ -0,0 +1,41 @@
+import copy
+
+
+def observable_state(lodge):
+    """Everything a rolled-back batch must leave as it found it"""
+    return {
+        "rooms": copy.deepcopy(dict(lodge.rooms)),
+        "totals": dict(lodge.totals),
+        "logs": copy.deepcopy(dict(lodge.logs)),
+        "version": lodge._sync_status["version"],
+        "log_keys": list(lodge.log_index.keys(lodge.logs)),
+        "search": lodge.search_index.search("meera"),
+        "guests": lodge.guest_directory.search("meera", lodge.rooms, lodge.bookings),
+        "expenses": lodge.expense_ledger.summary("2099-01"),
+        "shift": lodge.shift_ledger.current(),
+        "in_house": lodge.occupancy_grid.in_house_rooms()
+    }
+
+
+def test_a_failed_operation_rolls_the_whole_batch_back(lodge, client, sheets):
+    backend = sheets[0]
+    room = next(iter(lodge.rooms))
+    before = observable_state(lodge)
+    backend.reset_counts()
+
+    response = client.post("/batch", json={"operations": [
+        {"endpoint": "/checkin", "body": {"room": room, "name": "Meera Shah", "mobile": "9000000001",
+                                          "price": 1200, "amountPaid": 1200, "payment": "cash", "guests": 1}},
+        {"endpoint": "/add_expense", "body": {"date": "2099-01-05", "category": "Supplies",
+                                              "description": "Soap", "amount": 80}},
+        {"endpoint": "/apply_discount", "body": {"room": "no-such-room", "amount": 100}},
+        {"endpoint": "/add_expense", "body": {"date": "2099-01-06", "category": "Supplies",
+                                              "description": "Towels", "amount": 300}}
+    ]})
+
+    result = response.get_json()
+    assert result["success"] is False and result["failed_index"] == 2
+    assert [(r["success"], r["rolled_back"]) for r in result["results"][:2]] == [(True, True), (True, True)]
+    assert result["results"][3]["skipped"] is True
+    assert observable_state(lodge) == before
+    assert backend.total_calls() == 0
@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+from bulk_import import (DuplicateIndex, ImportRowError, ImportSummary, chunked, iter_records,
+                         normalize_transaction, parse_amount, parse_date, validate_chunk)
+
+
+@pytest.mark.parametrize("log_type", ["cash", "refunds", "booking_payments", "add_ons"])
+def test_room_is_required_with_or_without_a_payment_method(log_type):
+    row = {"amount": "100", "date": "2026-10-19", "name": "Guest", "payment_method": "online"}
+    with pytest.raises(ImportRowError, match="room is required"):
+        normalize_transaction(row, log_type)
+
+
+def test_refund_keeps_its_payment_mode():
+    row = {"room": "5", "amount": "100", "date": "2026-10-19", "name": "Guest", "payment_method": "online"}
+    assert normalize_transaction(row, "refunds")["payment_mode"] == "online"
+
+
+@pytest.mark.parametrize("log_type", ["balance", "expenses"])
+def test_balance_and_expenses_need_no_room(log_type):
+    row = {"amount": "100", "date": "2026-10-19", "name": "Guest", "description": "Diesel"}
+    assert normalize_transaction(row, log_type)["room"] == ""
+
+
+def test_dates_and_amounts_are_normalized():
+    assert parse_date("19/10/2026", "date") == "2026-10-19"
+    assert parse_amount("₹1,250.4", "amount") == 1250
+    with pytest.raises(ImportRowError):
+        parse_amount("-5", "amount")
+    with pytest.raises(ImportRowError):
+        parse_date("someday", "date")
+
+
+def test_chunk_validation_counts_duplicates_and_rejects():
+    csv_text = ("type,room,name,amount,date,time\n"
+                "cash,5,Guest,100,2026-10-19,10:00\n"
+                "cash,5,Guest,100,2026-10-19,10:00\n"
+                "cash,,Guest,100,2026-10-19,10:00\n"
+                "wire,5,Guest,100,2026-10-19,10:00\n")
+    summary = ImportSummary()
+    duplicates = DuplicateIndex({}, {})
+    [chunk] = list(chunked(iter_records(io.BytesIO(csv_text.encode()), "csv")))
+    bookings, transactions = validate_chunk(chunk, duplicates, {"5": {}}, summary)
+    assert bookings == []
+    assert [log_type for log_type, _ in transactions] == ["cash"]
+    assert summary.duplicates == 1
+    assert summary.invalid == 2
@@ -0,0 +1,17 @@
+def test_budgets_stay_out_of_the_totals_sent_to_clients(lodge, client):
+    assert client.post("/expenses/budget", json={"category": "laundry", "amount": 5000}).get_json()["success"]
+
+    assert not any(key.startswith("budget:") for key in client.get("/get_data").get_json()["totals"])
+    assert not any(key.startswith("budget:") for key in lodge.initial_state("2024-01-01")["totals"])
+    laundry = next(item for item in client.get("/expenses/summary").get_json()["categories"]
+                   if item["category"] == "laundry")
+    assert laundry["budget"] == 5000
+
+
+def test_budgets_survive_saves_that_only_pass_the_totals(lodge, client):
+    client.post("/expenses/budget", json={"category": "laundry", "amount": 5000})
+    lodge.save_data({"rooms": lodge.rooms, "logs": lodge.logs, "totals": lodge.totals, "bookings": lodge.bookings})
+
+    loaded = lodge.load_from_sheets()
+    assert loaded["budgets"] == {"laundry": 5000}
+    assert not any(key.startswith("budget:") for key in loaded["totals"])
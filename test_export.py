@@ -0,0 +1,50 @@
+import csv
+import io
+
+from export import EXPORT_LOG_TYPES, iter_csv, iter_export_rows
+
+LOGS = {
+    "cash": [{"room": "5", "name": "Guest", "amount": 500, "date": "2026-10-19", "time": "10:00",
+              "booking_id": "b1", "type": "booking_advance"}],
+    "booking_payments": [{"room": "5", "name": "Guest", "amount": 500, "date": "2026-10-19", "time": "10:00",
+                          "booking_id": "b1", "payment_method": "cash"}],
+    "expenses": [{"description": "Plumber", "category": "repairs", "amount": 40, "date": "2026-10-18",
+                  "time": "09:00", "payment_method": "cash"}],
+    "online": [{"room": "6", "name": "Other", "amount": 70, "date": "2026-09-30", "time": "12:00"}]
+}
+
+
+def test_booking_payments_are_not_exported_twice_by_default():
+    rows = list(iter_export_rows(LOGS, "2026-10-01", "2026-10-31"))
+    assert "booking_payments" not in EXPORT_LOG_TYPES
+    assert sum(row[5] for row in rows) == 540
+
+
+def test_booking_payments_can_be_asked_for():
+    rows = list(iter_export_rows(LOGS, "2026-10-01", "2026-10-31", ["booking_payments"]))
+    assert [(row[0], row[6], row[9]) for row in rows] == [("booking_payments", "cash", "b1")]
+
+
+def test_csv_has_a_header_and_one_line_per_row():
+    body = b"".join(chunk if isinstance(chunk, bytes) else chunk.encode()
+                    for chunk in iter_csv(iter_export_rows(LOGS, "2026-01-01", "2026-12-31")))
+    lines = list(csv.reader(io.StringIO(body.decode("utf-8-sig"))))
+    assert lines[0][0] == "type"
+    assert len(lines) == 4
+
+
+def test_export_route_rejects_unknown_types(client):
+    response = client.get("/export?start_date=2026-10-01&end_date=2026-10-31&types=bogus")
+    assert response.status_code == 400
+    response = client.get("/export?start_date=2026-10-01&end_date=2026-10-31&types=booking_payments")
+    assert response.status_code == 200
+
+
+def test_export_streams_the_entries_logged_before_it_started(lodge, client):
+    lodge.append_log("cash", {"room": "1", "name": "Before", "amount": 100, "date": "2026-10-05", "time": "10:00"})
+    response = client.get("/export?start_date=2026-10-01&end_date=2026-10-31", buffered=False)
+    # Logged once the view has returned, while the body is still to be sent
+    lodge.append_log("cash", {"room": "1", "name": "After", "amount": 200, "date": "2026-10-06", "time": "10:00"})
+    body = response.get_data(as_text=True)
+    response.close()
+    assert "Before" in body and "After" not in body
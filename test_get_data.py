@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+
+
+def _day(days_ago):
+    return (date.today() - timedelta(days=days_ago)).isoformat()
+
+
+def test_get_data_sends_recent_logs_and_the_stays_in_house(lodge, client):
+    data = lodge.default_data()
+    room = next(iter(data["rooms"]))
+    data["rooms"][room].update(status="occupied", guest={"name": "Asha"}, checkin_time=f"{_day(10)} 12:00")
+    data["logs"]["cash"] = [
+        {"room": "999", "name": "Old", "amount": 100, "date": _day(30), "time": "10:00"},
+        {"room": room, "name": "Asha", "amount": 500, "date": _day(10), "time": "12:00"},
+        {"room": "999", "name": "New", "amount": 200, "date": _day(0), "time": "09:00"},
+    ]
+    lodge.replace_state(data)
+
+    body = client.get("/get_data").get_json()
+    assert [entry["name"] for entry in body["logs"]["cash"]] == ["Asha", "New"]
+    assert set(body["logs"]) == set(lodge.LOG_TYPES)
+    # Older entries are still there to page through
+    page = client.get("/logs?type=cash&limit=10").get_json()
+    assert len(page["entries"]) == 3
+
+
+def test_closed_days_are_encoded_once_and_redone_when_they_grow():
+    import fast_json
+    from log_index import LogIndex
+
+    today, yesterday = _day(0), _day(1)
+    logs = {"cash": [{"room": "1", "amount": 100, "date": yesterday, "time": "10:00"},
+                     {"room": "1", "amount": 200, "date": today, "time": "10:00"}],
+            "refunds": []}
+    index, fragments = LogIndex(), fast_json.LogFragments()
+
+    def encode():
+        return fast_json.loads(fragments.encode(logs, index.keys(logs, start_date=yesterday), yesterday, today))
+
+    assert encode() == {"cash": logs["cash"], "refunds": []}
+    # A closed day is kept as encoded...
+    logs["cash"][0]["amount"] = 150
+    assert encode()["cash"][0]["amount"] == 100
+    # ...until an entry is added to it
+    logs["cash"].append({"room": "2", "amount": 300, "date": yesterday, "time": "11:00"})
+    assert [entry["amount"] for entry in encode()["cash"]] == [150, 300, 200]
+    # or the cache is cleared after entries were rewritten in place
+    logs["cash"][0]["amount"] = 175
+    fragments.clear()
+    assert [entry["amount"] for entry in encode()["cash"]] == [175, 300, 200]
+
+
+def test_get_data_matches_the_recent_logs(lodge, client):
+    data = lodge.default_data()
+    data["logs"]["cash"] = [{"room": "1", "name": "A", "amount": amount, "date": _day(days_ago), "time": "09:00"}
+                            for amount, days_ago in ((100, 5), (200, 2), (300, 1), (400, 0))]
+    lodge.replace_state(data)
+    today = date.today()
+    assert client.get("/get_data").get_json()["logs"] == lodge.recent_logs(today)
+    assert [entry["amount"] for entry in lodge.recent_logs(today)["cash"]] == [200, 300, 400]
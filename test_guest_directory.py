@@ -0,0 +1,42 @@
+from guest_directory import GuestDirectory
+
+
+def booking(mobile, name="Ravi Kumar"):
+    return {"guest_name": name, "guest_mobile": mobile, "room": "101", "check_in_date": "2024-03-01",
+            "check_out_date": "2024-03-03", "status": "confirmed", "total_amount": 3000}
+
+
+def test_a_corrected_mobile_number_no_longer_finds_the_guest():
+    directory = GuestDirectory()
+    directory.add_booking("B1", booking("98765 43210"))
+    directory.add_booking("B1", booking("91234 56789"))
+
+    assert directory.search("9876543210", {}, {}) == []
+    [guest] = directory.search("9123456789", {}, {})
+    assert [stay["booking_id"] for stay in guest["stays"]] == ["B1"]
+    assert [guest["mobile"] for guest in directory.search("ravi", {}, {})] == ["9123456789"]
+
+
+def test_a_guest_keeps_other_stays_when_one_moves_away():
+    directory = GuestDirectory()
+    directory.add_booking("B1", booking("9876543210"))
+    directory.add_booking("B2", booking("9876543210"))
+    directory.add_booking("B2", booking("9123456789"))
+
+    [guest] = directory.search("9876543210", {}, {})
+    assert [stay["booking_id"] for stay in guest["stays"]] == ["B1"]
+
+
+def test_live_payments_reach_the_directory(lodge, client):
+    room = next(iter(lodge.rooms))
+    client.post("/checkin", json={"room": room, "name": "Meera Shah", "mobile": "9000000001", "price": 1200,
+                                  "amountPaid": 0, "payment": "balance", "guests": 1})
+    client.post("/checkout", json={"room": room, "payment_mode": "online", "amount": 1200})
+    # A payment in a room the guest has no stay in becomes a stay of its own
+    lodge.append_log("cash", {"room": "999", "name": "Meera Shah", "amount": 300,
+                              "date": "2099-01-01", "time": "10:00"})
+
+    [guest] = lodge.guest_directory.search("meera", lodge.rooms, lodge.bookings)
+    assert guest["last_seen"] == "2099-01-01"
+    assert {(stay["source"], stay["room"]) for stay in guest["stays"]} == {("room", room), ("log", "999")}
+    assert next(stay for stay in guest["stays"] if stay["source"] == "log")["paid"] == 300
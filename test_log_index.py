@@ -0,0 +1,81 @@
+import pytest
+
+from log_index import LogIndex, decode_cursor, encode_cursor
+
+
+def sample_logs():
+    # Several entries share a moment, so pages must split ties by type and position
+    return {
+        "cash": [{"room": "101", "name": "A", "amount": 100, "date": "2024-03-01", "time": "10:00"},
+                 {"room": "102", "name": "B", "amount": 200, "date": "2024-03-02", "time": "10:00"},
+                 {"room": "101", "name": "A", "amount": 300, "date": "2024-03-02", "time": "10:00"}],
+        "online": [{"room": "101", "name": "A", "amount": 400, "date": "2024-03-02", "time": "10:00"},
+                   {"room": "103", "name": "C", "amount": 500, "date": "2024-03-03", "time": "09:00"}],
+        "refunds": [{"room": "102", "name": "B", "amount": 50, "date": "2024-03-03", "time": "09:00",
+                     "payment_mode": "online"}],
+        "expenses": [{"category": "food", "amount": 70, "date": "2024-03-02", "time": "18:00",
+                      "payment_method": "cash"}],
+    }
+
+
+def walk(index, logs, limit, **filters):
+    """Every entry, page by page, as (log_type, amount)"""
+    seen, cursor = [], None
+    while True:
+        entries, cursor = index.page(logs, cursor=cursor, limit=limit, **filters)
+        assert len(entries) <= limit
+        seen.extend((entry["log_type"], entry["amount"]) for entry in entries)
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_cover_every_entry_once_in_order(limit, descending):
+    logs = sample_logs()
+    full, cursor = LogIndex().page(logs, descending=descending, limit=100)
+    assert cursor is None and len(full) == 7
+    moments = [(entry["date"], entry["time"]) for entry in full]
+    assert moments == sorted(moments, reverse=descending)
+    expected = [(entry["log_type"], entry["amount"]) for entry in full]
+    assert walk(LogIndex(), logs, limit, descending=descending) == expected
+
+
+def test_the_last_full_page_has_no_cursor():
+    entries, cursor = LogIndex().page(sample_logs(), limit=7)
+    assert len(entries) == 7 and cursor is None
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_date_bounds_are_inclusive_and_hold_across_pages(descending):
+    seen = walk(LogIndex(), sample_logs(), 1, start_date="2024-03-02", end_date="2024-03-02", descending=descending)
+    assert sorted(amount for _, amount in seen) == [70, 200, 300, 400]
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_filters_hold_across_pages(descending):
+    logs, index = sample_logs(), LogIndex()
+    by_room = walk(index, logs, 1, room="101", descending=descending)
+    assert sorted(by_room) == [("cash", 100), ("cash", 300), ("online", 400)]
+    by_mode = walk(index, logs, 1, mode="online", descending=descending)
+    assert sorted(by_mode) == [("online", 400), ("online", 500), ("refunds", 50)]
+    by_types = walk(index, logs, 1, log_types=("cash", "expenses"), descending=descending)
+    assert sorted(by_types) == [("cash", 100), ("cash", 200), ("cash", 300), ("expenses", 70)]
+
+
+def test_appends_are_picked_up_and_removals_rebuild_the_index():
+    logs, index = sample_logs(), LogIndex()
+    index.page(logs)
+    logs["cash"].append({"room": "104", "name": "D", "amount": 900, "date": "2024-03-04", "time": "08:00"})
+    assert index.page(logs, limit=1)[0][0]["amount"] == 900
+
+    del logs["cash"][1:]
+    assert [entry["amount"] for entry in index.page(logs, log_types=("cash",))[0]] == [100]
+
+
+def test_cursors_round_trip_and_foreign_ones_are_refused():
+    key = ("2024-03-02 10:00", "cash", 2)
+    assert decode_cursor(encode_cursor(key)) == key
+    for cursor in ("not a cursor", encode_cursor(("2024-03-02", "cash")), encode_cursor((1, "cash", 2))):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
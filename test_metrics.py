@@ -0,0 +1,21 @@
+import metrics
+
+
+def sizes(route):
+    series = metrics.http_response_size._series.get((route,))
+    return (series[2], series[1]) if series else (0, 0.0)
+
+
+def test_streamed_response_sizes_are_recorded_once_sent(client):
+    count, total = sizes("/export")
+    response = client.get("/export?start_date=2024-01-01&end_date=2024-01-31&format=csv")
+    body = response.get_data()
+    response.close()
+    assert body
+    assert sizes("/export") == (count + 1, total + len(body))
+
+
+def test_sized_responses_are_recorded_up_front(client):
+    count, total = sizes("/get_data")
+    body = client.get("/get_data").get_data()
+    assert sizes("/get_data") == (count + 1, total + len(body))
@@ -0,0 +1,48 @@
+from search_index import SearchIndex, tokenize
+
+
+def index_of(bookings=None, expenses=(), checkins=()):
+    index = SearchIndex()
+    index.rebuild(bookings or {}, {"expenses": list(expenses), "checkins": list(checkins)})
+    return index
+
+
+def test_only_function_words_are_dropped():
+    assert tokenize("The guest booking for last week") == ["guest", "booking", "last", "week"]
+
+
+def test_a_rarer_word_outranks_a_common_one():
+    index = index_of(expenses=[{"description": "plumber visit", "category": "repairs"},
+                               {"description": "plumber tools", "category": "repairs"},
+                               {"description": "electrician visit", "category": "repairs"}])
+    # "electrician" is in one document, "plumber" in two
+    assert [reference for _, reference, _, _ in index.search("electrician plumber")] == [2, 0, 1]
+
+
+def test_documents_matching_more_words_rank_first():
+    index = index_of(bookings={"B1": {"guest_name": "Anil", "notes": "late arrival late late"},
+                               "B2": {"guest_name": "Sunil", "notes": "late arrival wheelchair"}})
+    assert [reference for _, reference, _, _ in index.search("late wheelchair")] == ["B2", "B1"]
+
+
+def test_shorter_fields_score_higher_for_the_same_word():
+    index = index_of(expenses=[{"description": "diesel for the generator and the water pump motor repair"},
+                               {"description": "diesel"}])
+    [(_, first, first_score, _), (_, second, second_score, _)] = index.search("diesel")
+    assert (first, second) == (1, 0) and first_score > second_score
+
+
+def test_prefixes_match_at_a_discount_and_report_the_indexed_word():
+    index = index_of(checkins=[{"name": "Priyanka"}, {"name": "Priya"}])
+    results = index.search("priya")
+    assert [(reference, matched) for _, reference, _, matched in results] == [(1, ["priya"]), (0, ["priyanka"])]
+
+
+def test_kinds_and_edited_bookings():
+    index = index_of(bookings={"B1": {"guest_name": "Kiran", "notes": "monthly guest"}},
+                     expenses=[{"description": "monthly internet bill"}])
+    assert [kind for kind, *_ in index.search("monthly", kinds=("expense",))] == ["expense"]
+
+    index.update_booking("B1", {"guest_name": "Kiran", "notes": "weekend guest"})
+    assert [kind for kind, *_ in index.search("monthly")] == ["expense"]
+    assert [reference for _, reference, _, _ in index.search("guest weekend")] == ["B1"]
@@ -0,0 +1,132 @@
+import json
+import threading
+
+import pytest
+
+from shards import PropertyConfig, ShardRegistry, UnknownProperty, load_property_configs
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def configs(*property_ids):
+    return {property_id: PropertyConfig(property_id, f"sheet-{property_id}", None, f"{property_id}.bin", ["101"])
+            for property_id in property_ids}
+
+
+def registry(clock, can_evict=lambda shard: True, evicted=None, **kwargs):
+    loads = []
+
+    def loader(config):
+        loads.append(config.property_id)
+        return {"property": config.property_id}
+
+    shards = ShardRegistry(configs("main", "annex"), loader, can_evict,
+                           on_evict=evicted.append if evicted is not None else None,
+                           idle_seconds=60, clock=clock, **kwargs)
+    return shards, loads
+
+
+def test_a_property_is_loaded_once_on_first_use():
+    shards, loads = registry(Clock())
+    assert shards.get("annex") is shards.get("annex")
+    assert loads == ["annex"]
+    assert set(shards.loaded()) == {"annex"}
+    with pytest.raises(UnknownProperty):
+        shards.get("elsewhere")
+
+
+def test_concurrent_first_uses_share_one_load():
+    release = threading.Event()
+    loads = []
+
+    def loader(config):
+        loads.append(config.property_id)
+        release.wait(5)
+        return object()
+
+    shards = ShardRegistry(configs("main"), loader, lambda shard: True)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(shards.get("main"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert loads == ["main"] and len({id(shard) for shard in results}) == 1
+
+
+def test_idle_shards_are_evicted_unless_pinned_or_busy():
+    clock, evicted = Clock(), []
+    busy = set()
+    shards, loads = registry(clock, can_evict=lambda shard: shard["property"] not in busy, evicted=evicted,
+                             pinned=["main"])
+    shards.get("main")
+    shards.get("annex")
+    clock.now += 59
+    assert shards.evict_idle() == []
+
+    clock.now += 2
+    busy.add("annex")
+    assert shards.evict_idle() == []
+    busy.clear()
+    assert shards.evict_idle() == ["annex"]
+    assert evicted == [{"property": "annex"}] and set(shards.loaded()) == {"main"}
+
+    # Used again, it is loaded afresh
+    shards.get("annex")
+    assert loads == ["main", "annex", "annex"]
+
+
+def test_use_keeps_a_shard_loaded():
+    clock = Clock()
+    shards, _ = registry(clock)
+    shards.get("annex")
+    clock.now += 50
+    shards.get("annex")
+    clock.now += 50
+    assert shards.evict_idle() == []
+
+
+def write_properties(tmp_path, entries):
+    path = tmp_path / "properties.json"
+    path.write_text(json.dumps(entries))
+    return str(path)
+
+
+DEFAULT = PropertyConfig("default", "main-sheet", "main-folder", "data_snapshot.bin", ["101", "102"])
+
+
+def test_only_the_default_property_fills_in_from_the_deployment(tmp_path):
+    path = write_properties(tmp_path, {
+        "hill": {"name": "Hill View", "rooms": [1, 2]},
+        "lake": {"spreadsheet_id": "lake-sheet", "drive_folder_id": "lake-folder"}})
+
+    loaded = load_property_configs(path, DEFAULT)
+    assert list(loaded) == ["hill", "lake"]
+    hill, lake = loaded["hill"], loaded["lake"]
+    assert (hill.name, hill.rooms, hill.spreadsheet_id, hill.drive_folder_id) == (
+        "Hill View", ["1", "2"], "main-sheet", "main-folder")
+    assert (lake.spreadsheet_id, lake.drive_folder_id, lake.rooms) == ("lake-sheet", "lake-folder", ["101", "102"])
+    assert lake.snapshot_path == "data_snapshot.lake.bin"
+
+
+@pytest.mark.parametrize("lake, problem", [
+    ({"spreadsheet_id": "lake-sheet"}, "must set its own drive_folder_id"),
+    ({}, "must set its own spreadsheet_id and drive_folder_id"),
+    ({"spreadsheet_id": "main-sheet", "drive_folder_id": "lake-folder"}, "share the spreadsheet_id main-sheet"),
+])
+def test_other_properties_must_have_their_own_sheet_and_folder(tmp_path, lake, problem):
+    path = write_properties(tmp_path, {"hill": {}, "lake": lake})
+    with pytest.raises(ValueError, match=problem):
+        load_property_configs(path, DEFAULT)
+
+
+def test_a_properties_file_must_name_some_properties(tmp_path):
+    with pytest.raises(ValueError):
+        load_property_configs(write_properties(tmp_path, []), DEFAULT)
@@ -0,0 +1,80 @@
+from shift_ledger import ShiftLedger, from_log_entry, to_log_entry
+
+
+def _entry(amount, date="2026-10-19", time="10:00", **fields):
+    return dict(fields, room="5", name="Guest", amount=amount, date=date, time=time)
+
+
+def test_counters_split_money_by_mode():
+    ledger = ShiftLedger()
+    ledger.rebuild({
+        "cash": [_entry(1000)],
+        "online": [_entry(500)],
+        "refunds": [_entry(200, payment_mode="online"), _entry(50)],
+        "expenses": [_entry(30, payment_method="cash"), _entry(99, payment_method="cash", expense_type="report")]
+    })
+    shift = ledger.current()
+    assert shift["cash_received"] == 1000
+    assert shift["online_received"] == 500
+    assert shift["online_refunds"] == 200
+    assert shift["cash_refunds"] == 50
+    # Report expenses don't come out of the drawer
+    assert shift["cash_expenses"] == 30
+    assert shift["net_cash"] == 1000 - 50 - 30
+    assert shift["entries"] == 5
+
+
+def test_close_starts_the_next_shift_from_the_counted_cash():
+    logs = {"cash": [_entry(1000)]}
+    ledger = ShiftLedger()
+    ledger.rebuild(logs)
+    summary = ledger.close(logs, "2026-10-19 10:00", "Asha", counted_cash=990)
+    assert summary["expected_cash"] == 1000
+    assert summary["difference"] == -10
+    logs["shifts"] = [to_log_entry(summary)]
+
+    # An entry logged in the same minute as the close belongs to the next shift
+    logs["cash"].append(_entry(200))
+    ledger.add("cash", logs["cash"][-1])
+    rebuilt = ShiftLedger()
+    rebuilt.rebuild(logs)
+    assert rebuilt.current() == ledger.current()
+    assert rebuilt.current()["opening_cash"] == 990
+    assert rebuilt.current()["cash_received"] == 200
+    assert from_log_entry(logs["shifts"][0])["closed_by"] == "Asha"
+
+
+def test_refund_mode_survives_a_reload_from_sheets(lodge):
+    entry = _entry(300, payment_mode="online", note="Full refund")
+    log_type, parsed = lodge.parse_log_row(lodge.log_row("refunds", entry))
+    assert log_type == "refunds"
+    assert parsed["payment_mode"] == "online"
+    assert parsed["note"] == "Full refund"
+
+    ledger = ShiftLedger()
+    ledger.rebuild({"refunds": [parsed]})
+    assert ledger.current()["online_refunds"] == 300
+    assert ledger.current()["cash_refunds"] == 0
+
+
+def test_refund_rows_written_before_their_details_were_kept_still_load(lodge):
+    _, parsed = lodge.parse_log_row(["refunds", "5", "Guest", "300", "10:00", "2026-10-19", "Full refund"])
+    assert parsed["notes"] == "Full refund"
+    assert "payment_mode" not in parsed
+
+
+def test_a_negative_net_survives_a_reload_from_sheets(lodge):
+    logs = {"expenses": [_entry(500, payment_method="cash")]}
+    ledger = ShiftLedger()
+    ledger.rebuild(logs)
+    summary = ledger.close(logs, "2026-10-19 18:00", "Asha")
+    assert summary["net_cash"] == -500
+
+    log_type, parsed = lodge.parse_log_row(lodge.log_row("shifts", to_log_entry(summary)))
+    assert log_type == "shifts"
+    assert parsed["amount"] == -500
+    assert from_log_entry(parsed)["net_cash"] == -500
+
+
+def test_signed_cells_are_read_as_numbers(lodge):
+    assert [lodge.cell_int(value) for value in ("-500", "42", 7.0, "", "n/a")] == [-500, 42, 7, 0, 0]
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import CACHED, COMPUTED, SHARED, SingleFlight
+
+
+def recording_cache(**kwargs):
+    outcomes = []
+    cache = SingleFlight(on_outcome=lambda key, outcome: outcomes.append(outcome), **kwargs)
+    return cache, outcomes
+
+
+def test_a_result_is_reused_until_the_version_changes():
+    cache, outcomes = recording_cache()
+    assert cache.get("rooms", 1, lambda: "v1") == "v1"
+    assert cache.get("rooms", 1, lambda: "recomputed") == "v1"
+    assert cache.get("rooms", 2, lambda: "v2") == "v2"
+    assert outcomes == [COMPUTED, CACHED, COMPUTED]
+
+
+def test_a_slow_result_for_an_older_version_never_replaces_a_newer_one():
+    cache = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "v1"
+
+    older = threading.Thread(target=cache.get, args=("rooms", 1, slow))
+    older.start()
+    started.wait(5)
+    assert cache.get("rooms", 2, lambda: "v2") == "v2"
+    release.set()
+    older.join(5)
+    assert cache.get("rooms", 2, lambda: "recomputed") == "v2"
+
+
+def test_identical_calls_share_one_computation():
+    cache, outcomes = recording_cache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "report"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get("report", 1, compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get("report", 1, compute))) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert results == ["report"] * 4 and len(calls) == 1
+    # A follower slower to start than the computation finds the kept result instead
+    assert outcomes.count(COMPUTED) == 1 and set(outcomes) <= {COMPUTED, SHARED, CACHED}
+
+
+def test_failures_reach_the_caller_and_are_not_kept():
+    cache = SingleFlight()
+
+    def broken():
+        raise RuntimeError("sheet unreadable")
+
+    with pytest.raises(RuntimeError):
+        cache.get("rooms", 1, broken)
+    assert cache.get("rooms", 1, lambda: "ok") == "ok"
+
+
+def test_the_least_recently_used_results_are_dropped():
+    cache = SingleFlight(max_entries=2)
+    cache.get("a", 1, lambda: "a")
+    cache.get("b", 1, lambda: "b")
+    cache.get("a", 1, lambda: "a again")
+    cache.get("c", 1, lambda: "c")
+    assert cache.get("a", 1, lambda: "a again") == "a"
+    assert cache.get("b", 1, lambda: "b again") == "b again"
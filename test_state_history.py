@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from state_history import StateHistory
+
+START = datetime(2026, 10, 1, 9, 0)
+
+
+@pytest.fixture
+def history(lodge, tmp_path, monkeypatch):
+    """A fresh history for the default property, with two records half an hour apart"""
+    shard = lodge.property_shards.get(lodge.DEFAULT_PROPERTY)
+    history = StateHistory(str(tmp_path / "state.history.jsonl"))
+    monkeypatch.setattr(shard, "history", history)
+    history.record({"1": {"status": "vacant"}}, {"cash": 0}, "open", moment=START)
+    history.record({"1": {"status": "occupied"}}, {"cash": 500}, "checkin", moment=START + timedelta(minutes=30))
+    yield history
+    history.close()
+
+
+def state_at(client, moment):
+    return client.get(f"/state_at?ts={moment.isoformat()}")
+
+
+def test_state_before_the_first_record_is_not_found(client, history):
+    response = state_at(client, START - timedelta(minutes=1))
+    assert response.status_code == 404
+
+
+def test_state_between_records_is_the_earlier_one(client, history):
+    state = state_at(client, START + timedelta(minutes=15)).get_json()
+    assert state["rooms"] == {"1": {"status": "vacant"}}
+    assert state["totals"] == {"cash": 0}
+    assert state["events_replayed"] == 0
+
+
+def test_state_after_the_last_record_replays_it(client, history):
+    state = state_at(client, START + timedelta(days=1)).get_json()
+    assert state["rooms"] == {"1": {"status": "occupied"}}
+    assert state["totals"] == {"cash": 500}
+    assert state["changes_since_snapshot"] == ["checkin"]
+
+
+def test_partial_last_line_is_ignored_and_dropped_on_reopen(client, history):
+    with open(history.path, "ab") as f:
+        f.write(b'{"ts":"2026-10-01 11:00:00.000","kind":"event","body":{"reason":"che')
+    state = state_at(client, START + timedelta(days=1)).get_json()
+    assert state["rooms"] == {"1": {"status": "occupied"}}
+
+    history.close()
+    reopened = StateHistory(history.path)
+    with open(history.path, "rb") as f:
+        assert f.read().endswith(b"}\n")
+    assert reopened.state_at(START + timedelta(days=1))["totals"] == {"cash": 500}
+    reopened.close()
+
+
+def test_corrupt_last_line_is_not_replayed(client, history):
+    with open(history.path, "ab") as f:
+        f.write(b"not a record\n")
+    state = state_at(client, START + timedelta(days=1)).get_json()
+    assert state["totals"] == {"cash": 500}
+
+
+def test_records_older_than_the_retention_window_are_dropped(tmp_path):
+    history = StateHistory(str(tmp_path / "state.history.jsonl"), retention_days=2)
+    for day in range(6):
+        moment = START + timedelta(days=day)
+        history.record({"1": {"day": day}}, {"cash": day}, f"day {day}", moment=moment)
+        history.record({"1": {"day": day, "late": True}}, {"cash": day}, "late", moment=moment + timedelta(minutes=30))
+
+    now = START + timedelta(days=5)
+    assert history.state_at(START) is None
+    # The last snapshot before the window stays, so its start can still be answered
+    assert history.state_at(now - timedelta(days=2))["totals"] == {"cash": 3}
+    assert history.state_at(now + timedelta(hours=2))["rooms"] == {"1": {"day": 5, "late": True}}
+    history.close()
+
+    reopened = StateHistory(history.path, retention_days=2)
+    assert reopened.state_at(START) is None
+    assert reopened.state_at(now)["totals"] == {"cash": 5}
+    reopened.close()
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from single_flight import COMPUTED, SHARED
+
+
+def test_posted_reads_wait_for_a_state_replace(lodge, client):
+    """Availability is computed under the write lock, never from a half-replaced state"""
+    shard = lodge.property_shards.get(lodge.DEFAULT_PROPERTY)
+    responses = []
+    reader = threading.Thread(target=lambda: responses.append(client.post(
+        "/check_availability", json={"check_in_date": "2024-01-01", "check_out_date": "2024-01-02"})))
+    with shard.lock:
+        reader.start()
+        reader.join(0.3)
+        assert reader.is_alive()
+    reader.join(5)
+    assert responses and responses[0].get_json()["success"]
+
+
+def test_identical_posted_reads_share_one_computation(lodge, client, monkeypatch):
+    """Reads hold the lock shared, so concurrent identical ones coalesce in the read cache"""
+    shard = lodge.property_shards.get(lodge.DEFAULT_PROPERTY)
+    encode = lodge.encode_availability
+    started, release = threading.Event(), threading.Event()
+    calls, outcomes = [], []
+
+    def slow_encode(*args):
+        calls.append(args)
+        started.set()
+        release.wait(5)
+        return encode(*args)
+
+    monkeypatch.setattr(lodge, "encode_availability", slow_encode)
+    monkeypatch.setattr(shard.read_cache, "_on_outcome", lambda key, outcome: outcomes.append(outcome))
+    body = {"check_in_date": "2030-01-01", "check_out_date": "2030-01-03"}
+    responses = []
+    readers = [threading.Thread(target=lambda: responses.append(lodge.app.test_client().post(
+        "/check_availability", json=body))) for _ in range(2)]
+    readers[0].start()
+    assert started.wait(5)
+    readers[1].start()
+    # Give the second call time to join the computation in progress
+    time.sleep(0.2)
+    release.set()
+    for reader in readers:
+        reader.join(5)
+
+    assert len(calls) == 1
+    assert sorted(outcomes) == [COMPUTED, SHARED]
+    assert [response.get_json()["success"] for response in responses] == [True, True]
+
+
+def test_a_write_waits_for_reads_in_progress(lodge):
+    shard = lodge.property_shards.get(lodge.DEFAULT_PROPERTY)
+    shard.lock.acquire_shared()
+    try:
+        assert not shard.lock.acquire(blocking=False)
+    finally:
+        shard.lock.release_shared()
+    assert shard.lock.acquire(blocking=False)
+    shard.lock.release()